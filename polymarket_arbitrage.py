@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Polymarket 量化交易机器人 - 跨市场套利
+互斥市场组（如同一场选举的各候选人）恰有一个结算为 YES，组内 YES 价格之和应为 1：
+- 和 < 1: 买入组内全部 YES，成本为价格和，结算兑付 1
+- 和 > 1: 买入组内全部 NO，成本为 NO 价格和，结算兑付 k-1
+组索引为每个市场分配固定槽位，组内价格和在每次行情更新时 O(1) 增量维护，
+扣除手续费后仍有利润的组被实时标记为错误定价
+"""
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from polymarket_quant_bot import (
+    BacktestEngine,
+    Market,
+    Portfolio,
+    RiskManager,
+    Signal,
+    StrategyType,
+    TradingStrategy,
+)
+
+# ==================== 市场组索引 ====================
+
+class MarketGroupIndex:
+    """
+    互斥市场组索引
+    每个市场属于至多一个组，并在全局价格数组中占一个固定槽位（组内成员槽位连续）
+    """
+
+    def __init__(self):
+        self.group_ids: List[str] = []
+        self.members: List[List[str]] = []   # 组编号 -> 成员市场
+        self.offsets: List[int] = [0]        # 组编号 -> 成员槽位起点
+        self._group_index: Dict[str, int] = {}
+        self._slots: Dict[str, Tuple[int, int]] = {}  # market_id -> (组编号, 全局槽位)
+
+    def add_group(self, group_id: str, market_ids: Iterable[str]) -> int:
+        """登记一个互斥市场组，返回组编号"""
+        if group_id in self._group_index:
+            raise ValueError(f"group {group_id} already registered")
+        market_ids = list(market_ids)
+        if len(market_ids) < 2:
+            raise ValueError(f"group {group_id} needs at least 2 markets")
+        for market_id in market_ids:
+            if market_id in self._slots:
+                raise ValueError(f"market {market_id} already belongs to a group")
+
+        code = len(self.group_ids)
+        start = self.offsets[-1]
+        self.group_ids.append(group_id)
+        self.members.append(market_ids)
+        self.offsets.append(start + len(market_ids))
+        self._group_index[group_id] = code
+        for i, market_id in enumerate(market_ids):
+            self._slots[market_id] = (code, start + i)
+        return code
+
+    @classmethod
+    def from_markets(cls, markets: Iterable[Market], key: Callable[[Market], Optional[str]]) -> "MarketGroupIndex":
+        """
+        按 key(market) 自动分组（如同一问题模板/事件编号），key 为 None 的市场不分组
+        只保留成员数 >= 2 的组
+        """
+        groups: Dict[str, List[str]] = defaultdict(list)
+        seen = set()
+        for market in markets:
+            if market.market_id in seen:
+                continue
+            seen.add(market.market_id)
+            group_id = key(market)
+            if group_id is not None:
+                groups[group_id].append(market.market_id)
+
+        index = cls()
+        for group_id, market_ids in groups.items():
+            if len(market_ids) >= 2:
+                index.add_group(group_id, market_ids)
+        return index
+
+    def slot(self, market_id: str) -> Optional[Tuple[int, int]]:
+        return self._slots.get(market_id)
+
+    def group_of(self, market_id: str) -> Optional[int]:
+        slot = self._slots.get(market_id)
+        return None if slot is None else slot[0]
+
+    def group_code(self, group_id: str) -> int:
+        return self._group_index[group_id]
+
+    def group_size(self, code: int) -> int:
+        return self.offsets[code + 1] - self.offsets[code]
+
+    @property
+    def n_markets(self) -> int:
+        return self.offsets[-1]
+
+    def __len__(self) -> int:
+        return len(self.group_ids)
+
+    def __contains__(self, market_id: str) -> bool:
+        return market_id in self._slots
+
+# ==================== 组定价引擎 ====================
+
+@dataclass(slots=True)
+class GroupMispricing:
+    """一个错误定价的市场组"""
+    group_id: str
+    side: str            # 应买入的一侧: "YES"（和 < 1）或 "NO"（和 > 1）
+    yes_sum: float
+    no_sum: float
+    cost: float          # 买入一整套（组内每个市场 1 份）的成本
+    payout: float        # 一整套的结算兑付
+    edge: float          # 扣除手续费后每套利润
+    members: int
+    timestamp: Optional[datetime] = None
+
+    @property
+    def edge_pct(self) -> float:
+        return self.edge / self.cost * 100 if self.cost > 0 else 0
+
+
+class CrossMarketArbitrageEngine:
+    """
+    跨市场套利引擎
+    每个组维护 YES/NO 价格和、已报价成员数；单次更新只改动一个槽位和所属组的和 (O(1))
+    增量求和的浮点误差每 resync_every 次更新按成员重新求和一次（均摊 O(1)）
+    """
+
+    def __init__(self, index: MarketGroupIndex, fee_rate: float = 0.01,
+                 min_edge: float = 0.005, resync_every: int = 1000):
+        self.index = index
+        self.fee_rate = fee_rate
+        self.min_edge = min_edge
+        self.resync_every = resync_every
+
+        n, g = index.n_markets, len(index)
+        # 标量热路径使用 list，避免 NumPy 标量索引开销
+        self.yes = [0.0] * n
+        self.no = [0.0] * n
+        self.quoted = [False] * n
+        self.yes_sum = [0.0] * g
+        self.no_sum = [0.0] * g
+        self.n_quoted = [0] * g
+        self.settled = [False] * g
+        self._updates = [0] * g
+
+        self.flagged: Dict[int, GroupMispricing] = {}  # 组编号 -> 当前错误定价
+        self.updates = 0
+
+    def update(self, market_id: str, yes_price: float, no_price: float,
+               timestamp: Optional[datetime] = None) -> Optional[GroupMispricing]:
+        """处理一条行情更新，返回该市场所在组的当前错误定价（没有则 None）"""
+        slot = self.index.slot(market_id)
+        if slot is None:
+            return None
+        code, i = slot
+        self.updates += 1
+
+        if self.quoted[i]:
+            self.yes_sum[code] += yes_price - self.yes[i]
+            self.no_sum[code] += no_price - self.no[i]
+        else:
+            self.quoted[i] = True
+            self.n_quoted[code] += 1
+            self.yes_sum[code] += yes_price
+            self.no_sum[code] += no_price
+        self.yes[i] = yes_price
+        self.no[i] = no_price
+
+        self._updates[code] += 1
+        if self._updates[code] % self.resync_every == 0:
+            self._resync(code)
+        return self._evaluate(code, timestamp)
+
+    def _resync(self, code: int):
+        lo, hi = self.index.offsets[code], self.index.offsets[code + 1]
+        self.yes_sum[code] = sum(p for p, q in zip(self.yes[lo:hi], self.quoted[lo:hi]) if q)
+        self.no_sum[code] = sum(p for p, q in zip(self.no[lo:hi], self.quoted[lo:hi]) if q)
+
+    def _evaluate(self, code: int, timestamp: Optional[datetime]) -> Optional[GroupMispricing]:
+        """只在全部成员都有报价且组未结算时判断；结果写入/移出 flagged"""
+        k = self.index.group_size(code)
+        if self.settled[code] or self.n_quoted[code] < k:
+            self.flagged.pop(code, None)
+            return None
+
+        fee = self.fee_rate
+        yes_sum, no_sum = self.yes_sum[code], self.no_sum[code]
+        # 买入与结算两次收费
+        yes_edge = (1 - fee) - yes_sum * (1 + fee)
+        no_edge = (k - 1) * (1 - fee) - no_sum * (1 + fee)
+
+        if yes_edge >= no_edge:
+            side, cost, payout, edge = "YES", yes_sum, 1.0, yes_edge
+        else:
+            side, cost, payout, edge = "NO", no_sum, float(k - 1), no_edge
+
+        if edge < self.min_edge:
+            self.flagged.pop(code, None)
+            return None
+
+        mispricing = GroupMispricing(
+            group_id=self.index.group_ids[code],
+            side=side,
+            yes_sum=yes_sum,
+            no_sum=no_sum,
+            cost=cost,
+            payout=payout,
+            edge=edge,
+            members=k,
+            timestamp=timestamp
+        )
+        self.flagged[code] = mispricing
+        return mispricing
+
+    def resolve(self, market_id: str):
+        """组内任一市场结算后整组不再交易"""
+        code = self.index.group_of(market_id)
+        if code is not None:
+            self.settled[code] = True
+            self.flagged.pop(code, None)
+
+    def mispricing(self, market_id: str) -> Optional[GroupMispricing]:
+        code = self.index.group_of(market_id)
+        return None if code is None else self.flagged.get(code)
+
+    def group_sum(self, group_id: str) -> float:
+        return self.yes_sum[self.index.group_code(group_id)]
+
+    def implied_probability(self, market_id: str) -> Optional[float]:
+        """组内归一化后的隐含概率 yes_i / Σyes (O(1))"""
+        slot = self.index.slot(market_id)
+        if slot is None or not self.quoted[slot[1]]:
+            return None
+        total = self.yes_sum[slot[0]]
+        return self.yes[slot[1]] / total if total > 0 else None
+
+    def implied_probabilities(self) -> np.ndarray:
+        """全部槽位的隐含概率（向量化；未报价为 NaN）"""
+        offsets = np.asarray(self.index.offsets)
+        sums = np.repeat(np.asarray(self.yes_sum), np.diff(offsets))
+        yes = np.asarray(self.yes)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            probs = yes / sums
+        probs[~np.asarray(self.quoted, dtype=bool)] = np.nan
+        return probs
+
+    def mispricings(self) -> List[GroupMispricing]:
+        """当前全部错误定价，按每套利润从高到低"""
+        return sorted(self.flagged.values(), key=lambda m: m.edge_pct, reverse=True)
+
+# ==================== 跨市场套利策略 ====================
+
+class CrossMarketArbitrageStrategy(TradingStrategy):
+    """
+    跨市场套利策略
+    组被标记为错误定价时，按组内各成员的最新报价一次性给出整套（每个市场同样份额的应买一侧）多腿信号，
+    由引擎整体风控、同比例建仓，任一腿被拒则整套放弃；各腿不设止损止盈，持有至结算
+    """
+
+    def __init__(self, index: MarketGroupIndex, min_edge: float = 0.005, fee_rate: float = 0.01,
+                 capital_fraction: float = 0.2, max_sets: float = 1000):
+        super().__init__("Cross-Market Arbitrage", StrategyType.CROSS_MARKET_ARBITRAGE)
+        self.engine = CrossMarketArbitrageEngine(index, fee_rate=fee_rate, min_edge=min_edge)
+        self.capital_fraction = capital_fraction
+        self.max_sets = max_sets
+        self.hold_to_resolution = True
+        self.multi_leg = True
+        self._quotes: Dict[str, Market] = {}  # 未结算组内市场 -> 最新行情
+
+    def analyze(self, market: Market, portfolio: Portfolio) -> Optional[List[Tuple[Signal, str, float, Market]]]:
+        code = self.engine.index.group_of(market.market_id)
+        if code is None or self.engine.settled[code]:
+            return None
+        self._quotes[market.market_id] = market
+
+        mispricing = self.engine.update(market.market_id, market.yes_price, market.no_price, market.timestamp)
+        if mispricing is None:
+            return None
+
+        members = self.engine.index.members[code]
+        if any(portfolio.positions.holds(m, self.strategy_type) for m in members):
+            return [(Signal.HOLD, mispricing.side, 0, market)]
+
+        # 整套：每个成员按其最新报价买入同样份额
+        sets = min(portfolio.cash * self.capital_fraction / mispricing.cost, self.max_sets)
+        return [(Signal.BUY, mispricing.side, sets, replace(self._quotes[m], timestamp=market.timestamp))
+                for m in members]
+
+    def on_market_resolved(self, market_id: str):
+        self.engine.resolve(market_id)
+        code = self.engine.index.group_of(market_id)
+        if code is not None:
+            for m in self.engine.index.members[code]:
+                self._quotes.pop(m, None)
+
+# ==================== 演示数据 ====================
+
+def generate_group_markets(n_groups: int = 50, members: Tuple[int, int] = (3, 8), hours: int = 240,
+                           noise: float = 0.02, seed: int = 7,
+                           start_date: Optional[datetime] = None) -> Tuple[List[Market], MarketGroupIndex]:
+    """
+    生成互斥市场组行情：每组公允概率服从 Dirichlet 分布并随时间游走，
+    各成员报价在公允概率上叠加独立噪声，因此组内价格和会偏离 1
+    最后一小时按公允概率抽取唯一胜者并结算全组
+    """
+    rng = np.random.default_rng(seed)
+    start_date = start_date or datetime(2026, 1, 1)
+    index = MarketGroupIndex()
+    markets: List[Market] = []
+
+    for g in range(n_groups):
+        k = int(rng.integers(members[0], members[1] + 1))
+        ids = [f"group_{g:04d}_m{i}" for i in range(k)]
+        index.add_group(f"group_{g:04d}", ids)
+        fair = rng.dirichlet(np.full(k, 2.0))
+        liquidity = rng.lognormal(8, 0.5, size=k)
+
+        for hour in range(hours):
+            fair = fair * np.exp(rng.normal(0, 0.03, size=k))
+            fair /= fair.sum()
+            quotes = np.clip(fair + rng.normal(0, noise, size=k), 0.01, 0.99).round(3)
+            timestamp = start_date + timedelta(hours=hour)
+            winner = int(rng.choice(k, p=fair)) if hour == hours - 1 else None
+            for i in range(k):
+                markets.append(Market(
+                    market_id=ids[i],
+                    question=f"Will candidate {i} win race {g}?",
+                    category="Politics",
+                    yes_price=float(quotes[i]),
+                    no_price=float(round(1 - quotes[i], 3)),
+                    volume=float(liquidity[i] * 3),
+                    liquidity=float(liquidity[i]),
+                    timestamp=timestamp,
+                    resolution=None if winner is None else (i == winner)
+                ))
+
+    markets.sort(key=lambda m: m.timestamp)
+    return markets, index
+
+
+if __name__ == "__main__":
+    # 1. 引擎吞吐：数千个市场的增量更新
+    markets, index = generate_group_markets(n_groups=1000, hours=24)
+    engine = CrossMarketArbitrageEngine(index)
+    t0 = time.perf_counter()
+    for m in markets:
+        engine.update(m.market_id, m.yes_price, m.no_price, m.timestamp)
+    elapsed = time.perf_counter() - t0
+    print(f"市场组: {len(index)}  市场: {index.n_markets}  更新: {len(markets)}  "
+          f"{len(markets) / elapsed:,.0f} 次/秒  当前错误定价组: {len(engine.flagged)}")
+    for m in engine.mispricings()[:5]:
+        print(f"  {m.group_id}: 买入全部 {m.side}  YES 和={m.yes_sum:.3f}  每套利润 {m.edge:.4f} ({m.edge_pct:.2f}%)")
+
+    # 2. 回测
+    markets, index = generate_group_markets(n_groups=50)
+    backtest = BacktestEngine(initial_capital=10000)
+    backtest.risk_manager = RiskManager(max_positions=100)  # 每套占 3-8 条持仓腿
+    backtest.add_strategy(CrossMarketArbitrageStrategy(index))
+    stats = backtest.run(verbose=False, markets=markets)
+    print(f"\n回测收益: {stats['total_return']:.2f}%  交易次数: {stats['total_trades']}  "
+          f"胜率: {stats['win_rate']:.2f}%  最大回撤: {stats['max_drawdown']:.2f}%")
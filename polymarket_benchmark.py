@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Polymarket 量化交易机器人 - 性能基准
+固定随机种子的回测场景，分阶段（生成/回测/统计/报告）计时并记录事件吞吐与峰值内存，
+结果追加到 JSON 历史文件，与同一机器上最近几次的中位数比较，超过阈值即判定为性能回退
+
+用法:
+    python polymarket_benchmark.py                     # 全部场景
+    python polymarket_benchmark.py --scenarios 90d_3m  # 指定场景
+    python polymarket_benchmark.py --no-save           # 只比较不写历史
+退出码: 0 正常，1 存在性能回退
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from polymarket_quant_bot import (
+    ArbitrageStrategy,
+    BacktestEngine,
+    MarketDataGenerator,
+    MarketMakingStrategy,
+    MeanReversionStrategy,
+    MomentumStrategy,
+    RiskManager,
+    SentimentStrategy,
+    WhaleTrackingStrategy,
+)
+
+# ==================== 场景 ====================
+
+@dataclass(slots=True)
+class Scenario:
+    """基准场景：days 天、每天新开 markets_per_day 个市场（每个市场 24-720 个小时事件）"""
+    name: str
+    days: int
+    markets_per_day: int
+    seed: int = 42
+    report: bool = True        # 是否计时报告阶段
+    interactive: bool = False  # 报告阶段用交互式 JSON/JS 报告代替 PNG
+    batch: bool = False        # 按时间点批量评估（BacktestEngine batch_events）
+
+
+SCENARIOS: Dict[str, Scenario] = {s.name: s for s in (
+    Scenario("90d_3m", days=90, markets_per_day=3),
+    Scenario("1y_50m", days=365, markets_per_day=50),
+    # 压力场景：1 万个市场同一天上线、生命周期全部重叠
+    Scenario("stress_10k", days=1, markets_per_day=10_000, interactive=True),
+    # 同一压力数据走批量事件路径（snapshot_bounds -> from_tape -> analyze_batch -> check_orders_batch）
+    Scenario("stress_10k_batch", days=1, markets_per_day=10_000, report=False, batch=True),
+)}
+
+START_DATE = datetime(2025, 1, 1)  # 固定数据起点，保证各次运行事件序列一致
+
+# 回退阈值：指标 -> (方向, 相对容差)；方向 +1 越大越好，-1 越小越好
+THRESHOLDS: Dict[str, Tuple[int, float]] = {
+    "events_per_sec": (+1, 0.10),
+    "peak_rss_mb": (-1, 0.15),
+    "time_generate": (-1, 0.15),
+    "time_run": (-1, 0.15),
+    "time_stats": (-1, 0.25),
+    "time_report": (-1, 0.25),
+}
+MIN_SECONDS = 0.05   # 低于该耗时的阶段计时噪声过大，不参与比较
+BASELINE_WINDOW = 5  # 基线取同一机器最近 N 次记录的中位数
+
+
+def _build_engine(batch_events: bool = False) -> BacktestEngine:
+    """与 main() 相同的策略组合；风控放宽到不会提前停止，保证每次处理完整事件序列"""
+    engine = BacktestEngine(initial_capital=10000, fee_rate=0.01, batch_events=batch_events)
+    engine.risk_manager = RiskManager(daily_loss_limit=1.0, max_drawdown=1.0)
+    engine.add_strategy(MarketMakingStrategy(spread_target=0.02, position_limit=500))
+    engine.add_strategy(ArbitrageStrategy(min_profit_threshold=0.005))
+    engine.add_strategy(MomentumStrategy(lookback=10, threshold=0.05))
+    engine.add_strategy(MeanReversionStrategy(oversold_threshold=0.25, overbought_threshold=0.75))
+    engine.add_strategy(SentimentStrategy(volume_threshold=2.0))
+    engine.add_strategy(WhaleTrackingStrategy(large_order_threshold=10000))
+    return engine
+
+
+# ==================== 测量 ====================
+
+def _peak_rss_mb() -> float:
+    """本进程峰值常驻内存 (MB)；Linux 单位为 KB，macOS 为字节"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(scenario: Scenario) -> Dict:
+    """
+    在当前进程中运行一个场景，返回各阶段耗时、事件吞吐、峰值内存及结果指纹
+    峰值内存为进程级高水位，应在独立进程中调用（见 run_isolated）
+    """
+    result = {"baseline_rss_mb": _peak_rss_mb()}
+
+    t0 = time.perf_counter()
+    tape = MarketDataGenerator(seed=scenario.seed).generate_tape(
+        days=scenario.days, markets_per_day=scenario.markets_per_day, start_date=START_DATE)
+    result["time_generate"] = time.perf_counter() - t0
+
+    engine = _build_engine(batch_events=scenario.batch)
+    processed = 0
+
+    def counted():
+        nonlocal processed
+        for market in tape:
+            processed += 1
+            yield market
+
+    t0 = time.perf_counter()
+    if scenario.batch:
+        # 批量路径需要完整的 MarketTape 才能按时间点分组；风控放宽后所有事件都会被处理
+        stats = engine.run(verbose=False, markets=tape)
+        processed = len(tape)
+    else:
+        stats = engine.run(verbose=False, markets=counted())
+    result["time_run"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    live = engine.live_stats()
+    result["time_stats"] = time.perf_counter() - t0
+
+    if scenario.report:
+        with tempfile.TemporaryDirectory() as tmp:
+            t0 = time.perf_counter()
+            engine.generate_report(os.path.join(tmp, "report.html"), interactive=scenario.interactive,
+                                   chart_path=os.path.join(tmp, "charts.png"))
+            result["time_report"] = time.perf_counter() - t0
+
+    result.update(
+        events=processed,
+        events_per_sec=processed / result["time_run"] if result["time_run"] > 0 else 0.0,
+        peak_rss_mb=_peak_rss_mb(),
+        # 结果指纹：同一种子下应保持不变，变化说明改动影响了回测结果而非仅性能
+        fingerprint={
+            "total_trades": stats["total_trades"],
+            "final_equity": round(live["final_equity"], 6),
+            "max_drawdown": round(stats["max_drawdown"], 6),
+        },
+    )
+    return result
+
+
+def run_isolated(scenario: Scenario) -> Dict:
+    """在新的 spawn 子进程中运行场景，使峰值内存互不干扰"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_scenario, scenario).result()
+
+
+# ==================== 历史与回退判定 ====================
+
+def machine_key() -> str:
+    """历史记录只与同一机器/解释器的结果比较"""
+    return f"{platform.node()}|{platform.machine()}|py{platform.python_version()}"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(path: str, history: List[Dict]):
+    """原子写入：先写临时文件再替换"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def baseline(history: List[Dict], scenario: str, machine: str, window: int = BASELINE_WINDOW) -> Dict[str, float]:
+    """同一机器上该场景最近 window 次记录各指标的中位数"""
+    runs = [r["scenarios"][scenario] for r in history
+            if r.get("machine") == machine and scenario in r.get("scenarios", {})][-window:]
+    return {metric: statistics.median(r[metric] for r in runs if metric in r)
+            for metric in THRESHOLDS if any(metric in r for r in runs)}
+
+
+def find_regressions(result: Dict, base: Dict[str, float], thresholds: Dict[str, Tuple[int, float]] = THRESHOLDS,
+                     scale: float = 1.0) -> List[Tuple[str, float, float, float]]:
+    """
+    返回 [(指标, 基线, 本次, 相对变化)]，只含超过阈值的回退
+    scale: 整体放大/缩小容差（噪声较大的机器上可调大）
+    """
+    regressions = []
+    for metric, (direction, tolerance) in thresholds.items():
+        if metric not in result or metric not in base or base[metric] <= 0:
+            continue
+        if metric.startswith("time_") and max(result[metric], base[metric]) < MIN_SECONDS:
+            continue
+        change = (result[metric] - base[metric]) / base[metric]
+        if -direction * change > tolerance * scale:
+            regressions.append((metric, base[metric], result[metric], change))
+    return regressions
+
+
+def run_suite(names: Optional[List[str]] = None, history_path: str = "benchmark_history.json",
+              save: bool = True, repeat: int = 1, scale: float = 1.0, verbose: bool = True) -> Tuple[Dict, List]:
+    """
+    运行基准场景并与历史基线比较
+    repeat > 1 时每个场景独立运行多次，耗时取最小值、吞吐取最大值
+    Returns: (本次各场景结果, [(场景, 指标, 基线, 本次, 相对变化)])
+    """
+    names = names or list(SCENARIOS)
+    history = load_history(history_path)
+    machine = machine_key()
+    results, regressions = {}, []
+
+    for name in names:
+        scenario = SCENARIOS[name]
+        runs = [run_isolated(scenario) for _ in range(max(repeat, 1))]
+        result = dict(runs[0])
+        for metric, (direction, _) in THRESHOLDS.items():
+            values = [r[metric] for r in runs if metric in r]
+            if values:
+                result[metric] = max(values) if direction > 0 else min(values)
+        results[name] = result
+
+        base = baseline(history, name, machine)
+        found = find_regressions(result, base, scale=scale)
+        regressions.extend((name,) + r for r in found)
+
+        if verbose:
+            _print_result(scenario, result, base, found)
+            previous = [r["scenarios"][name] for r in history
+                        if r.get("machine") == machine and name in r.get("scenarios", {})]
+            if previous and previous[-1].get("fingerprint") != result["fingerprint"]:
+                print(f"  [注意] 回测结果指纹与上次不同: {previous[-1].get('fingerprint')} -> {result['fingerprint']}")
+
+    if save:
+        history.append({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "machine": machine,
+            "scenarios": results,
+            "config": {name: asdict(SCENARIOS[name]) for name in names},
+        })
+        save_history(history_path, history)
+
+    return results, regressions
+
+
+def _print_result(scenario: Scenario, result: Dict, base: Dict[str, float], regressions: List):
+    flagged = {r[0] for r in regressions}
+    print(f"\n[{scenario.name}] {scenario.days} 天 x {scenario.markets_per_day} 市场/天  "
+          f"事件 {result['events']:,}  交易 {result['fingerprint']['total_trades']:,}")
+    for metric in THRESHOLDS:
+        if metric not in result:
+            continue
+        line = f"  {metric:<16}{result[metric]:>14,.3f}"
+        if metric in base:
+            change = (result[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+            line += f"   基线 {base[metric]:>14,.3f}  {change:+.1%}"
+        if metric in flagged:
+            line += "  <-- 回退"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Polymarket 回测性能基准")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), help="要运行的场景（默认全部）")
+    parser.add_argument("--history", default="benchmark_history.json", help="JSON 历史文件")
+    parser.add_argument("--no-save", action="store_true", help="不把本次结果写入历史")
+    parser.add_argument("--repeat", type=int, default=1, help="每个场景重复次数，取最好成绩")
+    parser.add_argument("--tolerance-scale", type=float, default=1.0, help="整体放大回退阈值")
+    args = parser.parse_args(argv)
+
+    _, regressions = run_suite(args.scenarios, args.history, save=not args.no_save,
+                               repeat=args.repeat, scale=args.tolerance_scale)
+    if regressions:
+        print("\n性能回退:")
+        for name, metric, base, value, change in regressions:
+            print(f"  {name}.{metric}: {base:,.3f} -> {value:,.3f} ({change:+.1%})")
+        return 1
+    print("\n未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
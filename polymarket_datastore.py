@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Polymarket 量化交易机器人 - 历史行情存储
+将录制的市场价格/成交量历史（CSV / JSON / JSON Lines / 价格历史接口格式）导入
+内存映射的列式存储：每列一个定长二进制文件，外加按市场、按时间的索引
+
+存储目录结构:
+    meta.json                  行数、列类型、市场表（编号 -> id/问题/分类）
+    <列名>.bin                 按时间稳定排序的列（原生小端定长数组）
+    market_order.bin           按市场分组、组内按时间排序的行号
+    market_offsets.bin         每个市场在 market_order 中的区间起点
+
+打开存储只读取 meta.json 并建立 np.memmap，加载时间与数据量无关；
+回测按行惰性构造 Market，多个进程共享同一份页缓存
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from polymarket_quant_bot import (
+    BacktestEngine,
+    MarketDataGenerator,
+    MarketTape,
+    MeanReversionStrategy,
+    MomentumStrategy,
+    SentimentStrategy,
+    WhaleTrackingStrategy,
+    from_us,
+    to_us,
+)
+
+# 列名 -> dtype（与 MarketTape 的列一致）
+COLUMNS = {
+    "codes": np.int32,
+    "yes_prices": np.float64,
+    "no_prices": np.float64,
+    "volumes": np.float64,
+    "liquidity": np.float64,
+    "timestamps": np.int64,
+    "resolutions": np.int8,
+}
+_TYPECODES = {"codes": "i", "yes_prices": "d", "no_prices": "d", "volumes": "d",
+              "liquidity": "d", "timestamps": "q", "resolutions": "b"}
+FORMAT_VERSION = 1
+
+# ==================== 内存映射序列 ====================
+
+class MappedTape(MarketTape):
+    """
+    列为 np.memmap 的 MarketTape（存储中 [start, stop) 行）
+    连续切片仍是映射视图；pickle 时只序列化 (存储路径, 行区间)，子进程重新映射同一文件
+    """
+
+    def __init__(self, store: "ColumnarStore", start: int = 0, stop: Optional[int] = None):
+        self.store = store
+        self.start = start
+        self.stop = len(store) if stop is None else stop
+        self.market_ids = store.market_ids
+        self.questions = store.questions
+        self.categories = store.categories
+        self._market_index = store.market_index
+        self._buffers = None
+        for name in COLUMNS:
+            setattr(self, name, store.column(name)[self.start:self.stop])
+
+    def __reduce__(self):
+        return _open_tape, (self.store.path, self.start, self.stop)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice) and key.step in (None, 1):
+            start, stop, _ = key.indices(len(self))
+            return MappedTape(self.store, self.start + start, self.start + max(start, stop))
+        return super().__getitem__(key)
+
+    def market_rows(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """覆盖整个存储时直接返回存储的市场索引 (order, offsets)，否则 None"""
+        if self.start == 0 and self.stop == len(self.store):
+            return self.store.market_order, self.store.market_offsets
+        return None
+
+
+_OPEN_STORES: Dict[str, "ColumnarStore"] = {}
+
+
+def _open_tape(path: str, start: int, stop: int) -> MappedTape:
+    """反序列化入口：同一进程内每个存储只映射一次"""
+    store = _OPEN_STORES.get(path)
+    if store is None:
+        store = _OPEN_STORES[path] = ColumnarStore(path)
+    return MappedTape(store, start, stop)
+
+# ==================== 列式存储 ====================
+
+class ColumnarStore:
+    """只读的内存映射列式行情存储"""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        with open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported store version {self.meta.get('version')}")
+
+        self.rows = self.meta["rows"]
+        self.market_ids: List[str] = [m[0] for m in self.meta["markets"]]
+        self.questions: List[str] = [m[1] for m in self.meta["markets"]]
+        self.categories: List[str] = [m[2] for m in self.meta["markets"]]
+        self.market_index: Dict[str, int] = {m: i for i, m in enumerate(self.market_ids)}
+
+        self._columns = {name: self._map(f"{name}.bin", dtype, self.rows) for name, dtype in COLUMNS.items()}
+        self.market_order = self._map("market_order.bin", np.int64, self.rows)
+        self.market_offsets = self._map("market_offsets.bin", np.int64, len(self.market_ids) + 1)
+
+    def _map(self, filename: str, dtype, length: int) -> np.ndarray:
+        if length == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, filename), dtype=dtype, mode="r", shape=(length,))
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._columns["timestamps"]
+
+    def row_range(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[int, int]:
+        """时间区间 [start, end) 对应的行区间（时间列有序，二分查找）"""
+        ts = self.timestamps
+        lo = 0 if start is None else int(np.searchsorted(ts, to_us(start), side="left"))
+        hi = self.rows if end is None else int(np.searchsorted(ts, to_us(end), side="left"))
+        return lo, max(lo, hi)
+
+    def tape(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> MappedTape:
+        """返回时间区间内的惰性 MarketTape，可直接传给 BacktestEngine.run(markets=...)"""
+        return MappedTape(self, *self.row_range(start, end))
+
+    def market_rows(self, market_id: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> np.ndarray:
+        """某市场在时间区间内的行号（按时间排序）"""
+        code = self.market_index[market_id]
+        rows = self.market_order[self.market_offsets[code]:self.market_offsets[code + 1]]
+        if start is not None or end is not None:
+            ts = self.timestamps[rows]
+            lo = 0 if start is None else np.searchsorted(ts, to_us(start), side="left")
+            hi = len(rows) if end is None else np.searchsorted(ts, to_us(end), side="left")
+            rows = rows[lo:hi]
+        return rows
+
+    def market_history(self, market_id: str, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """某市场的价格/成交量历史（各列按行号取出）"""
+        rows = self.market_rows(market_id, start, end)
+        return {name: self._columns[name][rows] for name in ("timestamps", "yes_prices", "no_prices",
+                                                                 "volumes", "liquidity", "resolutions")}
+
+    def span(self) -> Tuple[Optional[datetime], Optional[datetime]]:
+        if self.rows == 0:
+            return None, None
+        return from_us(self.timestamps[0]), from_us(self.timestamps[-1])
+
+    @classmethod
+    def from_tape(cls, tape: MarketTape, path: str) -> "ColumnarStore":
+        """将已排序的 MarketTape 写成存储（如固定种子生成的数据，供多进程共享）"""
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, "meta.json")):
+            os.remove(os.path.join(path, "meta.json"))
+        for name in COLUMNS:
+            np.ascontiguousarray(getattr(tape, name), dtype=COLUMNS[name]).tofile(os.path.join(path, f"{name}.bin"))
+        markets = list(zip(tape.market_ids, tape.questions, tape.categories))
+        _write_index(path, len(tape), len(markets))
+        _write_meta(path, len(tape), markets)
+        return cls(path)
+
+# ==================== 导入 ====================
+
+def _parse_timestamp(value) -> int:
+    """时间戳 -> 微秒（支持 ISO 字符串与秒/毫秒/微秒/纳秒数值，带时区的统一转为 UTC）"""
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            value = float(value)
+        except ValueError:
+            ts = datetime.fromisoformat(value)
+            if ts.tzinfo is not None:
+                ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+            return to_us(ts)
+    value = float(value)
+    if value > 1e17:      # 纳秒
+        return int(value // 1000)
+    if value > 1e14:      # 微秒
+        return int(value)
+    if value > 1e11:      # 毫秒
+        return int(value * 1000)
+    return int(value * 1_000_000)
+
+
+def _parse_resolution(value) -> int:
+    if value is None or value == "":
+        return -1
+    if isinstance(value, bool):
+        return int(value)
+    value = str(value).strip().lower()
+    if value in ("yes", "true", "1", "y"):
+        return 1
+    if value in ("no", "false", "0", "n"):
+        return 0
+    return -1
+
+
+def _float(record: Dict, *keys, default=None):
+    for key in keys:
+        value = record.get(key)
+        if value not in (None, ""):
+            return float(value)
+    return default
+
+
+class _StagingWriter:
+    """按块追加写入未排序的列文件"""
+
+    def __init__(self, path: str, chunk_rows: int):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.markets: List[Tuple[str, str, str]] = []
+        self._market_index: Dict[str, int] = {}
+        self._buffers = {name: array(_TYPECODES[name]) for name in COLUMNS}
+        self._files = {name: open(self.staging(name), "wb") for name in COLUMNS}
+
+    def staging(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.staging")
+
+    def append(self, record: Dict, where: str = "record"):
+        """追加一条记录；缺少必需字段或数值无法解析时抛出 ValueError（where 标明来源文件与记录序号）"""
+        market_id = record.get("market_id") or record.get("market") or record.get("id")
+        if market_id in (None, ""):
+            raise ValueError(f"{where}: missing market_id (or market / id)")
+        timestamp = record.get("timestamp", record.get("t"))
+        if timestamp in (None, ""):
+            raise ValueError(f"{where}: missing timestamp (or t)")
+        try:
+            yes = _float(record, "yes_price", "price", "p")
+            no = _float(record, "no_price")
+            timestamp = _parse_timestamp(timestamp)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{where}: {e}") from e
+        if yes is None and no is None:
+            raise ValueError(f"{where}: missing yes_price (or price / p / no_price)")
+        if yes is None:
+            yes = round(1 - no, 6)
+        elif no is None:
+            no = round(1 - yes, 6)
+
+        market_id = str(market_id)
+        code = self._market_index.get(market_id)
+        if code is None:
+            code = self._market_index[market_id] = len(self.markets)
+            self.markets.append((market_id, str(record.get("question") or ""), str(record.get("category") or "")))
+
+        b = self._buffers
+        b["codes"].append(code)
+        b["yes_prices"].append(yes)
+        b["no_prices"].append(no)
+        b["volumes"].append(_float(record, "volume", "v", default=0.0))
+        b["liquidity"].append(_float(record, "liquidity", default=0.0))
+        b["timestamps"].append(timestamp)
+        b["resolutions"].append(_parse_resolution(record.get("resolution")))
+        self.rows += 1
+        if len(b["codes"]) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        for name, buf in self._buffers.items():
+            self._files[name].write(buf.tobytes())
+            self._buffers[name] = array(_TYPECODES[name])
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+
+def _iter_records(path: str) -> Iterator[Dict]:
+    """逐条读取 CSV / JSON / JSON Lines；JSON 中 {"history": [{"t", "p"}...]} 按市场展开"""
+    lower = path.lower()
+    if lower.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+        return
+
+    if lower.endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield from _expand(json.loads(line))
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "history" not in data:
+        # {market_id: [...]} 或 {market_id: {"history": [...]}}
+        for market_id, value in data.items():
+            if isinstance(value, list):
+                value = {"market_id": market_id, "history": value}
+            yield from _expand({"market_id": market_id, **value})
+    else:
+        for item in data if isinstance(data, list) else [data]:
+            yield from _expand(item)
+
+
+def _expand(item: Dict) -> Iterator[Dict]:
+    history = item.get("history")
+    if history is None:
+        yield item
+        return
+    meta = {k: v for k, v in item.items() if k != "history"}
+    last = len(history) - 1
+    for i, point in enumerate(history):
+        record = {**meta, **point}
+        if i != last:
+            record.pop("resolution", None)  # 结算结果只落在最后一个点
+        yield record
+
+
+def import_history(sources: Union[str, Iterable[str]], store_path: str,
+                   chunk_rows: int = 1_000_000, verbose: bool = False) -> ColumnarStore:
+    """
+    导入录制的行情历史并建立存储（流式读取，列按块追加写盘）
+    记录字段: market_id, timestamp (或 t), yes_price (或 price / p),
+              可选 no_price, volume (或 v), liquidity, question, category, resolution
+              yes/no 价格只给出一侧时另一侧取 1 - 该价格；缺少必需字段时抛出 ValueError（含文件名与记录序号）
+    排序阶段只需时间列与排序下标在内存中（约 16 字节/行），其余列按块从映射文件重排
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+    os.makedirs(store_path, exist_ok=True)
+    meta_path = os.path.join(store_path, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # 导入完成前存储不可打开
+
+    t0 = time.perf_counter()
+    writer = _StagingWriter(store_path, chunk_rows)
+    try:
+        for source in sources:
+            for row, record in enumerate(_iter_records(source), start=1):
+                writer.append(record, f"{source}: record {row}")
+    finally:
+        writer.close()
+    n = writer.rows
+    if verbose:
+        print(f"读取 {n:,} 行 / {len(writer.markets):,} 个市场  {time.perf_counter() - t0:.1f}s")
+
+    # 按时间稳定排序；已有序时直接改名
+    timestamps = np.fromfile(writer.staging("timestamps"), dtype=np.int64)
+    order = None
+    if n and np.any(np.diff(timestamps) < 0):
+        order = np.argsort(timestamps, kind="stable")
+    del timestamps
+
+    for name, dtype in COLUMNS.items():
+        staging, final = writer.staging(name), os.path.join(store_path, f"{name}.bin")
+        if order is None:
+            os.replace(staging, final)
+            continue
+        src = np.memmap(staging, dtype=dtype, mode="r", shape=(n,))
+        dst = np.memmap(final, dtype=dtype, mode="w+", shape=(n,))
+        for i in range(0, n, chunk_rows):
+            dst[i:i + chunk_rows] = src[order[i:i + chunk_rows]]
+        dst.flush()
+        del src, dst
+        os.remove(staging)
+    del order
+
+    _write_index(store_path, n, len(writer.markets))
+    _write_meta(store_path, n, writer.markets)
+    if verbose:
+        print(f"存储已建立: {store_path}  {time.perf_counter() - t0:.1f}s")
+    return ColumnarStore(store_path)
+
+
+def _write_index(path: str, rows: int, n_markets: int):
+    """市场索引：按市场编号稳定排序的行号（组内保持时间顺序）及各市场区间起点"""
+    if rows:
+        codes = np.memmap(os.path.join(path, "codes.bin"), dtype=np.int32, mode="r", shape=(rows,))
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=n_markets)
+        del codes
+    else:
+        order, counts = np.zeros(0, dtype=np.int64), np.zeros(n_markets, dtype=np.int64)
+    order.astype(np.int64).tofile(os.path.join(path, "market_order.bin"))
+    np.concatenate(([0], np.cumsum(counts))).astype(np.int64).tofile(os.path.join(path, "market_offsets.bin"))
+
+
+def _write_meta(path: str, rows: int, markets: List[Tuple[str, str, str]]):
+    """最后写入元数据（原子替换），存在 meta.json 即表示存储完整"""
+    meta = {
+        "version": FORMAT_VERSION,
+        "rows": rows,
+        "columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+        "markets": [list(m) for m in markets],
+    }
+    tmp_path = os.path.join(path, "meta.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+
+def export_csv(tape: MarketTape, path: str):
+    """把 MarketTape 导出为导入器可读的 CSV（演示/测试用）"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["market_id", "question", "category", "timestamp", "yes_price", "no_price",
+                    "volume", "liquidity", "resolution"])
+        for i in range(len(tape)):
+            m = tape.market_at(i)
+            w.writerow([m.market_id, m.question, m.category, m.timestamp.isoformat(), m.yes_price, m.no_price,
+                        m.volume, m.liquidity, "" if m.resolution is None else ("yes" if m.resolution else "no")])
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else "market_store"
+    csv_path = os.path.join(root, "history.csv")
+    os.makedirs(root, exist_ok=True)
+
+    # 1. 生成一份录制格式的历史行情并导入
+    generated = MarketDataGenerator(seed=42).generate_tape(days=90, markets_per_day=3)
+    export_csv(generated, csv_path)
+    store = import_history(csv_path, os.path.join(root, "store"), verbose=True)
+
+    # 2. 打开存储（只读元数据 + 建立映射）并回测
+    t0 = time.perf_counter()
+    store = ColumnarStore(os.path.join(root, "store"))
+    print(f"打开存储: {(time.perf_counter() - t0) * 1000:.1f}ms  {len(store):,} 行  时间范围 {store.span()}")
+
+    engine = BacktestEngine()
+    for strategy in [MomentumStrategy(), MeanReversionStrategy(), SentimentStrategy(), WhaleTrackingStrategy()]:
+        engine.add_strategy(strategy)
+    stats = engine.run(verbose=False, markets=store.tape())
+    print(f"回测收益: {stats['total_return']:.2f}%  交易次数: {stats['total_trades']}")
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Polymarket 量化交易机器人 - 模拟盘 (Paper Trading)
+用与回测相同的 TradingStrategy / RiskManager / Portfolio 处理实时行情流
+行情源可插拔: 本地回放文件或 WebSocket（附带测试用的本地模拟服务器）
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+import numpy as np
+
+from polymarket_quant_bot import (
+    ACTIONS,
+    STRATEGY_TYPES,
+    SIDES,
+    ArbitrageStrategy,
+    BacktestEngine,
+    Market,
+    MarketDataGenerator,
+    MarketMakingStrategy,
+    MeanReversionStrategy,
+    MomentumStrategy,
+    SentimentStrategy,
+    WhaleTrackingStrategy,
+)
+
+# ==================== 行情消息编解码 ====================
+
+def market_to_message(seq: int, market: Market) -> str:
+    """Market -> JSON 行情消息"""
+    return json.dumps({
+        "seq": seq,
+        "market_id": market.market_id,
+        "question": market.question,
+        "category": market.category,
+        "yes_price": market.yes_price,
+        "no_price": market.no_price,
+        "volume": market.volume,
+        "liquidity": market.liquidity,
+        "timestamp": market.timestamp.isoformat(),
+        "resolution": market.resolution,
+    }, ensure_ascii=False)
+
+
+def message_to_market(payload: Dict) -> Tuple[int, Market]:
+    """JSON 行情消息 -> (seq, Market)"""
+    return payload["seq"], Market(
+        market_id=payload["market_id"],
+        question=payload.get("question", ""),
+        category=payload.get("category", ""),
+        yes_price=payload["yes_price"],
+        no_price=payload["no_price"],
+        volume=payload["volume"],
+        liquidity=payload["liquidity"],
+        timestamp=datetime.fromisoformat(payload["timestamp"]),
+        resolution=payload.get("resolution")
+    )
+
+
+def write_replay_file(markets: Iterable[Market], path: str) -> int:
+    """将事件序列写为 JSON Lines 回放文件，seq 从 1 开始，返回写入条数"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for count, market in enumerate(markets, start=1):
+            f.write(market_to_message(count, market))
+            f.write("\n")
+    return count
+
+# ==================== 行情源 ====================
+
+class MarketUpdateSource:
+    """
+    行情源基类
+    stream(since) 异步产生 (seq, Market, recv_ns)，只包含 seq > since 的更新，
+    以便断线重连后从上次处理的位置续传；recv_ns 为收到原始消息时的 perf_counter_ns
+    """
+
+    async def stream(self, since: int = 0) -> AsyncIterator[Tuple[int, Market, int]]:
+        raise NotImplementedError
+        yield
+
+    async def close(self):
+        pass
+
+
+class ReplayFileSource(MarketUpdateSource):
+    """
+    本地回放文件行情源 (JSON Lines)
+    speed: 0 表示不等待尽快回放；>0 时按事件时间间隔 / speed 等待
+    """
+
+    def __init__(self, path: str, speed: float = 0.0, yield_every: int = 256):
+        self.path = path
+        self.speed = speed
+        self.yield_every = yield_every
+
+    async def stream(self, since: int = 0) -> AsyncIterator[Tuple[int, Market, int]]:
+        last_ts = None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for n, line in enumerate(f):
+                recv_ns = time.perf_counter_ns()
+                seq, market = message_to_market(json.loads(line))
+                if seq <= since:
+                    continue
+
+                if self.speed > 0 and last_ts is not None:
+                    delay = (market.timestamp - last_ts).total_seconds() / self.speed
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                        recv_ns = time.perf_counter_ns()
+                elif n % self.yield_every == 0:
+                    # 让出事件循环，避免长时间独占
+                    await asyncio.sleep(0)
+                last_ts = market.timestamp
+
+                yield seq, market, recv_ns
+
+
+class WebSocketSource(MarketUpdateSource):
+    """WebSocket 行情源，连接时通过 ?since= 请求续传"""
+
+    def __init__(self, url: str, heartbeat: float = 30.0):
+        self.url = url
+        self.heartbeat = heartbeat
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def stream(self, since: int = 0) -> AsyncIterator[Tuple[int, Market, int]]:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+
+        async with self._session.ws_connect(self.url, params={"since": str(since)}, heartbeat=self.heartbeat) as ws:
+            async for msg in ws:
+                recv_ns = time.perf_counter_ns()
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    payload = json.loads(msg.data)
+                    if payload.get("type") == "end":
+                        return
+                    seq, market = message_to_market(payload)
+                    yield seq, market, recv_ns
+                elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+
+        # 未收到 end 消息即断开，视为连接中断
+        raise ConnectionError("WebSocket closed before end of stream")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class MockWebSocketServer:
+    """
+    测试用本地 WebSocket 行情服务器
+    回放给定事件序列，支持 ?since= 续传；drop_after 可模拟第一次连接在发送 N 条后断线
+    """
+
+    def __init__(
+        self,
+        markets: Iterable[Market],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        interval: float = 0.0,
+        drop_after: Optional[int] = None
+    ):
+        self.messages = [market_to_message(seq, m) for seq, m in enumerate(markets, start=1)]
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.drop_after = drop_after
+        self.connections = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handler(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        since = int(request.query.get("since", 0))
+        drop_after = self.drop_after if self.connections == 1 else None
+
+        for sent, message in enumerate(self.messages[since:], start=1):
+            await ws.send_str(message)
+            if drop_after is not None and sent >= drop_after:
+                await ws.close()
+                return ws
+            if self.interval > 0:
+                await asyncio.sleep(self.interval)
+
+        await ws.send_str(json.dumps({"type": "end"}))
+        await ws.close()
+        return ws
+
+    async def start(self) -> str:
+        """启动服务器，返回 ws:// 地址"""
+        app = web.Application()
+        app.router.add_get("/ws", self._handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        return f"ws://{host}:{port}/ws"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+# ==================== 模拟盘引擎 ====================
+
+@dataclass
+class OrderIntent:
+    """一次开仓决策（订单意图）"""
+    seq: int
+    market_id: str
+    side: str
+    size: float
+    price: float
+    strategy: str
+    latency_us: float
+
+
+class LatencyTracker:
+    """记录最近 N 次 行情->决策 延迟（微秒）"""
+
+    def __init__(self, window: int = 100000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, latency_us: float):
+        self.samples.append(latency_us)
+        self.count += 1
+
+    def summary(self) -> Dict:
+        if not self.samples:
+            return {"count": 0, "p50_us": 0, "p99_us": 0, "max_us": 0}
+        values = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        return {
+            "count": self.count,
+            "p50_us": float(np.percentile(values, 50)),
+            "p99_us": float(np.percentile(values, 99)),
+            "max_us": float(values.max()),
+        }
+
+
+class PaperTradingEngine:
+    """
+    模拟盘引擎
+    每条行情更新直接复用 BacktestEngine.process_market 做出决策，
+    定期持久化引擎状态快照，连接中断时按指数退避重连并从上次 seq 续传
+    """
+
+    def __init__(
+        self,
+        engine: BacktestEngine,
+        source: MarketUpdateSource,
+        snapshot_path: Optional[str] = None,
+        snapshot_every: int = 1000,
+        max_reconnects: int = 10,
+        reconnect_backoff: float = 0.5
+    ):
+        self.engine = engine
+        self.source = source
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.max_reconnects = max_reconnects
+        self.reconnect_backoff = reconnect_backoff
+
+        self.last_seq = 0
+        self.updates = 0
+        self.reconnects = 0
+        self.halted = False
+        self.latency = LatencyTracker()
+        self.intents: deque = deque(maxlen=10000)
+
+    # ---------- 决策 ----------
+
+    def on_update(self, seq: int, market: Market, recv_ns: Optional[int] = None) -> List[OrderIntent]:
+        """处理一条行情更新，返回本次产生的订单意图"""
+        if recv_ns is None:
+            recv_ns = time.perf_counter_ns()
+
+        trades = self.engine.portfolio.trades
+        n_before = len(trades)
+        if not self.engine.process_market(market):
+            self.halted = True
+        latency_us = (time.perf_counter_ns() - recv_ns) / 1000
+
+        self.latency.add(latency_us)
+        self.last_seq = seq
+        self.updates += 1
+
+        intents = []
+        buy = ACTIONS.index("BUY")
+        for row in trades.rows(n_before):
+            if row["action"] != buy:
+                continue
+            intent = OrderIntent(
+                seq=seq,
+                market_id=trades.market_ids[row["market"]],
+                side=SIDES[row["side"]],
+                size=float(row["size"]),
+                price=float(row["price"]),
+                strategy=STRATEGY_TYPES[row["strategy"]].value,
+                latency_us=latency_us
+            )
+            intents.append(intent)
+            self.intents.append(intent)
+
+        if self.snapshot_path and self.updates % self.snapshot_every == 0:
+            self.save_snapshot()
+        return intents
+
+    # ---------- 运行循环 ----------
+
+    async def run(self) -> Dict:
+        """消费行情直到行情结束或触发风控停止"""
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            self.load_snapshot()
+
+        failures = 0
+        try:
+            while not self.halted:
+                try:
+                    async for seq, market, recv_ns in self.source.stream(self.last_seq):
+                        self.on_update(seq, market, recv_ns)
+                        failures = 0
+                        if self.halted:
+                            break
+                    break
+                except (ConnectionError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    failures += 1
+                    if failures > self.max_reconnects:
+                        raise
+                    self.reconnects += 1
+                    delay = self.reconnect_backoff * 2 ** (failures - 1)
+                    print(f"[WARN] 行情连接中断 ({e})，{delay:.1f}s 后从 seq={self.last_seq} 重连")
+                    await asyncio.sleep(delay)
+        finally:
+            await self.source.close()
+            if self.snapshot_path:
+                self.save_snapshot()
+
+        return self.summary()
+
+    def summary(self) -> Dict:
+        portfolio = self.engine.portfolio
+        return {
+            "updates": self.updates,
+            "last_seq": self.last_seq,
+            "reconnects": self.reconnects,
+            "halted": self.halted,
+            "cash": portfolio.cash,
+            "equity": portfolio.total_value,
+            "open_positions": len(portfolio.positions),
+            "trades": len(portfolio.trades),
+            "latency": self.latency.summary(),
+            "metrics": self.engine.live_stats(),
+        }
+
+    # ---------- 状态快照 ----------
+
+    def save_snapshot(self):
+        """
+        原子写入状态快照：复用 BacktestEngine 检查点（组合、成交流水、风控、策略内部状态、
+        绩效累加器、持仓归属），附带行情位置与风控停止标记
+        """
+        self.engine.save_checkpoint(
+            self.snapshot_path,
+            cursor=self.last_seq,
+            halted=self.halted,
+            updates=self.updates,
+            saved_at=datetime.now()
+        )
+
+    def load_snapshot(self):
+        """从快照恢复引擎全部状态、行情位置与风控停止标记"""
+        state = self.engine.load_checkpoint(self.snapshot_path)
+        self.last_seq = state["cursor"]
+        self.halted = state.get("halted", False)
+        self.updates = state.get("updates", 0)
+
+
+def create_default_engine(initial_capital: float = 10000) -> BacktestEngine:
+    """构建与回测相同配置的引擎"""
+    engine = BacktestEngine(initial_capital=initial_capital, fee_rate=0.01)
+    engine.add_strategy(MarketMakingStrategy(spread_target=0.02, position_limit=500))
+    engine.add_strategy(ArbitrageStrategy(min_profit_threshold=0.005))
+    engine.add_strategy(MomentumStrategy(lookback=10, threshold=0.05))
+    engine.add_strategy(MeanReversionStrategy(oversold_threshold=0.25, overbought_threshold=0.75))
+    engine.add_strategy(SentimentStrategy(volume_threshold=2.0))
+    engine.add_strategy(WhaleTrackingStrategy(large_order_threshold=10000))
+    return engine
+
+
+async def _demo(replay_path: Optional[str] = None):
+    """演示: 有回放文件时回放文件，否则启动模拟 WebSocket 服务器（第一次连接中途断线）"""
+    engine = create_default_engine()
+
+    if replay_path:
+        source = ReplayFileSource(replay_path)
+        summary = await PaperTradingEngine(engine, source, snapshot_path="paper_portfolio.ckpt").run()
+    else:
+        tape = MarketDataGenerator(seed=42).generate_tape(days=7, markets_per_day=3)
+        server = MockWebSocketServer(tape, drop_after=2000)
+        url = await server.start()
+        try:
+            source = WebSocketSource(url)
+            summary = await PaperTradingEngine(engine, source, reconnect_backoff=0.1).run()
+        finally:
+            await server.stop()
+
+    latency = summary["latency"]
+    print(f"处理更新: {summary['updates']}  重连: {summary['reconnects']}  权益: ${summary['equity']:,.2f}")
+    print(f"决策延迟: p50={latency['p50_us']:.1f}µs  p99={latency['p99_us']:.1f}µs  max={latency['max_us']:.1f}µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo(sys.argv[1] if len(sys.argv) > 1 else None))
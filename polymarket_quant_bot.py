@@ -6,21 +6,23 @@ Polymarket 量化交易机器人
 """
 
 import numpy as np
-import pandas as pd
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Tuple
+from typing import Any, List, Dict, Iterable, Optional, Tuple
 from enum import Enum
 from datetime import datetime, timedelta
+import hashlib
 import json
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from collections import defaultdict
+import os
+import pickle
+import struct
+import zlib
+from array import array
+from collections import deque
+from itertools import islice
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial Unicode MS', 'SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+# 图表/报告见 polymarket_report（按需导入 matplotlib，回测与参数扫描不承担其导入开销）
 
 # ==================== 枚举和数据类 ====================
 
@@ -36,8 +38,9 @@ class StrategyType(Enum):
     MEAN_REVERSION = "Mean Reversion"
     SENTIMENT = "Sentiment Based"
     WHALE_TRACKING = "Whale Tracking"
+    CROSS_MARKET_ARBITRAGE = "Cross-Market Arbitrage"
 
-@dataclass
+@dataclass(slots=True)
 class Market:
     """预测市场数据类"""
     market_id: str
@@ -50,7 +53,7 @@ class Market:
     timestamp: datetime
     resolution: Optional[bool] = None  # True=Yes wins, False=No wins, None=unresolved
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     """持仓数据类"""
     market_id: str
@@ -61,6 +64,9 @@ class Position:
     entry_time: datetime
     stop_loss: Optional[float] = None
     take_profit: Optional[float] = None
+    strategy: Optional[StrategyType] = None  # 开仓策略
+    position_id: int = -1                    # 引擎分配的持仓编号（单调递增）
+    realized_pnl: float = 0                  # 已实现盈亏（部分平仓累计）
 
     @property
     def value(self) -> float:
@@ -76,10 +82,10 @@ class Position:
             return 0
         return (self.current_price - self.entry_price) / self.entry_price * 100
 
-@dataclass
+@dataclass(slots=True)
 class Trade:
     """交易记录"""
-    trade_id: str
+    trade_id: int
     market_id: str
     side: str
     action: str  # "BUY" or "SELL"
@@ -88,22 +94,573 @@ class Trade:
     timestamp: datetime
     strategy: StrategyType
     pnl: float = 0
+    position_id: int = -1
+
+    @property
+    def label(self) -> str:
+        return f"trade_{self.trade_id:04d}"
+
+# ==================== 紧凑存储 ====================
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+SIDES = ("YES", "NO")
+ACTIONS = ("BUY", "SELL")
+STRATEGY_TYPES = tuple(StrategyType)
+_SIDE_CODES = {s: i for i, s in enumerate(SIDES)}
+_ACTION_CODES = {a: i for i, a in enumerate(ACTIONS)}
+_STRATEGY_CODES = {s: i for i, s in enumerate(STRATEGY_TYPES)}
+
+
+def to_us(ts: datetime) -> int:
+    """datetime -> 微秒整数（无时区）"""
+    return (ts - _EPOCH) // _ONE_US
+
+
+def from_us(us: int) -> datetime:
+    """微秒整数 -> datetime"""
+    return _EPOCH + timedelta(microseconds=int(us))
+
+
+class MarketTape:
+    """
+    列式市场事件序列
+    每个事件只保存数值列和市场编号（约 45 字节），问题/分类等字符串每个市场只存一份，
+    迭代时按需构造 Market，避免整段回测期间持有全部 Market 对象
+    """
+
+    def __init__(self):
+        self.market_ids: List[str] = []
+        self.questions: List[str] = []
+        self.categories: List[str] = []
+        self._market_index: Dict[str, int] = {}
+
+        # 构建阶段的追加缓冲
+        self._buffers = {
+            "codes": array("i"),
+            "yes_prices": array("d"),
+            "no_prices": array("d"),
+            "volumes": array("d"),
+            "liquidity": array("d"),
+            "timestamps": array("q"),
+            "resolutions": array("b"),
+        }
+
+        self.codes = self.yes_prices = self.no_prices = None
+        self.volumes = self.liquidity = self.timestamps = self.resolutions = None
+
+    def _intern(self, market: Market) -> int:
+        code = self._market_index.get(market.market_id)
+        if code is None:
+            code = len(self.market_ids)
+            self._market_index[market.market_id] = code
+            self.market_ids.append(market.market_id)
+            self.questions.append(market.question)
+            self.categories.append(market.category)
+        return code
+
+    def append(self, market: Market):
+        """追加一个事件（finalize 之前）"""
+        b = self._buffers
+        b["codes"].append(self._intern(market))
+        b["yes_prices"].append(market.yes_price)
+        b["no_prices"].append(market.no_price)
+        b["volumes"].append(market.volume)
+        b["liquidity"].append(market.liquidity)
+        b["timestamps"].append(to_us(market.timestamp))
+        b["resolutions"].append(-1 if market.resolution is None else int(market.resolution))
+
+    def finalize(self, sort: bool = True) -> "MarketTape":
+        """转换为 NumPy 列，并按时间稳定排序（与 list.sort(key=timestamp) 顺序一致）"""
+        buffers, self._buffers = self._buffers, None
+        order = None
+        if sort:
+            order = np.argsort(np.frombuffer(buffers["timestamps"], dtype=np.int64), kind="stable")
+
+        # 逐列转换并立即释放缓冲，峰值内存只多出一列
+        for name in list(buffers):
+            buf = buffers.pop(name)
+            view = np.frombuffer(buf, dtype=buf.typecode)
+            setattr(self, name, view[order] if order is not None else view.copy())
+            del view, buf
+        return self
+
+    def __len__(self) -> int:
+        if self.codes is None:
+            return len(self._buffers["codes"])
+        return len(self.codes)
+
+    def market_at(self, i: int) -> Market:
+        code = int(self.codes[i])
+        res = self.resolutions[i]
+        return Market(
+            market_id=self.market_ids[code],
+            question=self.questions[code],
+            category=self.categories[code],
+            yes_price=float(self.yes_prices[i]),
+            no_price=float(self.no_prices[i]),
+            volume=float(self.volumes[i]),
+            liquidity=float(self.liquidity[i]),
+            timestamp=from_us(self.timestamps[i]),
+            resolution=None if res < 0 else bool(res)
+        )
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            view = object.__new__(MarketTape)
+            view.market_ids = self.market_ids
+            view.questions = self.questions
+            view.categories = self.categories
+            view._market_index = self._market_index
+            view._buffers = None
+            for name in ("codes", "yes_prices", "no_prices", "volumes", "liquidity", "timestamps", "resolutions"):
+                setattr(view, name, getattr(self, name)[key])
+            return view
+        if key < 0:
+            key += len(self)
+        return self.market_at(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.market_at(i)
+
+    def snapshot_bounds(self) -> List[Tuple[int, int]]:
+        """按时间戳分组，返回每个时间点的 [start, stop) 行区间（用于批量评估）"""
+        if len(self) == 0:
+            return []
+        edges = np.flatnonzero(np.diff(self.timestamps)) + 1
+        starts = np.concatenate(([0], edges))
+        stops = np.concatenate((edges, [len(self)]))
+        return list(zip(starts.tolist(), stops.tolist()))
+
+
+class TradeLedger:
+    """
+    追加式成交流水
+    NumPy 结构化数组按块扩容，市场编号/方向/动作/策略均以整数编码存储；
+    按下标或迭代访问时再还原为 Trade
+
+    每笔成交带 position_id，并记录每个持仓的开仓成交 trade_id，因此 持仓 -> 开仓成交 为 O(1)；
+    分策略的开仓/平仓/盈利次数与累计盈亏在写入时增量汇总：盈亏逐笔累计，
+    平仓与盈利次数按持仓计（持仓剩余份额归零时按其全部平仓盈亏计一次）
+    """
+
+    DTYPE = np.dtype([
+        ("trade_id", np.int64),
+        ("market", np.int32),
+        ("side", np.int8),
+        ("action", np.int8),
+        ("strategy", np.int8),
+        ("size", np.float64),
+        ("price", np.float64),
+        ("timestamp", np.int64),
+        ("pnl", np.float64),
+        ("position_id", np.int64),
+    ])
+
+    # _strategy_totals 的列
+    AGG_OPENED, AGG_CLOSED, AGG_WINS, AGG_PNL = range(4)
+
+    def __init__(self, chunk_size: int = 4096):
+        self.chunk_size = chunk_size
+        self._data = np.zeros(chunk_size, dtype=self.DTYPE)
+        self._n = 0
+        self.market_ids: List[str] = []
+        self._market_index: Dict[str, int] = {}
+        self._strategy_totals = np.zeros((len(STRATEGY_TYPES), 4))
+        self._opening: Dict[int, int] = {}  # position_id -> 开仓成交 trade_id
+        self._open: Dict[int, List[float]] = {}  # 未平完的 position_id -> [剩余份额, 已实现盈亏]
+
+    def __getstate__(self):
+        # 只序列化已写入部分，不带预分配的空行
+        state = self.__dict__.copy()
+        state["_data"] = self._data[:self._n].copy()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        data = np.zeros(max(self.chunk_size, self._n), dtype=self.DTYPE)
+        data[:self._n] = self._data
+        self._data = data
+
+    def _grow(self):
+        grown = np.zeros(len(self._data) + max(self.chunk_size, len(self._data)), dtype=self.DTYPE)
+        grown[:self._n] = self._data[:self._n]
+        self._data = grown
+
+    def record(self, market_id: str, side: str, action: str, size: float, price: float,
+               timestamp: datetime, strategy: StrategyType, pnl: float = 0,
+               position_id: Optional[int] = None) -> int:
+        """
+        追加一笔成交，返回 trade_id
+        position_id 缺省时视为开仓，使用本笔 trade_id 作为持仓编号；
+        每个 position_id 的第一笔成交记为其开仓成交
+        """
+        if self._n == len(self._data):
+            self._grow()
+
+        code = self._market_index.get(market_id)
+        if code is None:
+            code = len(self.market_ids)
+            self._market_index[market_id] = code
+            self.market_ids.append(market_id)
+
+        trade_id = self._n
+        if position_id is None:
+            position_id = trade_id
+        self._opening.setdefault(position_id, trade_id)
+        strategy_code = _STRATEGY_CODES[strategy]
+        action_code = _ACTION_CODES[action]
+        self._data[trade_id] = (
+            trade_id, code, _SIDE_CODES[side], action_code, strategy_code,
+            size, price, to_us(timestamp), pnl, position_id
+        )
+        self._n += 1
+
+        totals = self._strategy_totals[strategy_code]
+        state = self._open.setdefault(position_id, [0.0, 0.0])
+        if action_code == _ACTION_CODES["BUY"]:
+            totals[self.AGG_OPENED] += 1
+            state[0] += size
+        else:
+            totals[self.AGG_PNL] += pnl
+            state[0] -= size
+            state[1] += pnl
+            if state[0] <= 1e-9:
+                totals[self.AGG_CLOSED] += 1
+                totals[self.AGG_WINS] += state[1] > 0
+                del self._open[position_id]
+        return trade_id
+
+    def append(self, trade: Trade):
+        """兼容 list.append(Trade) 的写法"""
+        self.record(trade.market_id, trade.side, trade.action, trade.size, trade.price,
+                    trade.timestamp, trade.strategy, trade.pnl,
+                    None if trade.position_id < 0 else trade.position_id)
+
+    def opening_trade(self, position_id: int) -> Trade:
+        """持仓 -> 开仓成交 (O(1))"""
+        return self[self._opening[position_id]]
+
+    def opening_strategy(self, position_id: int) -> StrategyType:
+        """持仓 -> 开仓策略 (O(1)，不构造 Trade)"""
+        return STRATEGY_TYPES[self._data["strategy"][self._opening[position_id]]]
+
+    def position_trades(self, position_id: int) -> np.ndarray:
+        """某持仓的全部成交记录（向量化筛选）"""
+        rows = self._data[:self._n]
+        return rows[rows["position_id"] == position_id]
+
+    def strategy_summary(self) -> Dict[str, Dict]:
+        """分策略汇总（增量维护，O(策略数)）"""
+        summary = {}
+        for code, (opened, closed, wins, pnl) in enumerate(self._strategy_totals):
+            if opened or closed:
+                summary[STRATEGY_TYPES[code].value] = {
+                    "opened": int(opened),
+                    "closed": int(closed),
+                    "wins": int(wins),
+                    "win_rate": float(wins / closed * 100) if closed else 0,
+                    "total_pnl": float(pnl),
+                }
+        return summary
+
+    def column(self, name: str) -> np.ndarray:
+        """返回已写入部分某一列的视图"""
+        return self._data[name][:self._n]
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """返回 [start, stop) 区间原始记录的视图"""
+        return self._data[start:self._n if stop is None else min(stop, self._n)]
+
+    def _to_trade(self, row) -> Trade:
+        return Trade(
+            trade_id=int(row["trade_id"]),
+            market_id=self.market_ids[row["market"]],
+            side=SIDES[row["side"]],
+            action=ACTIONS[row["action"]],
+            size=float(row["size"]),
+            price=float(row["price"]),
+            timestamp=from_us(row["timestamp"]),
+            strategy=STRATEGY_TYPES[row["strategy"]],
+            pnl=float(row["pnl"]),
+            position_id=int(row["position_id"])
+        )
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._to_trade(row) for row in self._data[:self._n][key]]
+        if key < 0:
+            key += self._n
+        if not 0 <= key < self._n:
+            raise IndexError("trade index out of range")
+        return self._to_trade(self._data[key])
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self._to_trade(self._data[i])
+
+
+class EquityCurve:
+    """
+    权益曲线：时间戳（微秒）与权益值两列 array 存储
+    迭代/下标访问返回 (datetime, value) 元组，兼容原 List[Tuple[datetime, float]]
+    """
+
+    def __init__(self):
+        self._timestamps = array("q")
+        self._values = array("d")
+
+    def append(self, point: Tuple[datetime, float]):
+        self._timestamps.append(to_us(point[0]))
+        self._values.append(point[1])
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return np.frombuffer(self._timestamps, dtype=np.int64).copy() if self._timestamps else np.zeros(0, dtype=np.int64)
+
+    @property
+    def values(self) -> np.ndarray:
+        return np.frombuffer(self._values, dtype=np.float64).copy() if self._values else np.zeros(0)
+
+    def dates(self) -> List[datetime]:
+        return [from_us(t) for t in self._timestamps]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [(from_us(t), v) for t, v in zip(self._timestamps[key], self._values[key])]
+        return from_us(self._timestamps[key]), self._values[key]
+
+    def __iter__(self):
+        for t, v in zip(self._timestamps, self._values):
+            yield from_us(t), v
+
+# ==================== 持仓簿 ====================
+
+@dataclass(slots=True)
+class NetPosition:
+    """单个市场的净持仓（多条持仓腿的聚合视图）"""
+    market_id: str
+    yes_size: float
+    no_size: float
+    value: float  # 各腿市值之和
+    legs: int
+
+    @property
+    def side(self) -> str:
+        """净方向"""
+        return "YES" if self.yes_size >= self.no_size else "NO"
+
+    @property
+    def size(self) -> float:
+        """净份额 |YES - NO|"""
+        return abs(self.yes_size - self.no_size)
+
+    @property
+    def hedged_size(self) -> float:
+        """YES+NO 配对份额（结算时每对固定兑付 1）"""
+        return min(self.yes_size, self.no_size)
+
+
+class PositionBook:
+    """
+    持仓簿：按 (market_id, side, strategy) 保存多条持仓腿
+    不同策略、同一市场的 YES/NO 两侧可同时持有；同一键重复开仓合并为一条腿（加权平均成本）
+    份额/现价/成本另存于 NumPy 列，组合市值与浮动盈亏向量化计算
+    腿的份额与现价只能经 add / reduce / remove / mark 修改，以保持两份数据一致
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._legs: Dict[Tuple[str, str, Optional[StrategyType]], Position] = {}
+        self._by_market: Dict[str, List[Position]] = {}
+        self._slots: Dict[int, int] = {}  # id(position) -> 列下标
+        self._free: List[int] = []
+        self._hw = 0  # 已使用过的最高下标
+        self._size = np.zeros(capacity)
+        self._price = np.zeros(capacity)
+        self._entry = np.zeros(capacity)
+        self._strategy = np.zeros(capacity, dtype=np.int8)
+
+    def __getstate__(self):
+        # _slots 以对象 id 为键，反序列化后需按新对象重建
+        state = self.__dict__.copy()
+        state["_slots"] = [(p, self._slots[id(p)]) for p in self._legs.values()]
+        return state
+
+    def __setstate__(self, state):
+        slots = state.pop("_slots")
+        self.__dict__.update(state)
+        self._slots = {id(p): slot for p, slot in slots}
+
+    @staticmethod
+    def key(position: Position) -> Tuple[str, str, Optional[StrategyType]]:
+        return position.market_id, position.side, position.strategy
+
+    def _alloc(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._hw == len(self._size):
+            n = len(self._size) * 2
+            for name in ("_size", "_price", "_entry", "_strategy"):
+                col = getattr(self, name)
+                grown = np.zeros(n, dtype=col.dtype)
+                grown[:self._hw] = col[:self._hw]
+                setattr(self, name, grown)
+        self._hw += 1
+        return self._hw - 1
+
+    def _sync(self, position: Position):
+        slot = self._slots[id(position)]
+        self._size[slot] = position.size
+        self._price[slot] = position.current_price
+        self._entry[slot] = position.entry_price
+
+    def add(self, position: Position) -> Position:
+        """
+        加入一条持仓，返回所在的腿
+        已有同键持仓时合并份额并按加权平均更新成本，返回原有的腿
+        """
+        leg = self._legs.get(self.key(position))
+        if leg is not None:
+            total = leg.size + position.size
+            leg.entry_price = (leg.size * leg.entry_price + position.size * position.entry_price) / total
+            leg.size = total
+            leg.current_price = position.current_price
+            self._sync(leg)
+            return leg
+
+        slot = self._alloc()
+        self._slots[id(position)] = slot
+        self._strategy[slot] = -1 if position.strategy is None else _STRATEGY_CODES[position.strategy]
+        self._legs[self.key(position)] = position
+        self._by_market.setdefault(position.market_id, []).append(position)
+        self._sync(position)
+        return position
+
+    def reduce(self, position: Position, size: float):
+        """部分平仓：减少份额"""
+        position.size -= size
+        self._size[self._slots[id(position)]] = position.size
+
+    def remove(self, position: Position):
+        """移除一条腿"""
+        del self._legs[self.key(position)]
+        legs = self._by_market[position.market_id]
+        legs[:] = [p for p in legs if p is not position]
+        if not legs:
+            del self._by_market[position.market_id]
+        slot = self._slots.pop(id(position))
+        self._size[slot] = self._price[slot] = self._entry[slot] = 0
+        self._free.append(slot)
+
+    def mark(self, market_id: str, yes_price: float, no_price: float):
+        """按最新报价更新该市场所有腿的现价"""
+        for position in self._by_market.get(market_id, ()):
+            position.current_price = yes_price if position.side == "YES" else no_price
+            self._price[self._slots[id(position)]] = position.current_price
+
+    def leg(self, market_id: str, side: str, strategy: Optional[StrategyType]) -> Optional[Position]:
+        return self._legs.get((market_id, side, strategy))
+
+    def market_legs(self, market_id: str) -> List[Position]:
+        """该市场的全部持仓腿（副本，可在遍历中平仓）"""
+        return list(self._by_market.get(market_id, ()))
+
+    def holds(self, market_id: str, strategy: Optional[StrategyType] = None) -> bool:
+        """是否持有该市场（可限定开仓策略）"""
+        legs = self._by_market.get(market_id)
+        if not legs:
+            return False
+        return strategy is None or any(p.strategy == strategy for p in legs)
+
+    def get(self, market_id: str, strategy: Optional[StrategyType] = None) -> Optional[NetPosition]:
+        """该市场的净持仓（可限定开仓策略），无持仓返回 None"""
+        yes_size = no_size = value = 0.0
+        legs = 0
+        for p in self._by_market.get(market_id, ()):
+            if strategy is not None and p.strategy != strategy:
+                continue
+            if p.side == "YES":
+                yes_size += p.size
+            else:
+                no_size += p.size
+            value += p.value
+            legs += 1
+        if not legs:
+            return None
+        return NetPosition(market_id, yes_size, no_size, value, legs)
+
+    def net_positions(self) -> List[NetPosition]:
+        """所有市场的净持仓"""
+        return [self.get(market_id) for market_id in self._by_market]
+
+    def market_value(self, market_id: Optional[str] = None) -> float:
+        """持仓市值；market_id 为 None 时为全部腿（向量化）"""
+        if market_id is not None:
+            return sum(p.value for p in self._by_market.get(market_id, ()))
+        n = self._hw
+        return float(self._size[:n] @ self._price[:n])
+
+    def unrealized_pnl(self) -> float:
+        n = self._hw
+        return float(self._size[:n] @ (self._price[:n] - self._entry[:n]))
+
+    def strategy_values(self) -> Dict[StrategyType, float]:
+        """分策略持仓市值（子组合）"""
+        n = self._hw
+        codes = self._strategy[:n].astype(np.int64)
+        known = codes >= 0
+        values = np.bincount(codes[known], weights=(self._size[:n] * self._price[:n])[known],
+                             minlength=len(STRATEGY_TYPES))
+        return {s: float(values[i]) for i, s in enumerate(STRATEGY_TYPES) if values[i]}
+
+    def markets(self) -> List[str]:
+        return list(self._by_market)
+
+    def values(self) -> List[Position]:
+        return list(self._legs.values())
+
+    def items(self):
+        return list(self._legs.items())
+
+    def keys(self):
+        return list(self._legs)
+
+    def __len__(self) -> int:
+        return len(self._legs)
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def __contains__(self, item) -> bool:
+        """市场编号 -> 是否有任一持仓腿；(market_id, side, strategy) -> 该腿是否存在"""
+        if isinstance(item, tuple):
+            return item in self._legs
+        return item in self._by_market
+
 
 @dataclass
 class Portfolio:
     """投资组合"""
     cash: float
-    positions: Dict[str, Position] = field(default_factory=dict)
-    trades: List[Trade] = field(default_factory=list)
-    equity_curve: List[Tuple[datetime, float]] = field(default_factory=list)
+    positions: PositionBook = field(default_factory=PositionBook)
+    trades: TradeLedger = field(default_factory=TradeLedger)
+    equity_curve: EquityCurve = field(default_factory=EquityCurve)
 
     @property
     def total_value(self) -> float:
-        return self.cash + sum(p.value for p in self.positions.values())
+        return self.cash + self.positions.market_value()
 
     @property
     def total_pnl(self) -> float:
-        return sum(p.pnl for p in self.positions.values())
+        return self.positions.unrealized_pnl()
 
 # ==================== 市场数据生成器 ====================
 
@@ -234,6 +791,146 @@ class MarketDataGenerator:
 
         return markets
 
+    def generate_tape(self, days: int = 90, markets_per_day: int = 5,
+                      start_date: Optional[datetime] = None) -> MarketTape:
+        """
+        生成历史市场数据并直接写入列式 MarketTape（已按时间排序）
+        随机数消耗顺序与 generate_historical_data 完全一致
+        start_date: 数据起点，缺省为 days 天前
+        """
+        tape = MarketTape()
+        start_date = start_date or datetime.now() - timedelta(days=days)
+
+        for day in range(days):
+            current_date = start_date + timedelta(days=day)
+            for _ in range(markets_per_day):
+                market = self.generate_market(current_date)
+
+                lifecycle_hours = np.random.randint(24, 720)
+                for hour in range(lifecycle_hours):
+                    market = self.update_market_price(market)
+                    if hour == lifecycle_hours - 1:
+                        market = self.resolve_market(market)
+                    tape.append(market)
+
+        return tape.finalize(sort=True)
+
+# ==================== 批量评估 ====================
+
+# analyze_batch 返回的信号编码（下标对应 BATCH_SIGNALS）
+BATCH_SIGNALS = (None, Signal.BUY, Signal.SELL, Signal.HOLD)
+NO_SIGNAL, BATCH_BUY, BATCH_SELL, BATCH_HOLD = range(4)
+SIDE_YES, SIDE_NO = SIDES.index("YES"), SIDES.index("NO")
+
+
+@dataclass
+class MarketBatch:
+    """同一时间点上多个市场的列式快照，供 TradingStrategy.analyze_batch 使用"""
+    market_ids: List[str]
+    yes_prices: np.ndarray
+    no_prices: np.ndarray
+    volumes: np.ndarray
+    liquidity: np.ndarray
+    held: np.ndarray                     # bool, 组合中是否已有该市场持仓（任一策略）
+    held_values: np.ndarray              # 已有持仓市值（无持仓为 0）
+    held_sides: np.ndarray               # 净持仓方向编码（SIDE_YES / SIDE_NO）
+    timestamp: Optional[datetime] = None
+    book: Optional[PositionBook] = None
+    _held_by: Dict = field(default_factory=dict, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.market_ids)
+
+    @staticmethod
+    def _holdings(market_ids: List[str], book: Optional[PositionBook],
+                  strategy: Optional[StrategyType] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n = len(market_ids)
+        held = np.zeros(n, dtype=bool)
+        held_values = np.zeros(n)
+        held_sides = np.zeros(n, dtype=np.int8)
+        if book:
+            for i, market_id in enumerate(market_ids):
+                if market_id not in book:
+                    continue
+                position = book.get(market_id, strategy)
+                if position is not None:
+                    held[i] = True
+                    held_values[i] = position.value
+                    held_sides[i] = _SIDE_CODES[position.side]
+        return held, held_values, held_sides
+
+    def held_by(self, strategy: StrategyType) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """某一策略自己的 (held, held_values, held_sides)，按策略缓存"""
+        holdings = self._held_by.get(strategy)
+        if holdings is None:
+            holdings = self._held_by[strategy] = self._holdings(self.market_ids, self.book, strategy)
+        return holdings
+
+    @classmethod
+    def _with_holdings(cls, market_ids: List[str], columns: Dict, portfolio: Portfolio,
+                       timestamp: Optional[datetime]) -> "MarketBatch":
+        held, held_values, held_sides = cls._holdings(market_ids, portfolio.positions)
+        return cls(market_ids=market_ids, held=held, held_values=held_values, held_sides=held_sides,
+                   timestamp=timestamp, book=portfolio.positions, **columns)
+
+    @classmethod
+    def from_markets(cls, markets: List[Market], portfolio: Portfolio) -> "MarketBatch":
+        """由 Market 列表构建"""
+        n = len(markets)
+        columns = {
+            "yes_prices": np.fromiter((m.yes_price for m in markets), dtype=np.float64, count=n),
+            "no_prices": np.fromiter((m.no_price for m in markets), dtype=np.float64, count=n),
+            "volumes": np.fromiter((m.volume for m in markets), dtype=np.float64, count=n),
+            "liquidity": np.fromiter((m.liquidity for m in markets), dtype=np.float64, count=n),
+        }
+        timestamp = markets[0].timestamp if markets else None
+        return cls._with_holdings([m.market_id for m in markets], columns, portfolio, timestamp)
+
+    @classmethod
+    def from_tape(cls, tape: MarketTape, start: int, stop: int, portfolio: Portfolio,
+                  rows: Optional[np.ndarray] = None) -> "MarketBatch":
+        """
+        由 MarketTape 的 [start, stop) 行构建（列直接切片，不构造 Market）
+        rows: 只取其中这些行（绝对行号，如剔除已结算市场后的行）
+        """
+        index = slice(start, stop) if rows is None else rows
+        columns = {
+            "yes_prices": tape.yes_prices[index],
+            "no_prices": tape.no_prices[index],
+            "volumes": tape.volumes[index],
+            "liquidity": tape.liquidity[index],
+        }
+        market_ids = [tape.market_ids[c] for c in tape.codes[index]]
+        timestamp = from_us(tape.timestamps[start]) if stop > start else None
+        return cls._with_holdings(market_ids, columns, portfolio, timestamp)
+
+    def market(self, i: int) -> Market:
+        """还原第 i 个市场为 Market（用于逐个 analyze 的回退路径）"""
+        return Market(
+            market_id=self.market_ids[i],
+            question="",
+            category="",
+            yes_price=float(self.yes_prices[i]),
+            no_price=float(self.no_prices[i]),
+            volume=float(self.volumes[i]),
+            liquidity=float(self.liquidity[i]),
+            timestamp=self.timestamp
+        )
+
+
+def _empty_batch_result(n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return np.zeros(n, dtype=np.int8), np.zeros(n, dtype=np.int8), np.zeros(n)
+
+
+def _batch_buy(signals: np.ndarray, sizes: np.ndarray, mask: np.ndarray, held: np.ndarray,
+               size: np.ndarray, cap: float):
+    """满足 mask 的市场: 已持仓 -> HOLD (size 0)，否则 -> BUY min(size, cap)"""
+    hold = mask & held
+    buy = mask & ~held
+    signals[hold] = BATCH_HOLD
+    signals[buy] = BATCH_BUY
+    sizes[buy] = np.minimum(size[buy], cap)
+
 # ==================== 交易策略 ====================
 
 class TradingStrategy:
@@ -242,6 +939,9 @@ class TradingStrategy:
     def __init__(self, name: str, strategy_type: StrategyType):
         self.name = name
         self.strategy_type = strategy_type
+        self.is_maker = False  # 是否以挂单方式入场（影响成交模型）
+        self.hold_to_resolution = False  # True: 不设止损止盈，持有至结算（多腿组合不被逐腿平仓）
+        self.multi_leg = False  # 可能给出多腿信号（批量事件路径对其逐个市场调用 analyze）
         self.positions_opened = 0
         self.positions_closed = 0
         self.total_pnl = 0
@@ -251,10 +951,57 @@ class TradingStrategy:
     def analyze(self, market: Market, portfolio: Portfolio) -> Optional[Tuple[Signal, str, float]]:
         """
         分析市场并生成信号
-        Returns: (signal, side, suggested_size)
+        Returns: (signal, side, suggested_size)，多腿信号（如 YES+NO 配对）可返回这样的列表，
+                 多腿信号整体风控：全部腿通过才以同一比例建仓，否则全部放弃；
+                 腿可附带第四个元素 Market，表示按该市场的报价在该市场下单（如跨市场整套建仓）
         """
         raise NotImplementedError
 
+    def analyze_batch(self, batch: MarketBatch, portfolio: Portfolio) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        批量分析同一时间点的多个市场
+        Returns: (signals, sides, sizes) 三个数组
+            signals: BATCH_SIGNALS 下标 (NO_SIGNAL / BATCH_BUY / BATCH_SELL / BATCH_HOLD)
+            sides:   SIDES 下标 (SIDE_YES / SIDE_NO)
+            sizes:   建议仓位
+        默认实现逐个调用 analyze，子类可覆盖为向量化版本
+        每个市场只能表达当前市场的一条腿：多腿信号（或指向其他市场的腿）记为 NO_SIGNAL，
+        不截断为第一条腿；会给出多腿信号的策略应设置 multi_leg，由引擎逐个调用 analyze
+        """
+        signals, sides, sizes = _empty_batch_result(len(batch))
+        for i in range(len(batch)):
+            result = self.analyze(batch.market(i), portfolio)
+            if not result:
+                continue
+            if isinstance(result, list):
+                if len(result) != 1 or len(result[0]) > 3:
+                    continue
+                result = result[0]
+            signal, side, size = result
+            signals[i] = BATCH_SIGNALS.index(signal)
+            sides[i] = _SIDE_CODES[side]
+            sizes[i] = size
+        return signals, sides, sizes
+
+    def warm_start(self, market_id: str, yes_prices: np.ndarray, volumes: np.ndarray):
+        """
+        用预先计算的历史数据预热策略内部状态（默认无状态，不做处理）
+        yes_prices / volumes: 该市场在当前事件之前的历史序列
+        """
+        pass
+
+    def on_market_resolved(self, market_id: str):
+        """市场结算后由引擎调用，释放该市场的内部状态（默认无状态，不做处理）"""
+        pass
+
+    _COUNTERS = ("positions_opened", "positions_closed", "total_pnl", "win_count", "loss_count")
+
+    def params(self) -> Dict:
+        """策略配置（公开的标量属性，不含运行统计），用于检查点指纹"""
+        return {k: v for k, v in vars(self).items()
+                if not k.startswith("_") and k not in self._COUNTERS
+                and isinstance(v, (int, float, str, bool, type(None)))}
+
     def get_stats(self) -> Dict:
         """获取策略统计"""
         total = self.win_count + self.loss_count
@@ -280,6 +1027,7 @@ class MarketMakingStrategy(TradingStrategy):
 
     def __init__(self, spread_target: float = 0.02, position_limit: float = 500):
         super().__init__("Market Maker", StrategyType.MARKET_MAKING)
+        self.is_maker = True
         self.spread_target = spread_target
         self.position_limit = position_limit
 
@@ -291,7 +1039,7 @@ class MarketMakingStrategy(TradingStrategy):
             return None
 
         # 检查当前持仓
-        current_position = portfolio.positions.get(market.market_id)
+        current_position = portfolio.positions.get(market.market_id, self.strategy_type)
         if current_position and current_position.value > self.position_limit:
             return Signal.HOLD, current_position.side, 0
 
@@ -311,6 +1059,28 @@ class MarketMakingStrategy(TradingStrategy):
 
         return Signal.BUY, side, suggested_size
 
+    def analyze_batch(self, batch: MarketBatch, portfolio: Portfolio) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        signals, sides, sizes = _empty_batch_result(len(batch))
+        yes, no = batch.yes_prices, batch.no_prices
+
+        active = np.abs(yes - (1 - no)) >= self.spread_target
+
+        held, held_values, held_sides = batch.held_by(self.strategy_type)
+        hold = active & held & (held_values > self.position_limit)
+        signals[hold] = BATCH_HOLD
+        sides[hold] = held_sides[hold]
+
+        buy_no = yes > 0.5
+        entry = np.where(buy_no, no, yes)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            size = np.minimum(self.position_limit / entry, portfolio.cash * 0.1 / entry)
+
+        buy = active & ~hold & (entry > 0) & (size >= 10)
+        signals[buy] = BATCH_BUY
+        sides[buy] = np.where(buy_no[buy], SIDE_NO, SIDE_YES)
+        sizes[buy] = size[buy]
+        return signals, sides, sizes
+
 
 class ArbitrageStrategy(TradingStrategy):
     """
@@ -318,9 +1088,12 @@ class ArbitrageStrategy(TradingStrategy):
     利用价格 inefficiencies
     """
 
-    def __init__(self, min_profit_threshold: float = 0.005):
+    def __init__(self, min_profit_threshold: float = 0.005, hedge: bool = False):
         super().__init__("Arbitrage", StrategyType.ARBITRAGE)
         self.min_profit_threshold = min_profit_threshold
+        self.hedge = hedge  # True: 同时买入等份额 YES 和 NO（两条腿）
+        self.hold_to_resolution = hedge  # 配对持有至结算，不逐腿止损止盈
+        self.multi_leg = hedge
 
     def analyze(self, market: Market, portfolio: Portfolio) -> Optional[Tuple[Signal, str, float]]:
         # 检查 YES + NO 是否小于 1（套利机会）
@@ -335,8 +1108,12 @@ class ArbitrageStrategy(TradingStrategy):
         if profit_pct < self.min_profit_threshold:
             return None
 
-        # 套利：同时买 YES 和 NO
-        # 返回较大价差的一侧
+        # 套利：同时买 YES 和 NO，结算时每对兑付 1
+        if self.hedge:
+            pair_size = min(portfolio.cash * 0.2 / total_price, 1000)
+            return [(Signal.BUY, "YES", pair_size), (Signal.BUY, "NO", pair_size)]
+
+        # 单腿模式：返回较大价差的一侧
         side = "YES" if market.yes_price <= market.no_price else "NO"
         entry_price = market.yes_price if side == "YES" else market.no_price
 
@@ -346,6 +1123,26 @@ class ArbitrageStrategy(TradingStrategy):
 
         return Signal.BUY, side, suggested_size
 
+    def analyze_batch(self, batch: MarketBatch, portfolio: Portfolio) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self.hedge:
+            # 配对信号无法用单腿数组表达（multi_leg 策略由引擎逐个调用 analyze）
+            return _empty_batch_result(len(batch))
+        signals, sides, sizes = _empty_batch_result(len(batch))
+        yes, no = batch.yes_prices, batch.no_prices
+        total = yes + no
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            profit_pct = (1.0 - total) / total
+            buy_yes = yes <= no
+            entry = np.where(buy_yes, yes, no)
+            size = np.minimum(portfolio.cash * 0.2 / entry, 1000)
+
+        buy = (total < 1.0 - self.min_profit_threshold) & (profit_pct >= self.min_profit_threshold) & (entry > 0)
+        signals[buy] = BATCH_BUY
+        sides[buy] = np.where(buy_yes[buy], SIDE_YES, SIDE_NO)
+        sizes[buy] = size[buy]
+        return signals, sides, sizes
+
 
 class MomentumStrategy(TradingStrategy):
     """
@@ -357,17 +1154,29 @@ class MomentumStrategy(TradingStrategy):
         super().__init__("Momentum", StrategyType.MOMENTUM)
         self.lookback = lookback
         self.threshold = threshold
-        self.price_history = defaultdict(list)
+        # 每个市场一个定长环形缓冲，只保留最近 lookback 个价格
+        self.price_history: Dict[str, deque] = {}
+
+    def warm_start(self, market_id: str, yes_prices: np.ndarray, volumes: np.ndarray):
+        if len(yes_prices) > 0:
+            self.price_history[market_id] = deque(
+                (float(p) for p in yes_prices[-self.lookback:]), maxlen=self.lookback
+            )
+
+    def on_market_resolved(self, market_id: str):
+        self.price_history.pop(market_id, None)
 
     def analyze(self, market: Market, portfolio: Portfolio) -> Optional[Tuple[Signal, str, float]]:
         # 记录价格历史
-        self.price_history[market.market_id].append(market.yes_price)
+        prices = self.price_history.get(market.market_id)
+        if prices is None:
+            prices = self.price_history[market.market_id] = deque(maxlen=self.lookback)
+        prices.append(market.yes_price)
 
-        if len(self.price_history[market.market_id]) < self.lookback:
+        if len(prices) < self.lookback:
             return None
 
         # 计算动量
-        prices = self.price_history[market.market_id][-self.lookback:]
         momentum = (prices[-1] - prices[0]) / prices[0] if prices[0] > 0 else 0
 
         # 动量信号
@@ -381,7 +1190,7 @@ class MomentumStrategy(TradingStrategy):
             return None
 
         # 检查是否已有持仓
-        if market.market_id in portfolio.positions:
+        if portfolio.positions.holds(market.market_id, self.strategy_type):
             return Signal.HOLD, side, 0
 
         suggested_size = portfolio.cash * 0.1 / entry_price
@@ -415,7 +1224,7 @@ class MeanReversionStrategy(TradingStrategy):
         else:
             return None
 
-        if market.market_id in portfolio.positions:
+        if portfolio.positions.holds(market.market_id, self.strategy_type):
             return Signal.HOLD, side, 0
 
         # 根据置信度调整仓位
@@ -423,6 +1232,27 @@ class MeanReversionStrategy(TradingStrategy):
 
         return Signal.BUY, side, min(suggested_size, 800)
 
+    def analyze_batch(self, batch: MarketBatch, portfolio: Portfolio) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        signals, sides, sizes = _empty_batch_result(len(batch))
+        yes, no = batch.yes_prices, batch.no_prices
+
+        oversold = yes < self.oversold
+        overbought = ~oversold & (yes > self.overbought)
+        active = oversold | overbought
+
+        entry = np.where(oversold, yes, no)
+        confidence = np.where(
+            oversold,
+            (self.oversold - yes) / self.oversold,
+            (yes - self.overbought) / (1 - self.overbought)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            size = portfolio.cash * 0.15 * confidence / entry
+
+        sides[active] = np.where(oversold[active], SIDE_YES, SIDE_NO)
+        _batch_buy(signals, sizes, active, batch.held_by(self.strategy_type)[0], size, 800)
+        return signals, sides, sizes
+
 
 class SentimentStrategy(TradingStrategy):
     """
@@ -435,6 +1265,13 @@ class SentimentStrategy(TradingStrategy):
         self.volume_threshold = volume_threshold
         self.baseline_volume = {}
 
+    def warm_start(self, market_id: str, yes_prices: np.ndarray, volumes: np.ndarray):
+        if len(volumes) > 0:
+            self.baseline_volume[market_id] = float(volumes[0])
+
+    def on_market_resolved(self, market_id: str):
+        self.baseline_volume.pop(market_id, None)
+
     def analyze(self, market: Market, portfolio: Portfolio) -> Optional[Tuple[Signal, str, float]]:
         # 建立基线
         if market.market_id not in self.baseline_volume:
@@ -450,7 +1287,7 @@ class SentimentStrategy(TradingStrategy):
             side = "YES" if market.yes_price > 0.5 else "NO"
             entry_price = market.yes_price if side == "YES" else market.no_price
 
-            if market.market_id in portfolio.positions:
+            if portfolio.positions.holds(market.market_id, self.strategy_type):
                 return Signal.HOLD, side, 0
 
             suggested_size = portfolio.cash * 0.12 / entry_price
@@ -458,6 +1295,31 @@ class SentimentStrategy(TradingStrategy):
 
         return None
 
+    def analyze_batch(self, batch: MarketBatch, portfolio: Portfolio) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        signals, sides, sizes = _empty_batch_result(len(batch))
+        yes, no = batch.yes_prices, batch.no_prices
+
+        # 基线查找（首次出现的市场建立基线，不产生信号）
+        baseline = np.fromiter(
+            (self.baseline_volume.get(m, np.nan) for m in batch.market_ids), dtype=np.float64, count=len(batch)
+        )
+        new = np.isnan(baseline)
+        for i in np.flatnonzero(new):
+            self.baseline_volume[batch.market_ids[i]] = float(batch.volumes[i])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            volume_ratio = np.where(baseline > 0, batch.volumes / baseline, 1)
+        surge = ~new & (volume_ratio > self.volume_threshold)
+
+        buy_yes = yes > 0.5
+        entry = np.where(buy_yes, yes, no)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            size = portfolio.cash * 0.12 / entry
+
+        sides[surge] = np.where(buy_yes[surge], SIDE_YES, SIDE_NO)
+        _batch_buy(signals, sizes, surge, batch.held_by(self.strategy_type)[0], size, 600)
+        return signals, sides, sizes
+
 
 class WhaleTrackingStrategy(TradingStrategy):
     """
@@ -483,7 +1345,7 @@ class WhaleTrackingStrategy(TradingStrategy):
             else:
                 return None
 
-            if market.market_id in portfolio.positions:
+            if portfolio.positions.holds(market.market_id, self.strategy_type):
                 return Signal.HOLD, side, 0
 
             suggested_size = portfolio.cash * 0.08 / entry_price
@@ -491,8 +1353,52 @@ class WhaleTrackingStrategy(TradingStrategy):
 
         return None
 
+    def analyze_batch(self, batch: MarketBatch, portfolio: Portfolio) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        signals, sides, sizes = _empty_batch_result(len(batch))
+        yes, no = batch.yes_prices, batch.no_prices
+
+        liquid = batch.liquidity > self.large_order_threshold
+        follow_yes = liquid & (yes > 0.55)
+        follow_no = liquid & ~follow_yes & (no > 0.55)
+        active = follow_yes | follow_no
+
+        entry = np.where(follow_yes, yes, no)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            size = portfolio.cash * 0.08 / entry
+
+        sides[active] = np.where(follow_yes[active], SIDE_YES, SIDE_NO)
+        _batch_buy(signals, sizes, active, batch.held_by(self.strategy_type)[0], size, 400)
+        return signals, sides, sizes
+
 # ==================== 风险管理器 ====================
 
+def _exclusive_group_cumsum(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """按组的不含自身前缀和（保持原顺序）"""
+    order = np.argsort(groups, kind="stable")
+    g, v = groups[order], values[order]
+    cs = np.cumsum(v) - v
+    starts = np.r_[True, g[1:] != g[:-1]]
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(len(g)), 0))
+    out = np.empty_like(cs)
+    out[order] = cs - cs[group_start]
+    return out
+
+
+def _order_batch_codes(book: PositionBook, market_ids: List[str], sides: List[str],
+                       strategies: List[Optional[StrategyType]]):
+    """候选订单编码：市场编号、持仓腿编号、各市场已有敞口、各持仓腿是否已存在"""
+    market_index: Dict[str, int] = {}
+    key_index: Dict[Tuple, int] = {}
+    market_codes = np.empty(len(market_ids), dtype=np.int64)
+    key_codes = np.empty(len(market_ids), dtype=np.int64)
+    for j, key in enumerate(zip(market_ids, sides, strategies)):
+        market_codes[j] = market_index.setdefault(key[0], len(market_index))
+        key_codes[j] = key_index.setdefault(key, len(key_index))
+    existing = np.array([book.market_value(m) for m in market_index])
+    in_book = np.array([key in book for key in key_index], dtype=bool)
+    return market_codes, key_codes, existing, in_book
+
+
 class RiskManager:
     """风险管理器"""
 
@@ -524,9 +1430,10 @@ class RiskManager:
         if position_value > self.max_position_size:
             return False, f"Position size {position_value:.2f} exceeds max {self.max_position_size}"
 
-        # 检查单一市场敞口
+        # 检查单一市场敞口（含该市场已有的各条持仓腿）
         total_value = portfolio.total_value
-        if position_value / total_value > self.max_single_market_exposure:
+        exposure = position_value + portfolio.positions.market_value(market.market_id)
+        if exposure / total_value > self.max_single_market_exposure:
             return False, f"Position exceeds {self.max_single_market_exposure*100}% of portfolio"
 
         # 检查现金
@@ -535,6 +1442,84 @@ class RiskManager:
 
         return True, "OK"
 
+    def check_orders_batch(self, portfolio: Portfolio, market_ids: List[str], sides: List[str],
+                           sizes: np.ndarray, prices: np.ndarray,
+                           strategies: Optional[List[Optional[StrategyType]]] = None,
+                           fee_rate: float = 0.0) -> np.ndarray:
+        """
+        批量开仓风控（同一时间点的一批候选订单）
+        结果与按顺序逐笔调用 check_position_allowed、且每笔通过后立即建仓完全一致：
+        通过的订单使现金减少 value*(1+fee_rate)、组合权益减少 value*fee_rate、
+        该市场敞口增加 value、新 (market, side, strategy) 持仓腿使持仓数 +1
+        先假设剩余订单全部通过，向量化求出各订单的前缀状态并定位第一笔被拒订单；
+        各约束随通过笔数单调收紧，因此在当前状态下已不满足的后续订单可一并拒绝，
+        循环次数通常只有一两次，与策略数无关
+        Returns: 每笔订单的获准份额（拒绝为 0）
+        """
+        sizes = np.asarray(sizes, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        n = len(sizes)
+        accepted = np.zeros(n)
+        if n == 0:
+            return accepted
+        if strategies is None:
+            strategies = [None] * n
+
+        values = sizes * prices
+        # 单仓位上限与状态无关，先一次性剔除
+        alive = values <= self.max_position_size
+
+        book = portfolio.positions
+        market_codes, key_codes, existing, in_book = _order_batch_codes(book, market_ids, sides, strategies)
+
+        cash, total = portfolio.cash, portfolio.total_value
+        count = len(book)
+        market_added = np.zeros(len(existing))
+        key_taken = in_book.copy()  # 已存在（或本批已新建）的持仓腿
+        spent = 0.0                 # 已通过订单的价值和
+
+        start = 0
+        while True:
+            idx = start + np.flatnonzero(alive[start:])
+            if len(idx) == 0:
+                break
+            v, m, k = values[idx], market_codes[idx], key_codes[idx]
+
+            # 假设 idx 中之前的订单全部通过时，每笔订单面对的状态
+            before = spent + np.cumsum(v) - v
+            cash_j = cash - before * (1 + fee_rate)
+            total_j = total - before * fee_rate
+            exposure_j = existing[m] + market_added[m] + _exclusive_group_cumsum(m, v) + v
+
+            first = np.zeros(len(idx), dtype=bool)
+            first[np.unique(k, return_index=True)[1]] = True
+            new_leg = first & ~key_taken[k]
+            count_j = count + np.cumsum(new_leg) - new_leg
+
+            fail = (count_j >= self.max_positions) | (exposure_j / total_j > self.max_single_market_exposure) | (v > cash_j)
+            stop = int(np.argmax(fail)) if fail.any() else len(idx)
+
+            ok = idx[:stop]
+            accepted[ok] = sizes[ok]
+            spent += v[:stop].sum()
+            np.add.at(market_added, m[:stop], v[:stop])
+            key_taken[k[:stop]] = True
+            count += int(new_leg[:stop].sum())
+
+            if stop == len(idx):
+                break
+
+            # 在当前已通过状态下就不满足约束的剩余订单（含 idx[stop]）直接拒绝
+            rest = idx[stop:]
+            v, m = values[rest], market_codes[rest]
+            fail = ((count >= self.max_positions)
+                    | ((existing[m] + market_added[m] + v) / (total - spent * fee_rate) > self.max_single_market_exposure)
+                    | (v > cash - spent * (1 + fee_rate)))
+            alive[rest[fail]] = False
+            start = idx[stop] + 1
+
+        return accepted
+
     def check_should_close(self, position: Position, current_price: float) -> Tuple[bool, str]:
         """检查是否应该平仓"""
         # 止损检查
@@ -590,6 +1575,285 @@ class RiskManager:
 
         return position
 
+# ==================== 成交模型 ====================
+
+@dataclass(slots=True)
+class Fill:
+    """一次成交结果"""
+    size: float             # 实际成交份额（可能小于委托量）
+    price: float            # 成交均价
+    reference_price: float  # 参考价（市场报价）
+
+
+class FillModel:
+    """成交模型基类：默认在报价上全部成交，不考虑深度（与早期回测行为一致）"""
+
+    def buy(self, market: Market, side: str, size: float, maker: bool = False) -> Fill:
+        price = market.yes_price if side == "YES" else market.no_price
+        return Fill(size=size, price=price, reference_price=price)
+
+    def sell(self, market: Market, side: str, size: float) -> Fill:
+        price = market.yes_price if side == "YES" else market.no_price
+        return Fill(size=size, price=price, reference_price=price)
+
+    def forget(self, market_id: str):
+        """市场结算后释放该市场的缓存状态"""
+        pass
+
+
+class OrderBookFillModel(FillModel):
+    """
+    基于流动性合成订单簿的成交模型
+    - 每侧 levels 档，第 i 档挂单金额 = liquidity * depth_fraction * w_i，w_i 按 depth_decay 指数衰减
+    - 吃单：从最优价（报价 ± half_spread_ticks 个 tick）逐档向外成交，深度不足时部分成交
+    - 挂单（maker）：以买一价挂单，前方排队量为买一深度 * queue_fraction，
+      本事件成交量（volume * volume_share）先消耗排队量，剩余部分才成交给本单；
+      这是单事件近似：挂单不跨事件保留，每个事件重新排队，未成交部分直接撤销
+    每个市场的档位金额缓存在 _profiles 中，流动性变化超过 refresh_tolerance 才重算
+    """
+
+    def __init__(
+        self,
+        tick: float = 0.01,
+        levels: int = 10,
+        depth_decay: float = 0.7,
+        depth_fraction: float = 1.0,
+        half_spread_ticks: int = 1,
+        volume_share: float = 1 / 24,
+        queue_fraction: float = 0.5,
+        refresh_tolerance: float = 0.05
+    ):
+        self.tick = tick
+        self.levels = levels
+        self.depth_decay = depth_decay
+        self.depth_fraction = depth_fraction
+        self.half_spread = half_spread_ticks * tick
+        self.volume_share = volume_share
+        self.queue_fraction = queue_fraction
+        self.refresh_tolerance = refresh_tolerance
+
+        weights = depth_decay ** np.arange(levels)
+        self._weights = tuple((weights / weights.sum()).tolist())
+        self._profiles: Dict[str, Tuple[float, Tuple[float, ...]]] = {}
+
+    def depth_profile(self, market: Market) -> Tuple[float, ...]:
+        """返回该市场每档挂单金额（缓存）"""
+        cached = self._profiles.get(market.market_id)
+        if cached is not None:
+            liquidity, profile = cached
+            if abs(market.liquidity - liquidity) <= self.refresh_tolerance * liquidity:
+                return profile
+
+        total = market.liquidity * self.depth_fraction
+        profile = tuple(total * w for w in self._weights)
+        self._profiles[market.market_id] = (market.liquidity, profile)
+        return profile
+
+    def forget(self, market_id: str):
+        self._profiles.pop(market_id, None)
+
+    def _walk(self, profile: Tuple[float, ...], best: float, step: float, size: float) -> Tuple[float, float]:
+        """从最优价 best 开始按 step 方向逐档成交，返回 (成交份额, 成交金额)"""
+        remaining = size
+        filled = cost = 0.0
+        price = best
+        for level_dollars in profile:
+            if price <= 0.001 or price >= 0.999:
+                break
+            take = min(remaining, level_dollars / price)
+            filled += take
+            cost += take * price
+            remaining -= take
+            if remaining <= 1e-9:
+                break
+            price += step
+        return filled, cost
+
+    def buy(self, market: Market, side: str, size: float, maker: bool = False) -> Fill:
+        reference = market.yes_price if side == "YES" else market.no_price
+        profile = self.depth_profile(market)
+
+        if maker:
+            bid = max(reference - self.half_spread, self.tick)
+            queue_ahead = profile[0] * self.queue_fraction / bid
+            traded = market.volume * self.volume_share / bid
+            filled = min(size, max(traded - queue_ahead, 0.0))
+            return Fill(size=filled, price=bid, reference_price=reference)
+
+        filled, cost = self._walk(profile, reference + self.half_spread, self.tick, size)
+        price = cost / filled if filled > 0 else reference
+        return Fill(size=filled, price=price, reference_price=reference)
+
+    def sell(self, market: Market, side: str, size: float) -> Fill:
+        reference = market.yes_price if side == "YES" else market.no_price
+        profile = self.depth_profile(market)
+        filled, proceeds = self._walk(profile, reference - self.half_spread, -self.tick, size)
+        price = proceeds / filled if filled > 0 else reference
+        return Fill(size=filled, price=price, reference_price=reference)
+
+# ==================== 绩效统计 ====================
+
+class MetricsAccumulator:
+    """
+    在线绩效统计
+    每个事件更新权益（运行峰值、最大回撤、Welford 收益率均值/方差），每个持仓完全平仓时更新盈亏与分策略归因；
+    snapshot() 为 O(1)，可在回测中途或模拟盘实时调用
+    """
+
+    def __init__(self, initial_capital: float):
+        self.initial_capital = initial_capital
+        self.last_equity = initial_capital
+
+        # 权益与回撤
+        self.points = 0
+        self.peak = None
+        self.max_drawdown = 0.0
+        self._prev = None
+
+        # 收益率 Welford 统计
+        self.n_returns = 0
+        self.mean_return = 0.0
+        self._m2 = 0.0
+
+        # 平仓盈亏
+        self.wins = 0
+        self.losses = 0
+        self.win_sum = 0.0
+        self.loss_sum = 0.0
+        self.fees = 0.0
+
+        # 分策略归因: StrategyType -> [平仓次数, 盈利次数, 累计盈亏]
+        self.by_strategy: Dict[StrategyType, List[float]] = {}
+
+    def on_equity(self, equity: float):
+        """记录一个权益点"""
+        self.points += 1
+        self.last_equity = equity
+
+        if self.peak is None or equity > self.peak:
+            self.peak = equity
+        if self.peak > 0:
+            dd = (self.peak - equity) / self.peak
+            if dd > self.max_drawdown:
+                self.max_drawdown = dd
+
+        if self._prev is not None and self._prev != 0:
+            r = (equity - self._prev) / self._prev
+            self.n_returns += 1
+            delta = r - self.mean_return
+            self.mean_return += delta / self.n_returns
+            self._m2 += delta * (r - self.mean_return)
+        self._prev = equity
+
+    def on_fee(self, fee: float):
+        self.fees += fee
+
+    def on_close(self, pnl: float, strategy: StrategyType):
+        """记录一个持仓的完全平仓（pnl 为该持仓全部平仓成交的已实现盈亏）"""
+        if pnl > 0:
+            self.wins += 1
+            self.win_sum += pnl
+        else:
+            self.losses += 1
+            self.loss_sum += pnl
+
+        attribution = self.by_strategy.get(strategy)
+        if attribution is None:
+            attribution = self.by_strategy[strategy] = [0, 0, 0.0]
+        attribution[0] += 1
+        attribution[1] += pnl > 0
+        attribution[2] += pnl
+
+    @property
+    def return_std(self) -> float:
+        """收益率总体标准差（与 np.std 一致）"""
+        return (self._m2 / self.n_returns) ** 0.5 if self.n_returns > 0 else 0.0
+
+    @property
+    def sharpe_ratio(self) -> float:
+        std = self.return_std
+        return self.mean_return / std * np.sqrt(252) if std > 0 else 0
+
+    def snapshot(self, equity: Optional[float] = None) -> Dict:
+        """当前统计快照；equity 默认取最后一个权益点"""
+        equity = self.last_equity if equity is None else equity
+        closed = self.wins + self.losses
+        return {
+            "winning_trades": self.wins,
+            "losing_trades": self.losses,
+            "win_rate": self.wins / closed * 100 if closed > 0 else 0,
+            "avg_win": self.win_sum / self.wins if self.wins else 0,
+            "avg_loss": self.loss_sum / self.losses if self.losses else 0,
+            "profit_factor": self.win_sum / abs(self.loss_sum) if self.loss_sum != 0 else float('inf'),
+            "max_drawdown": self.max_drawdown * 100,
+            "sharpe_ratio": self.sharpe_ratio,
+            "total_fees": self.fees,
+            "final_equity": equity,
+            "total_return": (equity - self.initial_capital) / self.initial_capital * 100,
+            "total_pnl": equity - self.initial_capital,
+        }
+
+    def strategy_stats(self) -> Dict[str, Dict]:
+        """分策略归因"""
+        return {
+            strategy.value: {
+                "closed": int(count),
+                "wins": int(wins),
+                "win_rate": wins / count * 100 if count else 0,
+                "total_pnl": pnl,
+            }
+            for strategy, (count, wins, pnl) in self.by_strategy.items()
+        }
+
+# ==================== 检查点 ====================
+
+CHECKPOINT_MAGIC = b"PMCKPT"
+CHECKPOINT_VERSION = 4
+_CHECKPOINT_HEADER = struct.Struct("<6sBQ32s")  # 魔数, 版本, 负载长度, 数据/配置指纹摘要
+
+
+class CheckpointMismatch(ValueError):
+    """检查点属于另一次运行（数据或配置指纹不符）"""
+
+
+def checkpoint_digest(fingerprint: Any) -> bytes:
+    return hashlib.sha256(repr(fingerprint).encode()).digest()
+
+
+def write_checkpoint(path: str, state: Dict, fingerprint: Any = None):
+    """原子写入检查点：定长文件头（含指纹摘要）+ zlib 压缩的 pickle 负载"""
+    payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, len(payload),
+                                        checkpoint_digest(fingerprint)))
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path: str, fingerprint: Any = None) -> Dict:
+    """
+    读取检查点，文件头或长度不符时抛出 ValueError
+    给定 fingerprint 时先比对文件头中的指纹摘要，不符时抛出 CheckpointMismatch（不读取负载）
+    """
+    with open(path, "rb") as f:
+        header = f.read(_CHECKPOINT_HEADER.size)
+        payload = f.read()
+    if len(header) < _CHECKPOINT_HEADER.size:
+        raise ValueError(f"{path}: truncated checkpoint header")
+    magic, version, length, digest = _CHECKPOINT_HEADER.unpack(header)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError(f"{path}: not a checkpoint file")
+    if version != CHECKPOINT_VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint version {version}")
+    if fingerprint is not None and digest != checkpoint_digest(fingerprint):
+        raise CheckpointMismatch(f"{path}: checkpoint belongs to a different run")
+    if len(payload) != length:
+        raise ValueError(f"{path}: truncated checkpoint payload")
+    return pickle.loads(zlib.decompress(payload))
+
 # ==================== 回测引擎 ====================
 
 class BacktestEngine:
@@ -600,17 +1864,29 @@ class BacktestEngine:
         initial_capital: float = 10000,
         start_date: datetime = None,
         end_date: datetime = None,
-        fee_rate: float = 0.01  # 1% 交易费
+        fee_rate: float = 0.01,  # 1% 交易费
+        fill_model: Optional[FillModel] = None,
+        batch_risk: bool = False,
+        batch_events: bool = False
     ):
         self.initial_capital = initial_capital
         self.start_date = start_date or datetime.now() - timedelta(days=90)
         self.end_date = end_date or datetime.now()
         self.fee_rate = fee_rate
+        self.fill_model = fill_model or FillModel()
+        # True: 同一事件上所有策略基于同一组合快照给出信号，再经批量风控一次性过滤
+        self.batch_risk = batch_risk
+        # True: 按时间点批量处理事件（process_snapshot），策略用 analyze_batch 一次评估同一时间点的全部市场
+        self.batch_events = batch_events
 
         self.portfolio = Portfolio(cash=initial_capital)
         self.risk_manager = RiskManager()
         self.strategies: List[TradingStrategy] = []
+        self._position_owners: Dict[int, TradingStrategy] = {}  # position_id -> 开仓策略实例
+        self._next_position_id = 0  # 单调递增的持仓编号（不随成交流水或快照恢复重复）
         self.market_generator = MarketDataGenerator()
+        self.metrics = MetricsAccumulator(initial_capital)
+        self.last_event_time: Optional[datetime] = None  # 最近处理的事件时间
 
         # 统计数据
         self.stats = {
@@ -618,6 +1894,7 @@ class BacktestEngine:
             "winning_trades": 0,
             "losing_trades": 0,
             "total_fees": 0,
+            "total_slippage": 0,
             "max_drawdown": 0,
             "sharpe_ratio": 0,
             "win_rate": 0,
@@ -630,8 +1907,33 @@ class BacktestEngine:
         """添加策略"""
         self.strategies.append(strategy)
 
-    def run(self, days: int = 90, verbose: bool = True) -> Dict:
-        """运行回测"""
+    # 检查点保存的引擎状态
+    CHECKPOINT_FIELDS = ("portfolio", "risk_manager", "strategies", "_position_owners",
+                         "_next_position_id", "metrics", "stats", "fill_model", "last_event_time")
+
+    def run(self, days: int = 90, verbose: bool = True, markets: Optional[Iterable[Market]] = None,
+            checkpoint_path: Optional[str] = None, checkpoint_every: int = 10000) -> Dict:
+        """
+        运行回测
+        markets: 预先生成/切分好的事件序列（按时间排序的 MarketTape 或 Market 列表），
+                 为 None 时由 market_generator 生成
+        checkpoint_path: 每处理 checkpoint_every 个事件写一次检查点；文件已存在且数据/配置指纹相符时从中恢复，
+                 结果与不中断运行逐位一致；指纹不符（其他运行遗留）时丢弃并重新开始；正常结束后删除
+        """
+        fingerprint = self._fingerprint(days, markets)
+        cursor, source = 0, None
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            try:
+                state = self.load_checkpoint(checkpoint_path, fingerprint)
+            except CheckpointMismatch:
+                os.remove(checkpoint_path)
+                if verbose:
+                    print("[CHECKPOINT] 检查点与本次运行的数据/配置不符，已丢弃")
+            else:
+                cursor, source = state["cursor"], state["source"]
+                if verbose:
+                    print(f"[CHECKPOINT] 从第 {cursor} 个事件恢复")
+
         if verbose:
             print("=" * 60)
             print("Polymarket 量化交易机器人回测")
@@ -642,234 +1944,516 @@ class BacktestEngine:
             print(f"交易费率: {self.fee_rate*100}%")
             print("=" * 60)
 
-        # 生成市场数据
-        markets = self.market_generator.generate_historical_data(days=days, markets_per_day=3)
+        if markets is None:
+            # 生成市场数据（列式存储，已按时间排序）；记录生成前的随机数状态以便恢复时重新生成
+            generator = self.market_generator
+            if source is None:
+                source = {
+                    "rng_state": np.random.get_state(),
+                    "market_counter": generator.market_counter,
+                    "start_date": datetime.now() - timedelta(days=days),
+                    "days": days,
+                }
+                markets = generator.generate_tape(days=days, markets_per_day=3, start_date=source["start_date"])
+            else:
+                resumed = np.random.get_state(), generator.market_counter
+                np.random.set_state(source["rng_state"])
+                generator.market_counter = source["market_counter"]
+                markets = generator.generate_tape(days=source["days"], markets_per_day=3,
+                                                  start_date=source["start_date"])
+                np.random.set_state(resumed[0])
+                generator.market_counter = resumed[1]
+
+        if self.batch_events and not isinstance(markets, MarketTape):
+            tape = MarketTape()
+            for market in markets:
+                tape.append(market)
+            markets = tape.finalize(sort=False)
+
+        if cursor:
+            markets = markets[cursor:] if hasattr(markets, "__getitem__") else islice(markets, cursor, None)
+
+        if self.batch_events:
+            # 按时间点批量处理；检查点只写在时间点边界上
+            offset = cursor
+            for start, stop in markets.snapshot_bounds():
+                if not self.process_snapshot(markets, start, stop, verbose):
+                    break
+                cursor = offset + stop
+                if checkpoint_path and cursor // checkpoint_every > (offset + start) // checkpoint_every:
+                    self.save_checkpoint(checkpoint_path, cursor, source, fingerprint=fingerprint)
+        else:
+            for cursor, market in enumerate(markets, start=cursor + 1):
+                if not self.process_market(market, verbose):
+                    break
+                if checkpoint_path and cursor % checkpoint_every == 0:
+                    self.save_checkpoint(checkpoint_path, cursor, source, fingerprint=fingerprint)
 
-        # 按时间排序
-        markets.sort(key=lambda x: x.timestamp)
+        # 平掉所有剩余仓位
+        self._close_all_positions()
 
-        # 活跃市场跟踪
-        active_markets = {}
+        # 计算最终统计
+        self._calculate_stats()
 
-        for market in markets:
-            current_date = market.timestamp
-            self.risk_manager.update_daily_stats(self.portfolio, current_date)
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
 
-            # 检查风险限制
-            risk_ok, risk_msg = self.risk_manager.check_risk_limits(self.portfolio)
-            if not risk_ok:
-                if verbose:
-                    print(f"[RISK] {risk_msg} - 停止交易")
-                break
+        if verbose:
+            self._print_results()
 
-            # 更新活跃市场
-            if market.market_id not in active_markets:
-                active_markets[market.market_id] = market
+        return self.stats
+
+    def _fingerprint(self, days: int, markets: Optional[Iterable[Market]]) -> Tuple:
+        """数据与回测配置指纹（决定检查点能否用于本次运行）"""
+        if markets is None:
+            data = ("generated", days)
+        elif hasattr(markets, "__getitem__") and hasattr(markets, "__len__"):
+            data = (len(markets), markets[0].timestamp, markets[-1].timestamp) if len(markets) else (0,)
+        else:
+            data = ("stream",)  # 一次性迭代器无法预先检查
+        fill = self.fill_model
+        return (data, self.initial_capital, self.fee_rate, self.batch_risk, self.batch_events,
+                tuple((type(s).__name__, sorted(s.params().items())) for s in self.strategies),
+                type(fill).__name__, sorted((k, v) for k, v in vars(fill).items() if not k.startswith("_")))
+
+    def save_checkpoint(self, path: str, cursor: int, source: Optional[Dict] = None,
+                        fingerprint: Any = None, **extra):
+        """
+        保存检查点：组合、风控、策略内部状态、成交模型、绩效累加器、随机数状态与事件游标
+        source: 行情来源信息（内部生成数据时为生成参数与生成前的随机数状态）
+        fingerprint: 数据/配置指纹，摘要写入文件头
+        extra: 调用方附加的状态（如模拟盘的风控停止标记），由 load_checkpoint 原样返回
+        """
+        state = {name: getattr(self, name) for name in self.CHECKPOINT_FIELDS}
+        state.update(extra)
+        state.update(
+            cursor=cursor,
+            source=source,
+            rng_state=np.random.get_state(),
+            market_counter=self.market_generator.market_counter,
+        )
+        write_checkpoint(path, state, fingerprint)
+
+    def load_checkpoint(self, path: str, fingerprint: Any = None) -> Dict:
+        """
+        从检查点恢复引擎状态（策略替换为检查点中的实例），返回检查点内容
+        给定 fingerprint 且与检查点不符时抛出 CheckpointMismatch，引擎状态不变
+        """
+        state = read_checkpoint(path, fingerprint)
+        for name in self.CHECKPOINT_FIELDS:
+            setattr(self, name, state[name])
+        np.random.set_state(state["rng_state"])
+        self.market_generator.market_counter = state["market_counter"]
+        return state
+
+    def process_market(self, market: Market, verbose: bool = False) -> bool:
+        """
+        处理单个市场事件：风控检查、持仓估值/平仓、策略信号与开仓、记录权益
+        回测与模拟盘共用
+        Returns: False 表示触发风险限制，应停止交易
+        """
+        current_date = market.timestamp
+        if not self._check_risk(current_date, verbose):
+            return False
+        if self._update_positions(market):
+            return True
+
+        if self.batch_risk:
+            self._run_strategies_batched(market)
+            self._record_equity(current_date)
+            return True
+
+        # 运行每个策略
+        for strategy in self.strategies:
+            result = strategy.analyze(market, self.portfolio)
+
+            if not result:
+                continue
+
+            legs = self._buy_legs(market, result)
+            if len(legs) > 1:
+                # 多腿信号：全部腿通过风控才建仓
+                if self._legs_allowed(legs, strategy):
+                    self._open_legs(legs, strategy)
+                continue
+
+            for leg_market, side, suggested_size in legs:
+                # 检查是否允许开仓
+                allowed, msg = self.risk_manager.check_position_allowed(
+                    self.portfolio, leg_market, suggested_size,
+                    leg_market.yes_price if side == "YES" else leg_market.no_price
+                )
+
+                if allowed:
+                    self._open_position(leg_market, side, suggested_size, strategy)
 
-            # 更新现有持仓价格
-            if market.market_id in self.portfolio.positions:
-                pos = self.portfolio.positions[market.market_id]
-                pos.current_price = market.yes_price if pos.side == "YES" else market.no_price
+        self._record_equity(current_date)
+        return True
 
-                # 检查是否需要平仓
+    def _check_risk(self, current_date: datetime, verbose: bool = False) -> bool:
+        """更新每日统计并检查风险限制；返回 False 表示应停止交易"""
+        self.last_event_time = current_date
+        self.risk_manager.update_daily_stats(self.portfolio, current_date)
+
+        risk_ok, risk_msg = self.risk_manager.check_risk_limits(self.portfolio)
+        if not risk_ok:
+            if verbose:
+                print(f"[RISK] {risk_msg} - 停止交易")
+            return False
+        return True
+
+    def _update_positions(self, market: Market) -> bool:
+        """
+        持仓估值/平仓与结算处理
+        Returns: True 表示市场已结算（不再运行策略）
+        """
+        # 更新该市场所有持仓腿的价格，逐腿检查是否需要平仓
+        book = self.portfolio.positions
+        if market.market_id in book:
+            book.mark(market.market_id, market.yes_price, market.no_price)
+            for pos in book.market_legs(market.market_id):
                 should_close, close_reason = self.risk_manager.check_should_close(
                     pos, pos.current_price
                 )
 
                 if should_close or market.resolution is not None:
-                    self._close_position(market, close_reason or "Market resolved")
+                    self._close_position(market, pos, close_reason or "Market resolved")
 
-            # 如果市场已解决，跳过策略分析
-            if market.resolution is not None:
-                continue
-
-            # 运行每个策略
+        # 如果市场已解决，释放策略状态并跳过策略分析
+        if market.resolution is not None:
             for strategy in self.strategies:
-                result = strategy.analyze(market, self.portfolio)
+                strategy.on_market_resolved(market.market_id)
+            self.fill_model.forget(market.market_id)
+            return True
+        return False
 
-                if result is None:
+    def process_snapshot(self, tape: MarketTape, start: int, stop: int, verbose: bool = False) -> bool:
+        """
+        批量处理同一时间点的 [start, stop) 行（batch_events 模式）
+        风控检查每个时间点做一次；只为有持仓或已结算的行构造 Market 做估值/平仓/结算，
+        再由各策略 analyze_batch 一次评估全部未结算市场，
+        候选订单按 (市场, 策略) 顺序经 check_orders_batch 整体过滤后开仓；
+        所有市场基于同一组合快照给出信号，整个时间点记录一个权益点
+        多腿策略（multi_leg）的信号无法用单腿数组表达，改为逐个市场调用 analyze
+        Returns: False 表示触发风险限制，应停止交易
+        """
+        timestamp = from_us(tape.timestamps[start])
+        if not self._check_risk(timestamp, verbose):
+            return False
+
+        book = self.portfolio.positions
+        market_ids = tape.market_ids
+        resolved = tape.resolutions[start:stop] >= 0
+        rows, built = [], {}
+        for offset, code in enumerate(tape.codes[start:stop].tolist()):
+            i = start + offset
+            if resolved[offset] or market_ids[code] in book:
+                market = built[i] = tape.market_at(i)
+                if self._update_positions(market):
                     continue
+            rows.append(i)
+        if rows:
+            self._run_snapshot_strategies(tape, start, stop, rows, built)
+        self._record_equity(timestamp)
+        return True
+
+    def _run_snapshot_strategies(self, tape: MarketTape, start: int, stop: int,
+                                 rows: List[int], built: Dict[int, Market]):
+        """对一个时间点的未结算行运行全部策略，候选订单整体风控后开仓"""
+        def market_for(j: int) -> Market:
+            market = built.get(rows[j])
+            if market is None:
+                market = built[rows[j]] = tape.market_at(rows[j])
+            return market
+
+        batch = None
+        candidates = []  # (市场下标, 策略下标, 策略, 开仓腿)
+        for k, strategy in enumerate(self.strategies):
+            if strategy.multi_leg:
+                for j in range(len(rows)):
+                    market = market_for(j)
+                    result = strategy.analyze(market, self.portfolio)
+                    if result:
+                        candidates.append((j, k, strategy, self._buy_legs(market, result)))
+                continue
 
-                signal, side, suggested_size = result
-
-                if signal == Signal.BUY and suggested_size > 0:
-                    # 检查是否允许开仓
-                    allowed, msg = self.risk_manager.check_position_allowed(
-                        self.portfolio, market, suggested_size,
-                        market.yes_price if side == "YES" else market.no_price
-                    )
-
-                    if allowed:
-                        self._open_position(market, side, suggested_size, strategy)
-
-            # 记录权益曲线
-            self.portfolio.equity_curve.append((current_date, self.portfolio.total_value))
+            if batch is None:
+                batch = MarketBatch.from_tape(tape, start, stop, self.portfolio,
+                                              rows=None if len(rows) == stop - start else np.asarray(rows))
+            signals, sides, sizes = strategy.analyze_batch(batch, self.portfolio)
+            for j in np.flatnonzero((signals == BATCH_BUY) & (sizes > 0)).tolist():
+                candidates.append((j, k, strategy, [(market_for(j), SIDES[sides[j]], float(sizes[j]))]))
+
+        candidates.sort(key=lambda c: c[:2])
+        orders = [(strategy, leg_market, side, size, group)
+                  for group, (_, _, strategy, legs) in enumerate(candidates)
+                  for leg_market, side, size in legs]
+        self._open_orders(orders)
+
+    def _record_equity(self, current_date: datetime):
+        """记录权益曲线"""
+        equity = self.portfolio.total_value
+        self.portfolio.equity_curve.append((current_date, equity))
+        self.metrics.on_equity(equity)
+
+    @staticmethod
+    def _buy_legs(market: Market, result) -> List[Tuple[Market, str, float]]:
+        """策略信号 -> 开仓腿 [(market, side, size)]，腿未指定市场时为当前市场"""
+        legs = []
+        for leg in (result if isinstance(result, list) else (result,)):
+            signal, side, size = leg[:3]
+            if signal == Signal.BUY and size > 0:
+                legs.append((leg[3] if len(leg) > 3 else market, side, size))
+        return legs
+
+    def _legs_allowed(self, legs: List[Tuple[Market, str, float]], strategy: TradingStrategy) -> bool:
+        """多腿信号整体风控：按顺序逐腿检查（前面的腿计入后面腿的状态），全部通过才返回 True"""
+        accepted = self.risk_manager.check_orders_batch(
+            self.portfolio,
+            [m.market_id for m, _, _ in legs],
+            [side for _, side, _ in legs],
+            np.array([size for _, _, size in legs]),
+            np.array([m.yes_price if side == "YES" else m.no_price for m, side, _ in legs]),
+            strategies=[strategy.strategy_type] * len(legs),
+            fee_rate=self.fee_rate
+        )
+        return bool((accepted > 0).all())
 
-        # 平掉所有剩余仓位
-        self._close_all_positions()
+    def _run_strategies_batched(self, market: Market):
+        """
+        收集所有策略的开仓候选，经 RiskManager.check_orders_batch 过滤后按顺序开仓
+        多腿信号只要有一条腿被拒就整体放弃，剔除后重新过滤，使后续订单不占用其额度
+        """
+        orders = []  # (strategy, market, side, size, 信号编号)
+        for strategy in self.strategies:
+            result = strategy.analyze(market, self.portfolio)
+            if not result:
+                continue
+            group = len(orders)
+            for leg_market, side, size in self._buy_legs(market, result):
+                orders.append((strategy, leg_market, side, size, group))
+        self._open_orders(orders)
 
-        # 计算最终统计
-        self._calculate_stats()
+    def _open_orders(self, orders: List[Tuple[TradingStrategy, Market, str, float, int]]):
+        """
+        一批候选订单 (strategy, market, side, size, 信号编号) 经 check_orders_batch 过滤后按顺序开仓
+        同一信号编号的多条腿整体通过或整体放弃
+        """
+        if not orders:
+            return
 
-        if verbose:
-            self._print_results()
+        groups = np.array([group for *_, group in orders])
+        alive = np.ones(len(orders), dtype=bool)
+        while True:
+            idx = np.flatnonzero(alive)
+            accepted = np.zeros(len(orders))
+            accepted[idx] = self.risk_manager.check_orders_batch(
+                self.portfolio,
+                [orders[j][1].market_id for j in idx],
+                [orders[j][2] for j in idx],
+                np.array([orders[j][3] for j in idx]),
+                np.array([orders[j][1].yes_price if orders[j][2] == "YES" else orders[j][1].no_price for j in idx]),
+                strategies=[orders[j][0].strategy_type for j in idx],
+                fee_rate=self.fee_rate
+            )
+            rejected = np.isin(groups, groups[alive & (accepted == 0)])
+            partial = alive & rejected & (accepted > 0)
+            if not partial.any():
+                break
+            alive &= ~np.isin(groups, groups[partial])
 
-        return self.stats
+        for group in np.unique(groups[accepted > 0]):
+            members = np.flatnonzero(groups == group)
+            strategy = orders[members[0]][0]
+            if len(members) > 1:
+                self._open_legs([orders[j][1:4] for j in members], strategy)
+            else:
+                _, leg_market, side, _, _ = orders[members[0]]
+                self._open_position(leg_market, side, float(accepted[members[0]]), strategy)
 
     def _open_position(self, market: Market, side: str, size: float, strategy: TradingStrategy):
         """开仓"""
-        price = market.yes_price if side == "YES" else market.no_price
-        cost = size * price
-        fee = cost * self.fee_rate
+        fill = self.fill_model.buy(market, side, size, maker=strategy.is_maker)
+        if fill.size * fill.price * (1 + self.fee_rate) > self.portfolio.cash:
+            # 现金不足：按可负担的份额重新成交（均价不高于原均价），手续费按实际成交重算
+            affordable = self.portfolio.cash / (fill.price * (1 + self.fee_rate))
+            fill = self.fill_model.buy(market, side, affordable, maker=strategy.is_maker)
 
-        if cost + fee > self.portfolio.cash:
-            size = (self.portfolio.cash - fee) / price
-
-        if size < 10:  # 最小仓位
+        if fill.size < 10:  # 最小仓位
             return
 
-        # 创建持仓
+        self._add_position(market, side, fill.size, fill.price, fill.reference_price, strategy)
+
+    def _open_legs(self, legs: List[Tuple[Market, str, float]], strategy: TradingStrategy) -> bool:
+        """
+        多腿原子开仓：各腿按同一比例缩量到成交模型可全部成交、且现金足够支付全部腿，
+        任一腿不足最小仓位则全部放弃
+        """
+        fills = [self.fill_model.buy(m, side, size, maker=strategy.is_maker) for m, side, size in legs]
+        scale = min(fill.size / size for fill, (_, _, size) in zip(fills, legs))
+        cost = scale * sum(fill.price * size for fill, (_, _, size) in zip(fills, legs)) * (1 + self.fee_rate)
+        if cost > self.portfolio.cash:
+            scale *= self.portfolio.cash / cost
+
+        if min(size for _, _, size in legs) * scale < 10:  # 最小仓位
+            return False
+        if scale < 1:
+            # 缩量后重新成交（份额不超过原可成交量，均价不高于原均价）
+            fills = [self.fill_model.buy(m, side, size * scale, maker=strategy.is_maker) for m, side, size in legs]
+
+        for (m, side, _), fill in zip(legs, fills):
+            self._add_position(m, side, fill.size, fill.price, fill.reference_price, strategy)
+        return True
+
+    def _add_position(self, market: Market, side: str, size: float, price: float,
+                      reference_price: float, strategy: TradingStrategy):
+        """按成交结果建仓、扣款（含手续费）并记录开仓成交"""
+        fee = size * price * self.fee_rate
+        # 创建持仓（新持仓分配新编号；同策略同方向加仓沿用原持仓编号）
+        book = self.portfolio.positions
+        existing = book.leg(market.market_id, side, strategy.strategy_type)
+        if existing is None:
+            position_id = self._next_position_id
+            self._next_position_id += 1
+        else:
+            position_id = existing.position_id
         position = Position(
             market_id=market.market_id,
             side=side,
             size=size,
             entry_price=price,
-            current_price=price,
-            entry_time=market.timestamp
+            current_price=reference_price,
+            entry_time=market.timestamp,
+            strategy=strategy.strategy_type,
+            position_id=position_id
         )
+        self._position_owners[position.position_id] = strategy
 
-        # 设置止损止盈
-        position = self.risk_manager.set_stop_loss_take_profit(position, market)
-
-        # 更新投资组合
+        # 更新投资组合，按（合并后的）持仓成本设置止损止盈
         self.portfolio.cash -= (size * price + fee)
-        self.portfolio.positions[market.market_id] = position
+        position = book.add(position)
+        if not strategy.hold_to_resolution:
+            self.risk_manager.set_stop_loss_take_profit(position, market)
 
         # 记录交易
-        trade = Trade(
-            trade_id=f"trade_{len(self.portfolio.trades):04d}",
+        self.portfolio.trades.record(
             market_id=market.market_id,
             side=side,
             action="BUY",
             size=size,
             price=price,
             timestamp=market.timestamp,
-            strategy=strategy.strategy_type
+            strategy=strategy.strategy_type,
+            position_id=position.position_id
         )
-        self.portfolio.trades.append(trade)
 
         # 更新策略统计
         strategy.positions_opened += 1
         self.stats["total_trades"] += 1
-        self.stats["total_fees"] += fee
-
-    def _close_position(self, market: Market, reason: str):
-        """平仓"""
-        if market.market_id not in self.portfolio.positions:
-            return
-
-        position = self.portfolio.positions[market.market_id]
-
-        # 确定平仓价格
-        if market.resolution is not None:
+        self.stats["total_slippage"] += (price - reference_price) * size
+        self.metrics.on_fee(fee)
+
+    def _close_position(self, market: Market, position: Position, reason: str,
+                        exit_price: Optional[float] = None):
+        """平掉一条持仓腿；给定 exit_price 时按该价格全部平仓"""
+        # 确定平仓价格（结算按 1/0 全部兑付，否则经成交模型卖出，深度不足时部分平仓）
+        exit_size = position.size
+        if exit_price is not None:
+            pass
+        elif market.resolution is not None:
             if market.resolution:  # YES wins
                 exit_price = 1.0 if position.side == "YES" else 0.0
             else:  # NO wins
                 exit_price = 0.0 if position.side == "YES" else 1.0
         else:
-            exit_price = market.yes_price if position.side == "YES" else market.no_price
+            fill = self.fill_model.sell(market, position.side, position.size)
+            if fill.size <= 0:
+                return
+            exit_size, exit_price = fill.size, fill.price
+            self.stats["total_slippage"] += (fill.reference_price - exit_price) * exit_size
 
         # 计算收益
-        gross_value = position.size * exit_price
+        gross_value = exit_size * exit_price
         fee = gross_value * self.fee_rate
-        pnl = position.size * (exit_price - position.entry_price) - fee
+        pnl = exit_size * (exit_price - position.entry_price) - fee
 
         # 更新投资组合
         self.portfolio.cash += gross_value - fee
 
         # 记录交易
-        trade = Trade(
-            trade_id=f"trade_{len(self.portfolio.trades):04d}",
+        self.portfolio.trades.record(
             market_id=market.market_id,
             side=position.side,
             action="SELL",
-            size=position.size,
+            size=exit_size,
             price=exit_price,
             timestamp=market.timestamp,
-            strategy=StrategyType.MARKET_MAKING,  # 可以从position存储
-            pnl=pnl
+            strategy=position.strategy,
+            pnl=pnl,
+            position_id=position.position_id
         )
-        self.portfolio.trades.append(trade)
 
         # 更新统计
-        if pnl > 0:
-            self.stats["winning_trades"] += 1
-        else:
-            self.stats["losing_trades"] += 1
+        self.metrics.on_fee(fee)
+        position.realized_pnl += pnl
+
+        # 删除持仓（部分平仓时保留剩余份额）
+        owner = self._position_owner(position)
+        if owner is not None:
+            owner.total_pnl += pnl
+        if exit_size < position.size - 1e-9:
+            self.portfolio.positions.reduce(position, exit_size)
+            return
 
-        # 删除持仓
-        del self.portfolio.positions[market.market_id]
+        # 持仓全部平掉后按整个持仓的已实现盈亏计一次平仓（与策略的开/平仓计数一致）
+        self.metrics.on_close(position.realized_pnl, position.strategy)
+        self.portfolio.positions.remove(position)
+        self._position_owners.pop(position.position_id, None)
+        if owner is not None:
+            owner.positions_closed += 1
+            if position.realized_pnl > 0:
+                owner.win_count += 1
+            else:
+                owner.loss_count += 1
+
+    def _position_owner(self, position: Position) -> Optional[TradingStrategy]:
+        """持仓 -> 开仓策略实例（快照恢复的持仓按策略类型匹配）"""
+        owner = self._position_owners.get(position.position_id)
+        if owner is None:
+            owner = next((s for s in self.strategies if s.strategy_type == position.strategy), None)
+        return owner
 
     def _close_all_positions(self):
-        """平掉所有仓位"""
-        positions_to_close = list(self.portfolio.positions.keys())
-        for market_id in positions_to_close:
-            if market_id in self.portfolio.positions:
-                # 创建一个模拟的已解决市场
-                pos = self.portfolio.positions[market_id]
-                mock_market = Market(
-                    market_id=market_id,
-                    question="",
-                    category="",
-                    yes_price=1.0 if pos.side == "YES" else 0.0,
-                    no_price=0.0 if pos.side == "YES" else 1.0,
-                    volume=0,
-                    liquidity=0,
-                    timestamp=datetime.now(),
-                    resolution=pos.side == "YES"  # 模拟盈利结果
-                )
-                self._close_position(mock_market, "Backtest end")
+        """
+        回测结束平掉所有仓位
+        未结算的持仓腿按各自最后报价估值平仓（不假设结算结果，YES+NO 配对等多腿组合不会被重复兑付）
+        """
+        timestamp = self.last_event_time or datetime.now()
+        for pos in self.portfolio.positions.values():
+            yes_price = pos.current_price if pos.side == "YES" else 1 - pos.current_price
+            mock_market = Market(
+                market_id=pos.market_id,
+                question="",
+                category="",
+                yes_price=yes_price,
+                no_price=1 - yes_price,
+                volume=0,
+                liquidity=0,
+                timestamp=timestamp
+            )
+            self._close_position(mock_market, pos, "Backtest end", exit_price=pos.current_price)
 
     def _calculate_stats(self):
-        """计算统计数据"""
-        trades = self.portfolio.trades
-        sell_trades = [t for t in trades if t.action == "SELL"]
-
-        total = len(sell_trades)
-        wins = [t for t in sell_trades if t.pnl > 0]
-        losses = [t for t in sell_trades if t.pnl <= 0]
-
-        self.stats["win_rate"] = len(wins) / total * 100 if total > 0 else 0
-        self.stats["avg_win"] = np.mean([t.pnl for t in wins]) if wins else 0
-        self.stats["avg_loss"] = np.mean([t.pnl for t in losses]) if losses else 0
-
-        total_wins = sum(t.pnl for t in wins)
-        total_losses = abs(sum(t.pnl for t in losses))
-        self.stats["profit_factor"] = total_wins / total_losses if total_losses > 0 else float('inf')
-
-        # 计算最大回撤
-        if self.portfolio.equity_curve:
-            equity_values = [e[1] for e in self.portfolio.equity_curve]
-            peak = equity_values[0]
-            max_dd = 0
-            for value in equity_values:
-                if value > peak:
-                    peak = value
-                dd = (peak - value) / peak
-                if dd > max_dd:
-                    max_dd = dd
-            self.stats["max_drawdown"] = max_dd * 100
-
-        # 计算 Sharpe Ratio (简化版)
-        if len(equity_values) > 1:
-            returns = np.diff(equity_values) / equity_values[:-1]
-            if np.std(returns) > 0:
-                self.stats["sharpe_ratio"] = np.mean(returns) / np.std(returns) * np.sqrt(252)
-
-        # 最终资产
-        self.stats["final_equity"] = self.portfolio.total_value
-        self.stats["total_return"] = (self.portfolio.total_value - self.initial_capital) / self.initial_capital * 100
-        self.stats["total_pnl"] = self.portfolio.total_value - self.initial_capital
+        """汇总最终统计（由在线累加器直接给出，O(1)）"""
+        self.stats.update(self.metrics.snapshot(equity=self.portfolio.total_value))
+
+    def live_stats(self) -> Dict:
+        """回测/模拟盘运行中的实时统计"""
+        stats = dict(self.stats)
+        stats.update(self.metrics.snapshot(equity=self.portfolio.total_value))
+        stats["open_positions"] = len(self.portfolio.positions)
+        stats["by_strategy"] = self.metrics.strategy_stats()
+        return stats
 
     def _print_results(self):
         """打印结果"""
@@ -911,87 +2495,24 @@ class BacktestEngine:
             print(f"    胜率:     {stats['win_rate']:.2f}%")
             print(f"    总盈亏:   ${stats['total_pnl']:.2f}")
 
-    def generate_report(self, filename: str = "backtest_report.html") -> str:
-        """生成HTML报告"""
-        # 生成图表
-        self._generate_charts()
-
-        # 生成HTML
-        html = self._create_html_report()
-
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(html)
-
-        return filename
-
-    def _generate_charts(self):
-        """生成图表"""
-        fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-
-        # 1. 权益曲线
-        ax1 = axes[0, 0]
-        if self.portfolio.equity_curve:
-            dates = [e[0] for e in self.portfolio.equity_curve]
-            values = [e[1] for e in self.portfolio.equity_curve]
-            ax1.plot(dates, values, 'b-', linewidth=1.5, label='Equity')
-            ax1.axhline(y=self.initial_capital, color='gray', linestyle='--', alpha=0.7, label='Initial')
-            ax1.fill_between(dates, self.initial_capital, values, alpha=0.3)
-            ax1.set_title('Equity Curve', fontsize=12, fontweight='bold')
-            ax1.set_xlabel('Date')
-            ax1.set_ylabel('Portfolio Value ($)')
-            ax1.legend()
-            ax1.grid(True, alpha=0.3)
-
-        # 2. 收益分布
-        ax2 = axes[0, 1]
-        sell_trades = [t for t in self.portfolio.trades if t.action == "SELL"]
-        if sell_trades:
-            pnls = [t.pnl for t in sell_trades]
-            colors = ['green' if p > 0 else 'red' for p in pnls]
-            ax2.bar(range(len(pnls)), pnls, color=colors, alpha=0.7)
-            ax2.axhline(y=0, color='black', linewidth=0.5)
-            ax2.set_title('Trade P&L Distribution', fontsize=12, fontweight='bold')
-            ax2.set_xlabel('Trade #')
-            ax2.set_ylabel('P&L ($)')
-            ax2.grid(True, alpha=0.3)
-
-        # 3. 按策略的盈亏
-        ax3 = axes[1, 0]
-        strategy_pnls = defaultdict(list)
-        for t in sell_trades:
-            strategy_pnls[t.strategy.value].append(t.pnl)
-
-        if strategy_pnls:
-            strategies = list(strategy_pnls.keys())
-            total_pnls = [sum(strategy_pnls[s]) for s in strategies]
-            colors = ['green' if p > 0 else 'red' for p in total_pnls]
-            bars = ax3.barh(strategies, total_pnls, color=colors, alpha=0.7)
-            ax3.axvline(x=0, color='black', linewidth=0.5)
-            ax3.set_title('P&L by Strategy', fontsize=12, fontweight='bold')
-            ax3.set_xlabel('Total P&L ($)')
-            ax3.grid(True, alpha=0.3)
-
-        # 4. 关键指标雷达图 -> 改为柱状图
-        ax4 = axes[1, 1]
-        metrics = ['Win Rate', 'Profit Factor', 'Sharpe', 'Return %']
-        values = [
-            self.stats['win_rate'],
-            min(self.stats['profit_factor'], 5) * 20,  # 归一化
-            (self.stats['sharpe_ratio'] + 2) * 25,  # 归一化
-            self.stats['total_return']
-        ]
-        colors = ['#2ecc71', '#3498db', '#9b59b6', '#e74c3c']
-        bars = ax4.bar(metrics, values, color=colors, alpha=0.7)
-        ax4.set_title('Key Performance Metrics', fontsize=12, fontweight='bold')
-        ax4.set_ylabel('Value (normalized)')
-        ax4.grid(True, alpha=0.3)
-
-        plt.tight_layout()
-        plt.savefig('backtest_charts.png', dpi=150, bbox_inches='tight')
-        plt.close()
-
-    def _create_html_report(self) -> str:
-        """创建HTML报告"""
+    def generate_report(self, filename: str = "backtest_report.html", interactive: bool = False,
+                        chart_path: str = "backtest_charts.png") -> str:
+        """
+        生成HTML报告
+        interactive=True 时内嵌 JSON 数据 + 静态 JS 交互图表（另存同名 .json），不生成 PNG
+        """
+        import polymarket_report  # 延迟导入
+        json_path = filename.rsplit(".", 1)[0] + ".json" if interactive else None
+        return polymarket_report.render_report(self, filename, interactive=interactive,
+                                               chart_path=chart_path, json_path=json_path)
+
+    def _generate_charts(self, path: str = "backtest_charts.png") -> str:
+        """生成图表 PNG（降采样后绘制）"""
+        import polymarket_report  # 延迟导入
+        return polymarket_report.render_charts(polymarket_report.build_report_data(self), path)
+
+    def _create_html_report(self, charts_html: str = '<img src="backtest_charts.png" alt="Backtest Charts">') -> str:
+        """创建HTML报告（charts_html: 图表区内容）"""
         now = datetime.now()
 
         html = f"""<!DOCTYPE html>
@@ -1221,7 +2742,7 @@ class BacktestEngine:
         <div class="section">
             <h2>📈 回测图表</h2>
             <div class="chart-container">
-                <img src="backtest_charts.png" alt="Backtest Charts">
+                {charts_html}
             </div>
         </div>
 
@@ -1291,7 +2812,7 @@ class BacktestEngine:
             pnl_class = 'profit-text' if trade.pnl > 0 else ('loss-text' if trade.pnl < 0 else '')
             html += f"""
                     <tr>
-                        <td>{trade.trade_id}</td>
+                        <td>{trade.label}</td>
                         <td>{trade.market_id[:15]}...</td>
                         <td>{trade.side}</td>
                         <td>{trade.action}</td>
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Polymarket 量化交易机器人 - 回测报告
+图表数据先降采样（权益曲线 LTTB、逐笔盈亏直方图），与成交笔数无关；
+matplotlib 只在渲染 PNG 时延迟导入，且不经过 pyplot，无显示环境也可运行；
+也可输出 JSON 数据 + 内嵌静态 JS 的交互式图表，完全不依赖 matplotlib
+"""
+
+import json
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from polymarket_quant_bot import ACTIONS, STRATEGY_TYPES
+
+# 中文字体回退（仅在渲染期间生效，不修改全局 rcParams）
+_RC = {
+    "font.sans-serif": ["DejaVu Sans", "Arial Unicode MS", "SimHei"],
+    "axes.unicode_minus": False,
+}
+
+# ==================== 降采样 ====================
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标
+    首尾点必保留，其余每个桶保留与前一保留点、下一桶均值构成三角形面积最大的点
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # 前缀和：O(1) 求任意桶的均值
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+
+    every = (n - 2) / (n_out - 2)
+    edges = (np.floor(np.arange(n_out - 1) * every) + 1).astype(np.int64)
+    edges[-1] = n - 1
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 下一桶（最后一桶以末点代替）的均值
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = (cx[nhi] - cx[nlo]) / (nhi - nlo)
+        avg_y = (cy[nhi] - cy[nlo]) / (nhi - nlo)
+
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def pnl_histogram(pnls: np.ndarray, bins: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+    """逐笔盈亏直方图 (counts, edges)，0 总是落在桶边界上，便于按盈亏着色"""
+    if len(pnls) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(1)
+    lo, hi = float(min(pnls.min(), 0)), float(max(pnls.max(), 0))
+    if hi - lo < 1e-12:
+        hi = lo + 1
+    width = (hi - lo) / bins
+    # 边界对齐到 0
+    start = math.floor(lo / width) * width
+    edges = start + width * np.arange(int(math.ceil((hi - start) / width)) + 1)
+    if edges[-1] < hi:
+        edges = np.append(edges, edges[-1] + width)
+    counts, edges = np.histogram(pnls, bins=edges)
+    return counts, edges
+
+# ==================== 报告数据 ====================
+
+def build_report_data(engine, max_points: int = 2000, bins: int = 50) -> Dict:
+    """从回测引擎提取降采样后的图表数据（可直接 JSON 序列化）"""
+    curve = engine.portfolio.equity_curve
+    timestamps, values = curve.timestamps, curve.values
+    keep = lttb(timestamps, values, max_points)
+
+    trades = engine.portfolio.trades
+    sell_mask = trades.column("action") == ACTIONS.index("SELL")
+    pnls = trades.column("pnl")[sell_mask]
+    counts, edges = pnl_histogram(pnls, bins)
+
+    sell_strategies = trades.column("strategy")[sell_mask]
+    strategy_pnl = {
+        STRATEGY_TYPES[code].value: float(pnls[sell_strategies == code].sum())
+        for code in np.unique(sell_strategies)
+    }
+
+    stats = engine.stats
+    return {
+        "initial_capital": engine.initial_capital,
+        "equity": {
+            "t": (timestamps[keep] // 1000).tolist(),  # 毫秒，便于 JS Date
+            "v": values[keep].round(2).tolist(),
+            "points": int(len(values)),
+        },
+        "pnl_hist": {"counts": counts.tolist(), "edges": edges.round(4).tolist(), "trades": int(len(pnls))},
+        "strategy_pnl": strategy_pnl,
+        "metrics": {
+            "Win Rate": stats["win_rate"],
+            "Profit Factor": min(stats["profit_factor"], 5) * 20,  # 归一化
+            "Sharpe": (stats["sharpe_ratio"] + 2) * 25,             # 归一化
+            "Return %": stats["total_return"],
+        },
+    }
+
+
+def write_report_json(data: Dict, path: str) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return path
+
+# ==================== PNG 图表 ====================
+
+def render_charts(data: Dict, path: str = "backtest_charts.png", dpi: int = 150) -> str:
+    """渲染 2x2 图表为 PNG（延迟导入 matplotlib，直接使用 Figure + Agg 画布）"""
+    import matplotlib
+    from matplotlib.figure import Figure
+
+    with matplotlib.rc_context(_RC):
+        fig = Figure(figsize=(14, 10))
+        axes = fig.subplots(2, 2)
+        initial = data["initial_capital"]
+
+        # 1. 权益曲线（LTTB 降采样后）
+        ax1 = axes[0, 0]
+        equity = data["equity"]
+        if equity["v"]:
+            dates = np.array(equity["t"], dtype="datetime64[ms]")
+            values = np.array(equity["v"])
+            ax1.plot(dates, values, 'b-', linewidth=1.5, label='Equity')
+            ax1.axhline(y=initial, color='gray', linestyle='--', alpha=0.7, label='Initial')
+            ax1.fill_between(dates, initial, values, alpha=0.3)
+            ax1.set_title('Equity Curve', fontsize=12, fontweight='bold')
+            ax1.set_xlabel('Date')
+            ax1.set_ylabel('Portfolio Value ($)')
+            ax1.legend()
+            ax1.grid(True, alpha=0.3)
+
+        # 2. 逐笔盈亏分布（直方图，桶数固定）
+        ax2 = axes[0, 1]
+        hist = data["pnl_hist"]
+        if hist["counts"]:
+            edges = np.array(hist["edges"])
+            centers = (edges[:-1] + edges[1:]) / 2
+            colors = np.where(centers > 0, 'green', 'red')
+            ax2.bar(edges[:-1], hist["counts"], width=np.diff(edges), align='edge', color=colors, alpha=0.7)
+            ax2.axvline(x=0, color='black', linewidth=0.5)
+            ax2.set_title('Trade P&L Distribution', fontsize=12, fontweight='bold')
+            ax2.set_xlabel('P&L ($)')
+            ax2.set_ylabel('Trades')
+            ax2.grid(True, alpha=0.3)
+
+        # 3. 按策略的盈亏
+        ax3 = axes[1, 0]
+        strategy_pnl = data["strategy_pnl"]
+        if strategy_pnl:
+            total_pnls = list(strategy_pnl.values())
+            colors = ['green' if p > 0 else 'red' for p in total_pnls]
+            ax3.barh(list(strategy_pnl), total_pnls, color=colors, alpha=0.7)
+            ax3.axvline(x=0, color='black', linewidth=0.5)
+            ax3.set_title('P&L by Strategy', fontsize=12, fontweight='bold')
+            ax3.set_xlabel('Total P&L ($)')
+            ax3.grid(True, alpha=0.3)
+
+        # 4. 关键指标
+        ax4 = axes[1, 1]
+        metrics = data["metrics"]
+        ax4.bar(list(metrics), list(metrics.values()), color=['#2ecc71', '#3498db', '#9b59b6', '#e74c3c'], alpha=0.7)
+        ax4.set_title('Key Performance Metrics', fontsize=12, fontweight='bold')
+        ax4.set_ylabel('Value (normalized)')
+        ax4.grid(True, alpha=0.3)
+
+        fig.tight_layout()
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    return path
+
+# ==================== 交互式图表 (JSON + 静态 JS) ====================
+
+_REPORT_JS = """
+(function () {
+  const R = REPORT_DATA;
+  const fmt = v => '$' + v.toLocaleString(undefined, {maximumFractionDigits: 2});
+
+  function setup(id) {
+    const c = document.getElementById(id), dpr = window.devicePixelRatio || 1;
+    const w = c.clientWidth, h = c.clientHeight;
+    c.width = w * dpr; c.height = h * dpr;
+    const g = c.getContext('2d'); g.scale(dpr, dpr);
+    g.font = '12px sans-serif'; g.fillStyle = '#ccc'; g.strokeStyle = '#ccc';
+    return {c, g, w, h, pad: 50};
+  }
+
+  function scale(d0, d1, r0, r1) {
+    const k = d1 === d0 ? 0 : (r1 - r0) / (d1 - d0);
+    return v => r0 + (v - d0) * k;
+  }
+
+  function title(p, text) { p.g.fillStyle = '#00d4ff'; p.g.fillText(text, p.pad, 18); p.g.fillStyle = '#ccc'; }
+
+  function equity() {
+    const p = setup('chart-equity'), t = R.equity.t, v = R.equity.v;
+    if (!v.length) return;
+    const lo = Math.min(R.initial_capital, ...v), hi = Math.max(R.initial_capital, ...v);
+    const X = scale(t[0], t[t.length - 1], p.pad, p.w - 10), Y = scale(lo, hi, p.h - 30, 30);
+    const draw = () => {
+      p.g.clearRect(0, 0, p.w, p.h);
+      title(p, 'Equity Curve (' + v.length + ' of ' + R.equity.points + ' points)');
+      p.g.setLineDash([4, 4]); p.g.strokeStyle = '#888';
+      p.g.beginPath(); p.g.moveTo(p.pad, Y(R.initial_capital)); p.g.lineTo(p.w - 10, Y(R.initial_capital)); p.g.stroke();
+      p.g.setLineDash([]); p.g.strokeStyle = '#3498db'; p.g.lineWidth = 1.5;
+      p.g.beginPath(); v.forEach((y, i) => i ? p.g.lineTo(X(t[i]), Y(y)) : p.g.moveTo(X(t[i]), Y(y))); p.g.stroke();
+      p.g.lineWidth = 1; p.g.fillStyle = '#ccc';
+      p.g.fillText(fmt(hi), 2, 34); p.g.fillText(fmt(lo), 2, p.h - 30);
+    };
+    draw();
+    p.c.addEventListener('mousemove', e => {
+      const x = e.offsetX;
+      let i = 0, best = Infinity;
+      t.forEach((ti, j) => { const d = Math.abs(X(ti) - x); if (d < best) { best = d; i = j; } });
+      draw();
+      p.g.fillStyle = '#ffd700'; p.g.beginPath(); p.g.arc(X(t[i]), Y(v[i]), 4, 0, 2 * Math.PI); p.g.fill();
+      p.g.fillText(new Date(t[i]).toISOString().slice(0, 16).replace('T', ' ') + '  ' + fmt(v[i]), p.pad + 200, 18);
+    });
+  }
+
+  function histogram() {
+    const p = setup('chart-pnl'), h = R.pnl_hist, e = h.edges;
+    title(p, 'Trade P&L Distribution (' + h.trades + ' trades)');
+    if (!h.counts.length) return;
+    const X = scale(e[0], e[e.length - 1], p.pad, p.w - 10), Y = scale(0, Math.max(...h.counts), p.h - 30, 30);
+    h.counts.forEach((n, i) => {
+      p.g.fillStyle = (e[i] + e[i + 1]) / 2 > 0 ? 'rgba(0,255,136,0.7)' : 'rgba(255,107,107,0.7)';
+      p.g.fillRect(X(e[i]), Y(n), Math.max(X(e[i + 1]) - X(e[i]) - 1, 1), Y(0) - Y(n));
+    });
+    p.g.fillStyle = '#ccc'; p.g.fillText(fmt(e[0]), p.pad, p.h - 12);
+    p.g.fillText(fmt(e[e.length - 1]), p.w - 80, p.h - 12);
+  }
+
+  function bars(id, text, entries) {
+    const p = setup(id);
+    title(p, text);
+    if (!entries.length) return;
+    const vals = entries.map(e => e[1]), lo = Math.min(0, ...vals), hi = Math.max(0, ...vals);
+    const X = scale(lo, hi, 140, p.w - 20), rowH = (p.h - 40) / entries.length;
+    entries.forEach(([name, val], i) => {
+      const y = 30 + i * rowH;
+      p.g.fillStyle = val >= 0 ? 'rgba(0,255,136,0.7)' : 'rgba(255,107,107,0.7)';
+      p.g.fillRect(Math.min(X(0), X(val)), y + 4, Math.abs(X(val) - X(0)), rowH - 8);
+      p.g.fillStyle = '#ccc'; p.g.fillText(name, 4, y + rowH / 2 + 4);
+      p.g.fillText(val.toFixed(2), Math.max(X(0), X(val)) + 4, y + rowH / 2 + 4);
+    });
+  }
+
+  equity();
+  histogram();
+  bars('chart-strategy', 'P&L by Strategy', Object.entries(R.strategy_pnl));
+  bars('chart-metrics', 'Key Performance Metrics', Object.entries(R.metrics));
+})();
+"""
+
+
+def interactive_chart_html(data: Dict) -> str:
+    """交互式图表片段：四个 canvas + 内嵌报告数据与静态 JS（无外部依赖）"""
+    payload = json.dumps(data, ensure_ascii=False).replace("</", "<\\/")
+    canvases = "\n".join(
+        f'<canvas id="{cid}" style="width: 48%; height: 320px; margin: 1%;"></canvas>'
+        for cid in ("chart-equity", "chart-pnl", "chart-strategy", "chart-metrics")
+    )
+    return f"""{canvases}
+<script>const REPORT_DATA = {payload};</script>
+<script>{_REPORT_JS}</script>"""
+
+
+def render_report(engine, filename: str = "backtest_report.html", interactive: bool = False,
+                  chart_path: str = "backtest_charts.png", max_points: int = 2000,
+                  bins: int = 50, json_path: Optional[str] = None) -> str:
+    """
+    生成 HTML 报告
+    interactive=False: 渲染 PNG 图表并在 HTML 中引用
+    interactive=True:  内嵌 JSON 数据 + 静态 JS 图表（可另存 json_path），不导入 matplotlib
+    """
+    data = build_report_data(engine, max_points=max_points, bins=bins)
+    if interactive:
+        if json_path:
+            write_report_json(data, json_path)
+        charts = interactive_chart_html(data)
+    else:
+        render_charts(data, chart_path)
+        src = os.path.relpath(chart_path, os.path.dirname(os.path.abspath(filename)))
+        charts = f'<img src="{src}" alt="Backtest Charts">'
+
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(engine._create_html_report(charts))
+    return filename
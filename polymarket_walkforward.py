@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Polymarket 量化交易机器人 - 滚动前推 (Walk-Forward) 优化
+将事件序列切分为滚动的训练/测试折，在训练折上并行寻优参数，
+在紧随其后的样本外折上评估，并拼接样本外权益曲线
+"""
+
+import itertools
+import json
+import os
+import pickle
+import struct
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from polymarket_quant_bot import (
+    ArbitrageStrategy,
+    BacktestEngine,
+    FillModel,
+    Market,
+    MarketDataGenerator,
+    MarketMakingStrategy,
+    MarketTape,
+    MeanReversionStrategy,
+    MomentumStrategy,
+    SentimentStrategy,
+    TradingStrategy,
+    WhaleTrackingStrategy,
+    to_us,
+)
+
+# ==================== 参数空间 ====================
+
+DEFAULT_PARAM_GRID = {
+    "momentum_lookback": [5, 10, 20],
+    "momentum_threshold": [0.03, 0.05],
+    "mean_reversion_band": [0.20, 0.25],
+    "sentiment_volume_threshold": [1.5, 2.0],
+}
+
+
+def build_default_strategies(params: Dict) -> List[TradingStrategy]:
+    """根据参数构建默认的六个策略（模块级函数，便于进程池序列化）"""
+    band = params.get("mean_reversion_band", 0.25)
+    return [
+        MarketMakingStrategy(spread_target=params.get("spread_target", 0.02), position_limit=500),
+        ArbitrageStrategy(min_profit_threshold=params.get("min_profit_threshold", 0.005)),
+        MomentumStrategy(
+            lookback=params.get("momentum_lookback", 10),
+            threshold=params.get("momentum_threshold", 0.05),
+        ),
+        MeanReversionStrategy(oversold_threshold=band, overbought_threshold=1 - band),
+        SentimentStrategy(volume_threshold=params.get("sentiment_volume_threshold", 2.0)),
+        WhaleTrackingStrategy(large_order_threshold=params.get("large_order_threshold", 10000)),
+    ]
+
+
+def expand_grid(param_grid: Dict[str, List]) -> List[Dict]:
+    """展开参数网格为参数组合列表"""
+    keys = list(param_grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+# ==================== 预计算特征 ====================
+
+class TapeFeatures:
+    """
+    事件序列的列式特征
+    整个序列只计算一次，所有折通过下标切片复用，不再重复计算
+    输入为 MarketTape 时各列直接引用其列（内存映射存储同样适用），
+    序列化到工作进程时不复制这些列，由 markets 自身的序列化方式决定（映射存储按路径引用）
+    """
+
+    # 直接引用 MarketTape 列、序列化时不单独保存的属性
+    _TAPE_ALIASES = ("yes_prices", "volumes", "market_codes", "_timestamps_us")
+
+    def __init__(self, markets: Union[MarketTape, List[Market]]):
+        self.markets = markets
+        n = len(markets)
+        self._shared_index = False
+
+        if isinstance(markets, MarketTape):
+            # 列式数据直接复用，无需逐事件遍历
+            self._bind_tape()
+            self.market_ids = np.array(markets.market_ids)
+            market_rows = markets.market_rows() if hasattr(markets, "market_rows") else None
+            if market_rows is not None:
+                # 映射存储自带按市场的行索引
+                self._order, self._offsets = market_rows
+                self._shared_index = True
+                return
+        else:
+            self._timestamps_us = np.fromiter((to_us(m.timestamp) for m in markets), dtype=np.int64, count=n)
+            self.yes_prices = np.fromiter((m.yes_price for m in markets), dtype=np.float64, count=n)
+            self.volumes = np.fromiter((m.volume for m in markets), dtype=np.float64, count=n)
+            self.market_ids, self.market_codes = np.unique([m.market_id for m in markets], return_inverse=True)
+
+        # 每个市场的事件下标（按时间顺序）
+        self._order = np.argsort(self.market_codes, kind="stable")
+        counts = np.bincount(self.market_codes, minlength=len(self.market_ids))
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def _bind_tape(self):
+        tape = self.markets
+        self._timestamps_us = tape.timestamps
+        self.yes_prices = tape.yes_prices
+        self.volumes = tape.volumes
+        self.market_codes = tape.codes
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if isinstance(self.markets, MarketTape):
+            for name in self._TAPE_ALIASES:
+                state.pop(name)
+            if self._shared_index:
+                state.pop("_order")
+                state.pop("_offsets")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if isinstance(self.markets, MarketTape):
+            self._bind_tape()
+            if self._shared_index:
+                self._order, self._offsets = self.markets.market_rows()
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """事件时间（秒）"""
+        return self._timestamps_us / 1e6
+
+    def span(self) -> Tuple[float, float]:
+        """首尾事件时间（秒）"""
+        if len(self) == 0:
+            return 0.0, 0.0
+        return self._timestamps_us[0] / 1e6, self._timestamps_us[-1] / 1e6
+
+    def __len__(self) -> int:
+        return len(self.markets)
+
+    def market_history(self, code: int, before: int) -> np.ndarray:
+        """返回市场 code 在全局下标 before 之前的所有事件下标"""
+        events = self._order[self._offsets[code]:self._offsets[code + 1]]
+        return events[:np.searchsorted(events, before)]
+
+    def warm_start(self, strategies: List[TradingStrategy], start: int, stop: int):
+        """用折起点之前的历史预热在该折内活跃的市场"""
+        if start == 0:
+            return
+        for code in np.unique(self.market_codes[start:stop]):
+            history = self.market_history(code, start)
+            if len(history) == 0:
+                continue
+            market_id = str(self.market_ids[code])
+            yes_prices = self.yes_prices[history]
+            volumes = self.volumes[history]
+            for strategy in strategies:
+                strategy.warm_start(market_id, yes_prices, volumes)
+
+    def split_folds(self, n_folds: int, train_segments: int = 3) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        """
+        按时间等分为 n_folds + train_segments 段
+        第 k 折: 训练 [k, k+train_segments) 段, 测试第 k+train_segments 段
+        Returns: [((train_start, train_stop), (test_start, test_stop)), ...]
+        """
+        if len(self) == 0:
+            return []
+        ts = self._timestamps_us
+        edges_t = np.linspace(ts[0], ts[-1], n_folds + train_segments + 1)
+        edges = np.searchsorted(ts, edges_t, side="left")
+        edges[-1] = len(self)
+
+        folds = []
+        for k in range(n_folds):
+            train = (int(edges[k]), int(edges[k + train_segments]))
+            test = (int(edges[k + train_segments]), int(edges[k + train_segments + 1]))
+            if train[1] > train[0] and test[1] > test[0]:
+                folds.append((train, test))
+        return folds
+
+# ==================== 进程池工作函数 ====================
+
+_WORKER_FEATURES: Optional[TapeFeatures] = None
+_WORKER_BUILDER: Optional[Callable[[Dict], List[TradingStrategy]]] = None
+_WORKER_ENGINE_KWARGS: Dict = {}
+
+
+def _init_worker(features: TapeFeatures, builder: Callable, engine_kwargs: Dict):
+    global _WORKER_FEATURES, _WORKER_BUILDER, _WORKER_ENGINE_KWARGS
+    _WORKER_FEATURES = features
+    _WORKER_BUILDER = builder
+    _WORKER_ENGINE_KWARGS = engine_kwargs
+
+
+def _evaluate(window: Tuple[int, int], params: Dict) -> Tuple[Dict, List[Tuple[datetime, float]]]:
+    """在 [start, stop) 事件窗口上以给定参数运行一次回测"""
+    start, stop = window
+    engine = BacktestEngine(**_WORKER_ENGINE_KWARGS)
+    for strategy in _WORKER_BUILDER(params):
+        engine.add_strategy(strategy)
+
+    _WORKER_FEATURES.warm_start(engine.strategies, start, stop)
+    stats = engine.run(verbose=False, markets=_WORKER_FEATURES.markets[start:stop])
+    return stats, engine.portfolio.equity_curve
+
+# ==================== 完成记录 ====================
+
+class SweepJournal:
+    """
+    参数扫描的完成记录（追加式二进制文件）
+    每条记录为 长度前缀 + pickle((key, result))，每完成一个任务追加一条；
+    重启后已完成的 (窗口, 参数) 直接取用结果，不再重复回测。
+    首条记录保存数据/配置指纹，指纹不符时清空重来；写入中途崩溃留下的残缺尾记录会被截掉
+    """
+
+    _LENGTH = struct.Struct("<Q")
+    _FINGERPRINT_KEY = "__fingerprint__"
+
+    def __init__(self, path: str, fingerprint: Any = None):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.done: Dict[str, Any] = {}
+
+        records, valid_size = self._read() if os.path.exists(path) else ([], 0)
+        if records and records[0] == (self._FINGERPRINT_KEY, fingerprint):
+            self.done = dict(records[1:])
+            with open(path, "r+b") as f:
+                f.truncate(valid_size)
+        else:
+            with open(path, "wb"):
+                pass
+            self._append(self._FINGERPRINT_KEY, fingerprint)
+
+    def _read(self) -> Tuple[List[Tuple[str, Any]], int]:
+        records, offset = [], 0
+        with open(self.path, "rb") as f:
+            data = f.read()
+        while offset + self._LENGTH.size <= len(data):
+            (length,) = self._LENGTH.unpack_from(data, offset)
+            end = offset + self._LENGTH.size + length
+            if end > len(data):
+                break
+            try:
+                records.append(pickle.loads(data[offset + self._LENGTH.size:end]))
+            except Exception:
+                break
+            offset = end
+        return records, offset
+
+    def _append(self, key: str, result: Any):
+        payload = pickle.dumps((key, result), protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self.path, "ab") as f:
+            f.write(self._LENGTH.pack(len(payload)) + payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def key(window: Tuple[int, int], params: Dict) -> str:
+        return json.dumps([list(window), params], sort_keys=True, default=str)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.done
+
+    def get(self, key: str) -> Any:
+        return self.done[key]
+
+    def record(self, key: str, result: Any):
+        self.done[key] = result
+        self._append(key, result)
+
+# ==================== 滚动前推优化器 ====================
+
+@dataclass
+class FoldResult:
+    """单折结果"""
+    fold: int
+    train_window: Tuple[int, int]
+    test_window: Tuple[int, int]
+    best_params: Dict
+    train_score: float
+    test_stats: Dict
+    equity_curve: List[Tuple[datetime, float]] = field(default_factory=list)
+
+
+class WalkForwardOptimizer:
+    """滚动前推优化器"""
+
+    def __init__(
+        self,
+        param_grid: Optional[Dict[str, List]] = None,
+        strategy_builder: Callable[[Dict], List[TradingStrategy]] = build_default_strategies,
+        n_folds: int = 12,
+        train_segments: int = 3,
+        objective: str = "sharpe_ratio",
+        initial_capital: float = 10000,
+        fee_rate: float = 0.01,
+        fill_model: Optional[FillModel] = None,
+        max_workers: Optional[int] = None,
+        journal_path: Optional[str] = None
+    ):
+        self.param_grid = param_grid or DEFAULT_PARAM_GRID
+        self.strategy_builder = strategy_builder
+        self.n_folds = n_folds
+        self.train_segments = train_segments
+        self.objective = objective
+        self.initial_capital = initial_capital
+        self.fee_rate = fee_rate
+        self.fill_model = fill_model
+        self.max_workers = max_workers
+        self.journal_path = journal_path  # 完成记录文件，重启时跳过已完成的回测任务
+        self.journal: Optional[SweepJournal] = None
+
+        self.fold_results: List[FoldResult] = []
+        self.oos_equity_curve: List[Tuple[datetime, float]] = []
+
+    def _score(self, stats: Dict) -> float:
+        score = stats.get(self.objective, 0)
+        if score is None or not np.isfinite(score):
+            return -np.inf
+        return score
+
+    def _fingerprint(self, features: TapeFeatures) -> Tuple:
+        """数据与回测配置指纹（决定完成记录能否复用）"""
+        span = tuple(float(t) for t in features.span())
+        return (len(features), span, self.n_folds, self.train_segments, self.initial_capital, self.fee_rate,
+                getattr(self.strategy_builder, "__qualname__", repr(self.strategy_builder)),
+                self._fill_model_params())
+
+    def _fill_model_params(self) -> Optional[Tuple]:
+        model = self.fill_model
+        if model is None:
+            return None
+        params = sorted((k, v) for k, v in vars(model).items() if not k.startswith("_"))
+        return type(model).__name__, tuple(params)
+
+    def _map(self, features: TapeFeatures, jobs: List[Tuple[Tuple[int, int], Dict]]) -> List:
+        """执行回测任务（跳过完成记录中已有的任务）；max_workers=1 时在当前进程串行执行"""
+        journal = self.journal
+        keys = [SweepJournal.key(window, params) for window, params in jobs]
+        results = [journal.get(k) if journal and k in journal else None for k in keys]
+        pending = [i for i, r in enumerate(results) if r is None]
+        if not pending:
+            return results
+
+        def done(i: int, result):
+            results[i] = result
+            if journal:
+                journal.record(keys[i], result)
+
+        engine_kwargs = {
+            "initial_capital": self.initial_capital,
+            "fee_rate": self.fee_rate,
+            "fill_model": self.fill_model,
+        }
+        if self.max_workers == 1:
+            _init_worker(features, self.strategy_builder, engine_kwargs)
+            for i in pending:
+                done(i, _evaluate(*jobs[i]))
+            return results
+
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(features, self.strategy_builder, engine_kwargs)
+        ) as pool:
+            futures = {pool.submit(_evaluate, *jobs[i]): i for i in pending}
+            for future in as_completed(futures):
+                done(futures[future], future.result())
+        return results
+
+    def run(self, markets: Union[MarketTape, List[Market]], verbose: bool = True) -> Dict:
+        """
+        运行滚动前推优化
+        markets: 按时间排序的完整事件序列（只生成一次）
+        """
+        features = TapeFeatures(markets)
+        folds = features.split_folds(self.n_folds, self.train_segments)
+        combos = expand_grid(self.param_grid)
+        if self.journal_path:
+            self.journal = SweepJournal(self.journal_path, self._fingerprint(features))
+
+        if verbose:
+            print("=" * 60)
+            print("Walk-Forward 优化")
+            print("=" * 60)
+            print(f"事件数量: {len(features)}")
+            print(f"折数: {len(folds)}  参数组合: {len(combos)}")
+            if self.journal and self.journal.done:
+                print(f"已完成任务: {len(self.journal.done)}（从完成记录恢复）")
+
+        # 1. 所有折的训练任务一起并行
+        train_jobs = [(train, params) for train, _ in folds for params in combos]
+        train_results = self._map(features, train_jobs)
+
+        best = []
+        for k in range(len(folds)):
+            fold_results = train_results[k * len(combos):(k + 1) * len(combos)]
+            scores = [self._score(stats) for stats, _ in fold_results]
+            i = int(np.argmax(scores))
+            best.append((combos[i], scores[i]))
+
+        # 2. 样本外评估（各折互相独立，同样并行）
+        test_jobs = [(test, params) for (_, test), (params, _) in zip(folds, best)]
+        test_results = self._map(features, test_jobs)
+
+        self.fold_results = []
+        for k, ((train, test), (params, score), (stats, curve)) in enumerate(zip(folds, best, test_results)):
+            self.fold_results.append(FoldResult(
+                fold=k,
+                train_window=train,
+                test_window=test,
+                best_params=params,
+                train_score=score,
+                test_stats=stats,
+                equity_curve=curve
+            ))
+            if verbose:
+                print(f"  Fold {k + 1:2d}: {params} | 训练 {self.objective}={score:.2f} | "
+                      f"样本外收益 {stats.get('total_return', 0):.2f}%")
+
+        self.oos_equity_curve = self.stitch_equity_curves()
+        return self.summary()
+
+    def stitch_equity_curves(self) -> List[Tuple[datetime, float]]:
+        """将各折样本外权益曲线按复利方式拼接（每折起点接上一折终值）"""
+        stitched = []
+        equity = self.initial_capital
+        for result in self.fold_results:
+            if not result.equity_curve:
+                continue
+            scale = equity / self.initial_capital
+            stitched.extend((t, v * scale) for t, v in result.equity_curve)
+            equity = result.test_stats.get("final_equity", result.equity_curve[-1][1]) * scale
+        return stitched
+
+    def summary(self) -> Dict:
+        """样本外汇总统计"""
+        values = np.array([v for _, v in self.oos_equity_curve], dtype=np.float64)
+        if len(values) == 0:
+            return {"folds": len(self.fold_results), "oos_return": 0, "oos_max_drawdown": 0, "oos_sharpe": 0}
+
+        final_equity = self.initial_capital
+        for result in self.fold_results:
+            final_equity *= result.test_stats.get("final_equity", self.initial_capital) / self.initial_capital
+
+        peak = np.maximum.accumulate(values)
+        returns = np.diff(values) / values[:-1] if len(values) > 1 else np.zeros(1)
+        std = np.std(returns)
+
+        return {
+            "folds": len(self.fold_results),
+            "oos_final_equity": float(final_equity),
+            "oos_return": float((final_equity - self.initial_capital) / self.initial_capital * 100),
+            "oos_max_drawdown": float(np.max((peak - values) / peak)) * 100,
+            "oos_sharpe": float(np.mean(returns) / std * np.sqrt(252)) if std > 0 else 0,
+            "best_params": [r.best_params for r in self.fold_results],
+        }
+
+
+if __name__ == "__main__":
+    generator = MarketDataGenerator(seed=42)
+    tape = generator.generate_tape(days=90, markets_per_day=3)
+
+    optimizer = WalkForwardOptimizer(n_folds=12)
+    summary = optimizer.run(tape)
+    print(f"\n样本外收益: {summary['oos_return']:.2f}%  最大回撤: {summary['oos_max_drawdown']:.2f}%  "
+          f"Sharpe: {summary['oos_sharpe']:.2f}")
@@ -4,17 +4,23 @@
 China Futures 15-Minute Auto Analysis System
 """
 
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
 import subprocess
 
+from futures_intraday import IntradayBars, annualization_factor, latest_indicators
+from futures_warehouse import FuturesWarehouse
+
 class ChinaFuturesAutoAnalyzer:
     """国内期货自动分析器"""
     
-    def __init__(self):
+    def __init__(self, period=15):
+        self.warehouse = FuturesWarehouse()
+        # K线周期 (分钟, 1/5/15/30/60); None 时使用日线
+        self.period = period
+        self.intraday = IntradayBars(period) if period else None
         self.futures_list = {
             # 股指期货
             'IF': {'name': '沪深300', 'exchange': 'CFFEX', 'category': '股指期货', 'unit': '点'},
@@ -55,8 +61,11 @@ class ChinaFuturesAutoAnalyzer:
     
     def get_data(self, symbol):
         try:
-            data = ak.futures_main_sina(symbol=f'{symbol}0')
-            if data.empty or len(data) < 20:
+            if self.intraday is not None:
+                data = self.intraday.get(symbol)
+            else:
+                data = self.warehouse.get(symbol)
+            if data is None or len(data) < 20:
                 return None
             return data
         except:
@@ -73,16 +82,15 @@ class ChinaFuturesAutoAnalyzer:
         close = latest['收盘价']
         change_pct = ((close - prev['收盘价']) / prev['收盘价']) * 100
         
-        sma5 = np.mean(closes[-5:])
-        sma10 = np.mean(closes[-10:])
-        sma20 = np.mean(closes[-20:])
+        ind = latest_indicators(data)
+        sma5, sma10, sma20 = ind['sma5'], ind['sma10'], ind['sma20']
         
         if len(closes) >= 21:
             returns = []
             for i in range(len(closes)-20, len(closes)):
                 ret = (closes[i] - closes[i-1]) / closes[i-1]
                 returns.append(ret)
-            volatility = np.std(returns) * np.sqrt(252) * 100 if returns else 0
+            volatility = np.std(returns) * annualization_factor(symbol, self.period) * 100 if returns else 0
         else:
             volatility = 0
         
@@ -130,7 +138,7 @@ class ChinaFuturesAutoAnalyzer:
 
 **生成时间:** {timestamp.strftime('%Y-%m-%d %H:%M:%S')}  
 **分析师:** JARVIS QFA/FOE  
-**数据周期:** 15分钟  
+**数据周期:** {f'{self.period}分钟' if self.period else '日线'}  
 **覆盖品种:** {len(self.futures_list)}个
 
 ---
@@ -147,6 +155,10 @@ class ChinaFuturesAutoAnalyzer:
 """
         
         categories = {}
+        if self.intraday is not None:
+            self.intraday.refresh(list(self.futures_list))  # 并发增量拉取分钟线
+        else:
+            self.warehouse.refresh_stale(list(self.futures_list))  # 并发增量刷新过期品种
         for symbol, info in self.futures_list.items():
             data = self.get_data(symbol)
             if data is not None:
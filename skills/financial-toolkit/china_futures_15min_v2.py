@@ -10,18 +10,34 @@ China Futures 15-Minute Auto Analysis with High Win Rate Strategies
 - 其他品种: 自适应策略选择
 """
 
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
 import subprocess
 
+from futures_intraday import IntradayBars, annualization_factor, latest_indicators
+from futures_registry import StrategyRegistry
+from futures_warehouse import FuturesWarehouse
+
+# 报告中的策略特点说明
+STRATEGY_NOTES = {
+    'Mean_Reversion': '均值回归，适合震荡',
+    'SMA_Crossover': '趋势跟踪，盈亏比高',
+    'Volatility_Breakout': '波动率突破，高收益',
+    'Breakout': '趋势突破，信号少',
+}
+
 class ChinaFuturesAutoAnalyzerV2:
     """国内期货自动分析器 V2 - 高胜率策略"""
     
-    def __init__(self):
-        # 品种配置 + 推荐策略 (基于回测结果)
+    def __init__(self, period=15):
+        self.warehouse = FuturesWarehouse()
+        # K线周期 (分钟, 1/5/15/30/60); None 时使用日线
+        self.period = period
+        self.intraday = IntradayBars(period) if period else None
+        self.registry = StrategyRegistry()
+        # 品种配置 + 推荐策略 (策略注册表中没有的品种沿用这里的回测结果)
         self.futures_list = {
             # 股指期货 - 推荐 Mean_Reversion (高胜率)
             'IF': {'name': '沪深300', 'exchange': 'CFFEX', 'category': '股指期货', 'unit': '点', 'strategy': 'Mean_Reversion', 'win_rate': 0.778},
@@ -65,11 +81,17 @@ class ChinaFuturesAutoAnalyzerV2:
             'CF': {'name': '棉花', 'exchange': 'CZCE', 'category': '农产品', 'unit': '元/吨', 'strategy': 'SMA_Crossover', 'win_rate': 0.000},
             'OI': {'name': '菜籽油', 'exchange': 'CZCE', 'category': '农产品', 'unit': '元/吨', 'strategy': 'SMA_Crossover', 'win_rate': 0.000},
         }
+        # 用策略注册表 (回测写入, 夜间增量刷新) 覆盖推荐策略和胜率
+        self.registry_updated = self.registry.load().get('updated_at')
+        self.registry.apply(self.futures_list)
     
     def get_data(self, symbol):
         try:
-            data = ak.futures_main_sina(symbol=f'{symbol}0')
-            if data.empty or len(data) < 30:
+            if self.intraday is not None:
+                data = self.intraday.get(symbol)
+            else:
+                data = self.warehouse.get(symbol)
+            if data is None or len(data) < 30:
                 return None
             return data
         except:
@@ -86,13 +108,11 @@ class ChinaFuturesAutoAnalyzerV2:
         highs = data['最高价'].values
         lows = data['最低价'].values
         
-        sma5 = np.mean(closes[-5:])
-        sma10 = np.mean(closes[-10:])
-        sma20 = np.mean(closes[-20:])
+        ind = latest_indicators(data)
+        sma5, sma10, sma20 = ind['sma5'], ind['sma10'], ind['sma20']
         
         # 判断交叉
-        prev_sma5 = np.mean(closes[-6:-1])
-        prev_sma10 = np.mean(closes[-11:-1])
+        prev_sma5, prev_sma10 = ind['prev_sma5'], ind['prev_sma10']
         
         current_close = closes[-1]
         
@@ -141,8 +161,8 @@ class ChinaFuturesAutoAnalyzerV2:
         highs = data['最高价'].values
         lows = data['最低价'].values
         
-        sma20 = np.mean(closes[-20:])
-        std20 = np.std(closes[-20:])
+        ind = latest_indicators(data)
+        sma20, std20 = ind['sma20'], ind['std20']
         
         upper_band = sma20 + 2 * std20
         lower_band = sma20 - 2 * std20
@@ -194,19 +214,10 @@ class ChinaFuturesAutoAnalyzerV2:
         适用: AG 等高波动品种
         """
         closes = data['收盘价'].values
-        highs = data['最高价'].values
-        lows = data['最低价'].values
-        
-        # 计算ATR
-        tr_list = []
-        for i in range(-20, 0):
-            tr1 = highs[i] - lows[i]
-            tr2 = abs(highs[i] - closes[i-1])
-            tr3 = abs(lows[i] - closes[i-1])
-            tr_list.append(max(tr1, tr2, tr3))
-        atr = np.mean(tr_list)
         
-        sma20 = np.mean(closes[-20:])
+        # ATR 与均线 (分钟线为增量计算的指标列)
+        ind = latest_indicators(data)
+        atr, sma20 = ind['atr20'], ind['sma20']
         current_close = closes[-1]
         
         # 突破 SMA + 0.5*ATR 做多
@@ -325,7 +336,7 @@ class ChinaFuturesAutoAnalyzerV2:
         # 计算波动率
         if len(closes) >= 21:
             returns = [(closes[i] - closes[i-1]) / closes[i-1] for i in range(-20, 0)]
-            volatility = np.std(returns) * np.sqrt(252) * 100
+            volatility = np.std(returns) * annualization_factor(symbol, self.period) * 100
         else:
             volatility = 0
         
@@ -355,9 +366,9 @@ class ChinaFuturesAutoAnalyzerV2:
 
 **生成时间:** {timestamp.strftime('%Y-%m-%d %H:%M:%S')}  
 **分析师:** JARVIS QFA/FOE  
-**数据周期:** 15分钟  
+**数据周期:** {f'{self.period}分钟' if self.period else '日线'}  
 **覆盖品种:** {len(self.futures_list)}个  
-**策略版本:** V2.0 (基于6个月回测优化)
+**策略版本:** V2.0 ({'策略注册表更新于 ' + self.registry_updated if self.registry_updated else '策略注册表未生成, 使用内置回测结果'})
 
 ---
 
@@ -367,26 +378,28 @@ class ChinaFuturesAutoAnalyzerV2:
 
 | 策略 | 适用品种 | 历史胜率 | 特点 |
 |------|----------|----------|------|
-| **Mean_Reversion** | IF, IM, SC, M | 50-77% | 均值回归，适合震荡 |
-| **SMA_Crossover** | AG, IH, AU | 33-50% | 趋势跟踪，盈亏比高 |
-| **Volatility_Breakout** | AG | 66.7% | 波动率突破，高收益 |
-| **Breakout** | CU | 100% | 趋势突破，信号少 |
-
----
-
-## 🎯 高胜率重点品种
-
-基于回测，以下品种策略表现优异：
-- 🥇 **白银(AG)** + Volatility_Breakout: 66.7% 胜率
-- 🥈 **沪深300(IF)** + Mean_Reversion: 77.8% 胜率
-- 🥉 **中证1000(IM)** + Mean_Reversion: 62.5% 胜率
-
----
-
 """
+        # 策略说明与重点品种按当前推荐策略生成
+        by_strategy = {}
+        for symbol, info in self.futures_list.items():
+            by_strategy.setdefault(info['strategy'], []).append(symbol)
+        for name, symbols in sorted(by_strategy.items(), key=lambda x: -len(x[1])):
+            rates = [self.futures_list[s]['win_rate'] for s in symbols]
+            rate_range = f"{min(rates):.0%}" if min(rates) == max(rates) else f"{min(rates):.0%}-{max(rates):.0%}"
+            report += f"| **{name}** | {', '.join(symbols)} | {rate_range} | {STRATEGY_NOTES.get(name, '')} |\n"
+        
+        report += "\n---\n\n## 🎯 高胜率重点品种\n\n基于回测，以下品种策略表现优异：\n"
+        top = sorted(self.futures_list.items(), key=lambda x: x[1]['win_rate'], reverse=True)[:3]
+        for medal, (symbol, info) in zip(['🥇', '🥈', '🥉'], top):
+            report += f"- {medal} **{info['name']}({symbol})** + {info['strategy']}: {info['win_rate']:.1%} 胜率\n"
+        report += "\n---\n\n"
         
         categories = {}
         high_win_rate_signals = []
+        if self.intraday is not None:
+            self.intraday.refresh(list(self.futures_list))  # 并发增量拉取分钟线
+        else:
+            self.warehouse.refresh_stale(list(self.futures_list))  # 并发增量刷新过期品种
         
         for symbol, info in self.futures_list.items():
             data = self.get_data(symbol)
@@ -4,16 +4,18 @@
 China Futures Analysis System
 """
 
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List
 
+from futures_warehouse import FuturesWarehouse
+
 class ChinaFuturesAnalyzer:
     """国内期货分析器"""
     
     def __init__(self):
+        self.warehouse = FuturesWarehouse()
         # 品种配置
         self.stock_index_futures = {
             'IF': {'name': '沪深300', 'exchange': 'CFFEX', 'multiplier': 300},
@@ -50,8 +52,8 @@ class ChinaFuturesAnalyzer:
     def get_futures_data(self, symbol: str) -> Dict:
         """获取期货数据"""
         try:
-            data = ak.futures_main_sina(symbol=f'{symbol}0')
-            if data.empty:
+            data = self.warehouse.get(symbol)
+            if data is None or data.empty:
                 return {'error': 'No data'}
             
             latest = data.iloc[-1]
@@ -90,6 +92,7 @@ class ChinaFuturesAnalyzer:
     def analyze_stock_index_futures(self) -> Dict:
         """分析股指期货"""
         results = {}
+        self.warehouse.refresh_stale(list(self.stock_index_futures))  # 并发增量刷新过期品种
         for symbol in self.stock_index_futures:
             data = self.get_futures_data(symbol)
             if 'error' not in data:
@@ -100,6 +103,7 @@ class ChinaFuturesAnalyzer:
     def analyze_commodity_futures(self) -> Dict:
         """分析商品期货"""
         results = {}
+        self.warehouse.refresh_stale(list(self.commodity_futures))  # 并发增量刷新过期品种
         for symbol in self.commodity_futures:
             data = self.get_futures_data(symbol)
             if 'error' not in data:
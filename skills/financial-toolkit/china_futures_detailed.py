@@ -4,13 +4,15 @@
 China Futures Detailed Analysis System
 """
 
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from futures_warehouse import FuturesWarehouse
+
 class DetailedFuturesAnalyzer:
     def __init__(self):
+        self.warehouse = FuturesWarehouse()
         self.futures_list = {
             # 股指期货
             'IF': {'name': '沪深300', 'exchange': 'CFFEX', 'category': '股指期货', 'unit': '点'},
@@ -49,8 +51,8 @@ class DetailedFuturesAnalyzer:
     
     def get_data(self, symbol):
         try:
-            data = ak.futures_main_sina(symbol=f'{symbol}0')
-            if data.empty or len(data) < 20:
+            data = self.warehouse.get(symbol)
+            if data is None or len(data) < 20:
                 return None
             return data
         except:
@@ -170,6 +172,7 @@ class DetailedFuturesAnalyzer:
 """
         
         categories = {}
+        self.warehouse.refresh_stale(list(self.futures_list))  # 并发增量刷新过期品种
         for symbol, info in self.futures_list.items():
             data = self.get_data(symbol)
             if data is not None:
@@ -5,33 +5,126 @@ China Futures Backtesting System
 回测周期: 6个月 (2025年8月 - 2026年2月)
 """
 
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple
 import json
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from futures_continuous import ContinuousContracts
+from futures_registry import StrategyRegistry
+from futures_results import BacktestResultStore, metrics_frame, render_markdown
+from futures_warehouse import FuturesWarehouse
+
+# 策略信号: 每行一个动作 (开多/平多/开空/平空)
+SIGNAL_ACTIONS = np.array(['buy', 'sell', 'short', 'close_short'])
+SIGNAL_DTYPE = np.dtype([
+    ('date', 'datetime64[ns]'),
+    ('action', 'U11'),
+    ('price', 'f8'),
+    ('reason', 'U24'),
+])
+
+# 合约规格: 合约乘数, 最小变动价位, 保证金比例, 手续费 (按成交额比例 commission_rate 或按手 commission_per_lot)
+# 数值为近似值, 以交易所/期货公司最新标准为准
+CONTRACT_SPECS = {
+    'IF': {'multiplier': 300, 'tick': 0.2, 'margin': 0.12, 'commission_rate': 0.000023},
+    'IC': {'multiplier': 200, 'tick': 0.2, 'margin': 0.14, 'commission_rate': 0.000023},
+    'IH': {'multiplier': 300, 'tick': 0.2, 'margin': 0.12, 'commission_rate': 0.000023},
+    'IM': {'multiplier': 200, 'tick': 0.2, 'margin': 0.14, 'commission_rate': 0.000023},
+    'AU': {'multiplier': 1000, 'tick': 0.02, 'margin': 0.10, 'commission_per_lot': 10},
+    'AG': {'multiplier': 15, 'tick': 1, 'margin': 0.12, 'commission_rate': 0.00005},
+    'CU': {'multiplier': 5, 'tick': 10, 'margin': 0.10, 'commission_rate': 0.00005},
+    'AL': {'multiplier': 5, 'tick': 5, 'margin': 0.10, 'commission_per_lot': 3},
+    'ZN': {'multiplier': 5, 'tick': 5, 'margin': 0.10, 'commission_per_lot': 3},
+    'NI': {'multiplier': 1, 'tick': 10, 'margin': 0.12, 'commission_per_lot': 3},
+    'RB': {'multiplier': 10, 'tick': 1, 'margin': 0.10, 'commission_rate': 0.0001},
+    'I': {'multiplier': 100, 'tick': 0.5, 'margin': 0.13, 'commission_rate': 0.0001},
+    'J': {'multiplier': 100, 'tick': 0.5, 'margin': 0.15, 'commission_rate': 0.0001},
+    'JM': {'multiplier': 60, 'tick': 0.5, 'margin': 0.15, 'commission_rate': 0.0001},
+    'SC': {'multiplier': 1000, 'tick': 0.1, 'margin': 0.15, 'commission_per_lot': 20},
+    'FU': {'multiplier': 10, 'tick': 1, 'margin': 0.10, 'commission_rate': 0.00005},
+    'RU': {'multiplier': 10, 'tick': 5, 'margin': 0.10, 'commission_per_lot': 3},
+    'TA': {'multiplier': 5, 'tick': 2, 'margin': 0.08, 'commission_per_lot': 3},
+    'MA': {'multiplier': 10, 'tick': 1, 'margin': 0.08, 'commission_per_lot': 2},
+    'EG': {'multiplier': 10, 'tick': 1, 'margin': 0.08, 'commission_per_lot': 3},
+    'FG': {'multiplier': 20, 'tick': 1, 'margin': 0.09, 'commission_per_lot': 6},
+    'SA': {'multiplier': 20, 'tick': 1, 'margin': 0.09, 'commission_per_lot': 3.5},
+    'M': {'multiplier': 10, 'tick': 1, 'margin': 0.08, 'commission_per_lot': 1.5},
+    'Y': {'multiplier': 10, 'tick': 2, 'margin': 0.08, 'commission_per_lot': 2.5},
+    'P': {'multiplier': 10, 'tick': 2, 'margin': 0.08, 'commission_per_lot': 2.5},
+    'SR': {'multiplier': 10, 'tick': 1, 'margin': 0.07, 'commission_per_lot': 3},
+    'CF': {'multiplier': 5, 'tick': 5, 'margin': 0.07, 'commission_per_lot': 4.3},
+    'OI': {'multiplier': 10, 'tick': 1, 'margin': 0.08, 'commission_per_lot': 2},
+}
+DEFAULT_CONTRACT_SPEC = {'multiplier': 10, 'tick': 1, 'margin': 0.10, 'commission_rate': 0.0001}
+
+class IndicatorCache:
+    """
+    滚动指标缓存
+    同一份K线上每个 (指标, 窗口) 只计算一次; 参数扫描时所有参数组合共用, 单次回测时即用即弃
+    """
+    
+    def __init__(self, data: pd.DataFrame):
+        self._close = data['收盘价']
+        self._high = data['最高价']
+        self._low = data['最低价']
+        self.close = self._close.to_numpy(dtype=np.float64)
+        self.high = self._high.to_numpy(dtype=np.float64)
+        self.low = self._low.to_numpy(dtype=np.float64)
+        self._cache = {}
+        self._tr = None
+    
+    def _cached(self, key, compute):
+        values = self._cache.get(key)
+        if values is None:
+            values = self._cache[key] = compute().to_numpy(dtype=np.float64)
+        return values
+    
+    def sma(self, window):
+        return self._cached(('sma', window), lambda: self._close.rolling(window).mean())
+    
+    def std(self, window):
+        return self._cached(('std', window), lambda: self._close.rolling(window).std())
+    
+    def atr(self, window):
+        if self._tr is None:
+            prev_close = self._close.shift(1)
+            self._tr = pd.concat([self._high - self._low, abs(self._high - prev_close),
+                                  abs(self._low - prev_close)], axis=1).max(axis=1)
+        return self._cached(('atr', window), lambda: self._tr.rolling(window).mean())
+    
+    def prior_high(self, window):
+        """前 window 根K线 (不含当前) 的最高价"""
+        return self._cached(('prior_high', window), lambda: self._high.rolling(window, min_periods=1).max().shift(1))
+    
+    def prior_low(self, window):
+        """前 window 根K线 (不含当前) 的最低价"""
+        return self._cached(('prior_low', window), lambda: self._low.rolling(window, min_periods=1).min().shift(1))
+
 
 class FuturesBacktester:
     """期货回测器"""
     
-    def __init__(self, initial_capital=1000000, risk_per_trade=0.02):
+    def __init__(self, initial_capital=1000000, risk_per_trade=0.02, registry=None, adjustment=None):
         self.initial_capital = initial_capital
         self.risk_per_trade = risk_per_trade
         self.results = {}
+        # adjustment 为 'none'/'back'/'ratio' 时使用按持仓量换月的连续合约 (见 futures_continuous), 默认新浪主力连续
+        self.warehouse = FuturesWarehouse() if adjustment is None else ContinuousContracts().warehouse(adjustment)
+        # 完整回测后写入策略注册表 (registry=False 时不写)
+        self.registry = StrategyRegistry() if registry is None else registry
     
-    def get_historical_data(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
-        """获取历史数据"""
+    def get_historical_data(self, symbol: str, start_date: str, end_date: str, max_age=12 * 3600) -> pd.DataFrame:
+        """获取历史数据 (max_age=None 时只读本地仓库)"""
         try:
-            data = ak.futures_main_sina(symbol=f'{symbol}0')
-            if data.empty:
+            # 本地仓库按日期升序存储, 区间切片直接引用内存映射 (数据过期时先增量刷新)
+            data = self.warehouse.get(symbol, start_date, end_date, max_age=max_age)
+            if data is None or data.empty:
                 return None
             
-            # 转换日期
-            data['日期'] = pd.to_datetime(data['日期'])
-            data = data[(data['日期'] >= start_date) & (data['日期'] <= end_date)]
-            data = data.sort_values('日期').reset_index(drop=True)
-            
             return data
         except Exception as e:
             print(f"获取 {symbol} 数据失败: {e}")
@@ -39,254 +132,136 @@ class FuturesBacktester:
     
     # ==================== 策略定义 ====================
     
-    def strategy_sma_crossover(self, data: pd.DataFrame, fast=5, slow=20) -> List[Dict]:
+    @staticmethod
+    def _run_signal_machine(data: pd.DataFrame, start: int, rules, resume=None) -> np.ndarray:
+        """
+        仓位状态机: 信号条件已按整列算好, 这里只在任一条件成立的K线上推进仓位
+        rules: 按优先级排列的 (mask, 允许的当前仓位, 目标仓位, 原因);
+               目标为 ±1 时先平掉现有仓位再开新仓, 目标为 0 时只平仓
+        resume: (起始K线, 初始仓位), 从上次回测的断点继续 (见 resume_strategy)
+        返回 SIGNAL_DTYPE 结构化数组, 与逐行循环产生的信号逐条一致
+        """
+        position = 0
+        if resume is not None:
+            start, position = max(start, resume[0]), resume[1]
+        n = len(data)
+        codes = np.zeros(n, dtype=np.int64)
+        for k, (mask, _, _, _) in enumerate(rules):
+            codes |= mask.astype(np.int64) << k
+        codes[:start] = 0
+        bars = np.flatnonzero(codes)
+        
+        rows, actions, reasons = [], [], []
+        for i, code in zip(bars.tolist(), codes[bars].tolist()):
+            for k, (_, allowed, target, reason) in enumerate(rules):
+                if code >> k & 1 and position in allowed:
+                    if position != 0:
+                        rows.append(i)
+                        actions.append(1 if position == 1 else 3)  # sell / close_short
+                        reasons.append(reason)
+                    if target != 0:
+                        rows.append(i)
+                        actions.append(0 if target == 1 else 2)  # buy / short
+                        reasons.append(reason)
+                    position = target
+                    break
+        
+        signals = np.zeros(len(rows), dtype=SIGNAL_DTYPE)
+        if rows:
+            rows = np.asarray(rows)
+            signals['date'] = data['日期'].to_numpy()[rows]
+            signals['price'] = data['收盘价'].to_numpy(dtype=np.float64)[rows]
+            signals['action'] = SIGNAL_ACTIONS[actions]
+            signals['reason'] = reasons
+        return signals
+    
+    def strategy_sma_crossover(self, data: pd.DataFrame, fast=5, slow=20, indicators=None, resume=None) -> np.ndarray:
         """
         策略1: SMA均线交叉
         金叉做多, 死叉做空
         """
-        signals = []
-        data = data.copy()
-        data['sma_fast'] = data['收盘价'].rolling(fast).mean()
-        data['sma_slow'] = data['收盘价'].rolling(slow).mean()
-        
-        position = 0  # 0: 无仓位, 1: 多头, -1: 空头
-        
-        for i in range(slow + 1, len(data)):
-            prev_fast = data['sma_fast'].iloc[i-1]
-            prev_slow = data['sma_slow'].iloc[i-1]
-            curr_fast = data['sma_fast'].iloc[i]
-            curr_slow = data['sma_slow'].iloc[i]
-            
-            # 金叉 (快线上穿慢线)
-            if prev_fast <= prev_slow and curr_fast > curr_slow and position <= 0:
-                if position == -1:  # 平空仓
-                    signals.append({
-                        'date': data['日期'].iloc[i],
-                        'action': 'close_short',
-                        'price': data['收盘价'].iloc[i],
-                        'reason': 'golden_cross'
-                    })
-                # 开多仓
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'buy',
-                    'price': data['收盘价'].iloc[i],
-                    'reason': 'golden_cross'
-                })
-                position = 1
-            
-            # 死叉 (快线下穿慢线)
-            elif prev_fast >= prev_slow and curr_fast < curr_slow and position >= 0:
-                if position == 1:  # 平多仓
-                    signals.append({
-                        'date': data['日期'].iloc[i],
-                        'action': 'sell',
-                        'price': data['收盘价'].iloc[i],
-                        'reason': 'death_cross'
-                    })
-                # 开空仓
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'short',
-                    'price': data['收盘价'].iloc[i],
-                    'reason': 'death_cross'
-                })
-                position = -1
-        
-        return signals
+        ind = indicators if indicators is not None else IndicatorCache(data)
+        sma_fast = ind.sma(fast)
+        sma_slow = ind.sma(slow)
+        
+        # 与上一根K线比较 (NaN 比较恒为 False, 与逐行循环一致)
+        prev_fast = np.concatenate(([np.nan], sma_fast[:-1]))
+        prev_slow = np.concatenate(([np.nan], sma_slow[:-1]))
+        golden = (prev_fast <= prev_slow) & (sma_fast > sma_slow)
+        death = (prev_fast >= prev_slow) & (sma_fast < sma_slow)
+        
+        return self._run_signal_machine(data, slow + 1, [
+            (golden, (0, -1), 1, 'golden_cross'),
+            (death, (0, 1), -1, 'death_cross'),
+        ], resume)
     
-    def strategy_breakout(self, data: pd.DataFrame, lookback=20) -> List[Dict]:
+    def strategy_breakout(self, data: pd.DataFrame, lookback=20, indicators=None, resume=None) -> np.ndarray:
         """
         策略2: 突破策略
         突破前高做多, 跌破前低做空
         """
-        signals = []
-        data = data.copy()
-        
-        position = 0
-        
-        for i in range(lookback, len(data)):
-            high_20 = data['最高价'].iloc[i-lookback:i].max()
-            low_20 = data['最低价'].iloc[i-lookback:i].min()
-            
-            curr_close = data['收盘价'].iloc[i]
-            curr_high = data['最高价'].iloc[i]
-            curr_low = data['最低价'].iloc[i]
-            
-            # 突破前高做多
-            if curr_high > high_20 and position <= 0:
-                if position == -1:
-                    signals.append({
-                        'date': data['日期'].iloc[i],
-                        'action': 'close_short',
-                        'price': curr_close,
-                        'reason': 'breakout_high'
-                    })
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'buy',
-                    'price': curr_close,
-                    'reason': 'breakout_high'
-                })
-                position = 1
-            
-            # 跌破前低做空
-            elif curr_low < low_20 and position >= 0:
-                if position == 1:
-                    signals.append({
-                        'date': data['日期'].iloc[i],
-                        'action': 'sell',
-                        'price': curr_close,
-                        'reason': 'breakdown_low'
-                    })
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'short',
-                    'price': curr_close,
-                    'reason': 'breakdown_low'
-                })
-                position = -1
+        ind = indicators if indicators is not None else IndicatorCache(data)
         
-        return signals
+        return self._run_signal_machine(data, lookback, [
+            (ind.high > ind.prior_high(lookback), (0, -1), 1, 'breakout_high'),
+            (ind.low < ind.prior_low(lookback), (0, 1), -1, 'breakdown_low'),
+        ], resume)
     
-    def strategy_mean_reversion(self, data: pd.DataFrame, lookback=20, std_dev=2) -> List[Dict]:
+    def strategy_mean_reversion(self, data: pd.DataFrame, lookback=20, std_dev=2, indicators=None, resume=None) -> np.ndarray:
         """
         策略3: 均值回归
         价格偏离均线过多时反向交易
         """
-        signals = []
-        data = data.copy()
-        data['sma'] = data['收盘价'].rolling(lookback).mean()
-        data['std'] = data['收盘价'].rolling(lookback).std()
-        data['upper'] = data['sma'] + std_dev * data['std']
-        data['lower'] = data['sma'] - std_dev * data['std']
-        
-        position = 0
-        
-        for i in range(lookback, len(data)):
-            curr_close = data['收盘价'].iloc[i]
-            upper = data['upper'].iloc[i]
-            lower = data['lower'].iloc[i]
-            sma = data['sma'].iloc[i]
-            
-            # 价格突破上轨, 做空 (回归)
-            if curr_close > upper and position <= 0:
-                if position == -1:
-                    signals.append({
-                        'date': data['日期'].iloc[i],
-                        'action': 'close_short',
-                        'price': curr_close,
-                        'reason': 'mean_reversion_short'
-                    })
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'short',
-                    'price': curr_close,
-                    'reason': 'mean_reversion_short'
-                })
-                position = -1
-            
-            # 价格跌破下轨, 做多 (回归)
-            elif curr_close < lower and position >= 0:
-                if position == 1:
-                    signals.append({
-                        'date': data['日期'].iloc[i],
-                        'action': 'sell',
-                        'price': curr_close,
-                        'reason': 'mean_reversion_long'
-                    })
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'buy',
-                    'price': curr_close,
-                    'reason': 'mean_reversion_long'
-                })
-                position = 1
-            
-            # 价格回归均线, 平仓
-            elif position == 1 and curr_close >= sma:
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'sell',
-                    'price': curr_close,
-                    'reason': 'mean_reversion_exit'
-                })
-                position = 0
-            elif position == -1 and curr_close <= sma:
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'close_short',
-                    'price': curr_close,
-                    'reason': 'mean_reversion_exit'
-                })
-                position = 0
-        
-        return signals
+        ind = indicators if indicators is not None else IndicatorCache(data)
+        sma = ind.sma(lookback)
+        std = ind.std(lookback)
+        upper = sma + std_dev * std
+        lower = sma - std_dev * std
+        close = ind.close
+        
+        return self._run_signal_machine(data, lookback, [
+            # 突破上轨做空 / 跌破下轨做多 (已持同向仓位时平仓后重新开仓)
+            (close > upper, (0, -1), -1, 'mean_reversion_short'),
+            (close < lower, (0, 1), 1, 'mean_reversion_long'),
+            # 回归均线平仓
+            (close >= sma, (1,), 0, 'mean_reversion_exit'),
+            (close <= sma, (-1,), 0, 'mean_reversion_exit'),
+        ], resume)
     
-    def strategy_volatility_breakout(self, data: pd.DataFrame, lookback=20) -> List[Dict]:
+    def strategy_volatility_breakout(self, data: pd.DataFrame, lookback=20, atr_mult=0.5, indicators=None, resume=None) -> np.ndarray:
         """
         策略4: 波动率突破
         基于ATR的突破策略
         """
-        signals = []
-        data = data.copy()
-        
-        # 计算ATR
-        data['tr1'] = data['最高价'] - data['最低价']
-        data['tr2'] = abs(data['最高价'] - data['收盘价'].shift(1))
-        data['tr3'] = abs(data['最低价'] - data['收盘价'].shift(1))
-        data['tr'] = data[['tr1', 'tr2', 'tr3']].max(axis=1)
-        data['atr'] = data['tr'].rolling(lookback).mean()
-        data['sma'] = data['收盘价'].rolling(lookback).mean()
-        
-        position = 0
-        
-        for i in range(lookback + 1, len(data)):
-            curr_close = data['收盘价'].iloc[i]
-            prev_close = data['收盘价'].iloc[i-1]
-            atr = data['atr'].iloc[i]
-            sma = data['sma'].iloc[i]
-            
-            # 价格突破SMA + 0.5*ATR, 做多
-            if curr_close > sma + 0.5 * atr and position <= 0:
-                if position == -1:
-                    signals.append({
-                        'date': data['日期'].iloc[i],
-                        'action': 'close_short',
-                        'price': curr_close,
-                        'reason': 'vol_breakout_up'
-                    })
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'buy',
-                    'price': curr_close,
-                    'reason': 'vol_breakout_up'
-                })
-                position = 1
-            
-            # 价格跌破SMA - 0.5*ATR, 做空
-            elif curr_close < sma - 0.5 * atr and position >= 0:
-                if position == 1:
-                    signals.append({
-                        'date': data['日期'].iloc[i],
-                        'action': 'sell',
-                        'price': curr_close,
-                        'reason': 'vol_breakout_down'
-                    })
-                signals.append({
-                    'date': data['日期'].iloc[i],
-                    'action': 'short',
-                    'price': curr_close,
-                    'reason': 'vol_breakout_down'
-                })
-                position = -1
-        
-        return signals
+        ind = indicators if indicators is not None else IndicatorCache(data)
+        atr = ind.atr(lookback)
+        sma = ind.sma(lookback)
+        close = ind.close
+        
+        # 价格突破 SMA ± atr_mult*ATR
+        return self._run_signal_machine(data, lookback + 1, [
+            (close > sma + atr_mult * atr, (0, -1), 1, 'vol_breakout_up'),
+            (close < sma - atr_mult * atr, (0, 1), -1, 'vol_breakout_down'),
+        ], resume)
     
     # ==================== 回测执行 ====================
     
-    def calculate_trades(self, signals: List[Dict], stop_loss_pct=0.02) -> List[Dict]:
-        """计算交易结果"""
+    def calculate_trades(self, signals, stop_loss_pct=0.02, data=None, symbol=None,
+                         take_profit_pct=None) -> List[Dict]:
+        """
+        计算交易结果
+        传入K线 data 时逐K线模拟 (盘中止损/止盈、合约规格、手续费与滑点, 见 simulate);
+        否则只按信号配对开平仓价计算收益
+        """
+        if data is not None:
+            return self.simulate(data, signals, symbol, stop_loss_pct, take_profit_pct)['trades']
+        
+        if isinstance(signals, np.ndarray):
+            # 结构化信号数组转为原生 Python 值 (交易记录跨进程传递时体积小)
+            signals = [dict(zip(signals.dtype.names, row)) for row in zip(
+                pd.to_datetime(signals['date']), signals['action'].tolist(),
+                signals['price'].tolist(), signals['reason'].tolist())]
+        
         trades = []
         current_position = None
         
@@ -327,6 +302,168 @@ class FuturesBacktester:
         
         return trades
     
+    @staticmethod
+    def commission(spec: Dict, price, lots):
+        """手续费: 按手 (commission_per_lot) 或按成交额比例 (commission_rate)"""
+        if 'commission_per_lot' in spec:
+            return spec['commission_per_lot'] * lots
+        return spec['commission_rate'] * price * spec['multiplier'] * lots
+    
+    def resolve_exits(self, data: pd.DataFrame, signals, symbol=None, stop_loss_pct=0.02,
+                      take_profit_pct=None, slippage_ticks=1) -> List[Tuple]:
+        """
+        信号配对成交易并确定平仓K线与成交价 (与手数无关, 单品种与组合模拟共用)
+        - 信号K线收盘价成交, 开平仓各计一次滑点 (slippage_ticks 个最小变动价位, 不利方向)
+        - 持仓期间用每根K线的最高/最低价检查止损/止盈 (同一根K线都触及时按止损计);
+          跳空越过止损/止盈价时按开盘价成交
+        - 信号开仓到数据末尾仍未平仓的按最后收盘价平仓
+        返回 [(开仓K线, 平仓K线, 方向, 开仓价, 平仓价, 开仓原因, 平仓原因)]
+        """
+        spec = CONTRACT_SPECS.get(symbol, DEFAULT_CONTRACT_SPEC)
+        slippage = slippage_ticks * spec['tick']
+        
+        dates = data['日期'].to_numpy()
+        close = data['收盘价'].to_numpy(dtype=np.float64)
+        high = data['最高价'].to_numpy(dtype=np.float64)
+        low = data['最低价'].to_numpy(dtype=np.float64)
+        open_ = data['开盘价'].to_numpy(dtype=np.float64) if '开盘价' in data else close
+        n = len(close)
+        
+        # 信号配对为 (开仓K线, 方向, 原因, 信号平仓K线, 平仓原因)
+        if not isinstance(signals, np.ndarray):
+            signals = np.array([(s['date'], s['action'], s['price'], s['reason']) for s in signals], dtype=SIGNAL_DTYPE)
+        bars = np.searchsorted(dates, signals['date'].astype(dates.dtype)).tolist()
+        positions = []
+        current = None
+        for i, action, reason in zip(bars, signals['action'].tolist(), signals['reason'].tolist()):
+            if action in ('buy', 'short'):
+                current = (i, 1 if action == 'buy' else -1, reason)
+            elif current is not None:
+                positions.append(current + (i, 'signal'))
+                current = None
+        if current is not None and n:
+            positions.append(current + (n - 1, 'end_of_data'))
+        
+        resolved = []
+        for entry_i, direction, reason, exit_i, exit_reason in positions:
+            entry_price = close[entry_i] + direction * slippage
+            if not entry_price > 0:
+                continue
+            stop = entry_price * (1 - direction * stop_loss_pct) if stop_loss_pct else None
+            target = entry_price * (1 + direction * take_profit_pct) if take_profit_pct else None
+            
+            exit_price = close[exit_i] - direction * slippage
+            if exit_i > entry_i and (stop is not None or target is not None):
+                seg_high, seg_low = high[entry_i + 1:exit_i + 1], low[entry_i + 1:exit_i + 1]
+                worst, best = (seg_low, seg_high) if direction == 1 else (seg_high, seg_low)
+                hit_stop = (direction * (worst - stop) <= 0) if stop is not None else np.zeros(len(worst), bool)
+                hit_target = (direction * (best - target) >= 0) if target is not None else np.zeros(len(best), bool)
+                hit = hit_stop | hit_target
+                k = int(hit.argmax())
+                if hit[k]:
+                    exit_i = entry_i + 1 + k
+                    if hit_stop[k]:
+                        level, exit_reason = stop, 'stop_loss'
+                        fill = min(open_[exit_i], level) if direction == 1 else max(open_[exit_i], level)
+                    else:
+                        level, exit_reason = target, 'take_profit'
+                        fill = max(open_[exit_i], level) if direction == 1 else min(open_[exit_i], level)
+                    exit_price = fill - direction * slippage
+            resolved.append((entry_i, exit_i, direction, entry_price, exit_price, reason, exit_reason))
+        return resolved
+    
+    def position_lots(self, spec: Dict, equity, entry_price, stop_loss_pct, margin_budget=None) -> int:
+        """
+        手数: 止损距离对应的亏损不超过 equity * risk_per_trade (不足一手时按一手),
+        且保证金不超过 margin_budget (默认为全部权益)
+        """
+        multiplier = spec['multiplier']
+        budget = equity if margin_budget is None else margin_budget
+        lots = int(budget / (entry_price * multiplier * spec['margin']))
+        if stop_loss_pct:
+            risk_lots = int(equity * self.risk_per_trade / (entry_price * stop_loss_pct * multiplier))
+            lots = min(lots, max(risk_lots, 1))
+        return lots
+    
+    def simulate(self, data: pd.DataFrame, signals, symbol=None, stop_loss_pct=0.02,
+                 take_profit_pct=None, slippage_ticks=1) -> Dict:
+        """
+        逐K线资金模拟
+        - 成交价、止损/止盈与平仓规则见 resolve_exits; 开平仓各计一次手续费
+        - 手数按 risk_per_trade 与保证金确定 (见 position_lots), 权益按已平仓交易累计
+        每笔交易只对其持仓区间做向量运算, 总计算量与K线数成正比
+        返回 {'trades': 交易列表, 'equity': 按日权益 (pd.Series), 'bar_equity': 逐K线权益, 'stats': 资金指标}
+        """
+        spec = CONTRACT_SPECS.get(symbol, DEFAULT_CONTRACT_SPEC)
+        multiplier = spec['multiplier']
+        dates = data['日期'].to_numpy()
+        close = data['收盘价'].to_numpy(dtype=np.float64)
+        n = len(close)
+        
+        bar_pnl = np.zeros(n)
+        equity = float(self.initial_capital)
+        trades = []
+        
+        for entry_i, exit_i, direction, entry_price, exit_price, reason, exit_reason in self.resolve_exits(
+                data, signals, symbol, stop_loss_pct, take_profit_pct, slippage_ticks):
+            lots = self.position_lots(spec, equity, entry_price, stop_loss_pct)
+            if lots <= 0:
+                continue
+            
+            # 逐K线按收盘价盯市: 开仓K线计入开仓滑点, 平仓K线从上一收盘价到平仓价
+            value = direction * lots * multiplier
+            marks = close[entry_i:exit_i + 1].copy()
+            marks[-1] = exit_price
+            fee_in, fee_out = self.commission(spec, entry_price, lots), self.commission(spec, exit_price, lots)
+            bar_pnl[entry_i] += (close[entry_i] - entry_price) * value - fee_in
+            bar_pnl[entry_i + 1:exit_i + 1] += np.diff(marks) * value
+            bar_pnl[exit_i] -= fee_out
+            if exit_i == entry_i:
+                bar_pnl[exit_i] += (exit_price - close[exit_i]) * value
+            
+            pnl = (exit_price - entry_price) * value - fee_in - fee_out
+            pnl_pct = direction * (exit_price - entry_price) / entry_price
+            trades.append({
+                'entry_date': pd.Timestamp(dates[entry_i]),
+                'exit_date': pd.Timestamp(dates[exit_i]),
+                'direction': 'long' if direction == 1 else 'short',
+                'entry_price': entry_price,
+                'exit_price': exit_price,
+                'lots': lots,
+                'pnl': pnl,
+                'pnl_pct': pnl_pct,
+                'return_pct': pnl / equity,
+                'commission': fee_in + fee_out,
+                'reason': reason,
+                'exit_reason': exit_reason,
+                'result': 'win' if pnl > 0 else 'loss'
+            })
+            equity += pnl
+        
+        bar_equity = self.initial_capital + np.cumsum(bar_pnl)
+        # 按日权益: 每个交易日最后一根K线
+        days = dates.astype('datetime64[D]')
+        last_of_day = np.flatnonzero(np.append(days[1:] != days[:-1], True)) if n else np.zeros(0, dtype=int)
+        daily = pd.Series(bar_equity[last_of_day], index=pd.DatetimeIndex(days[last_of_day]), name='equity')
+        
+        return {'trades': trades, 'equity': daily, 'bar_equity': bar_equity,
+                'stats': self.equity_metrics(daily, bar_equity)}
+    
+    def equity_metrics(self, daily: pd.Series, bar_equity: np.ndarray) -> Dict:
+        """资金曲线指标 (回撤按逐K线权益计算, 夏普按日收益年化)"""
+        if len(bar_equity) == 0:
+            return {'final_equity': self.initial_capital, 'equity_return': 0, 'equity_max_drawdown': 0, 'sharpe': 0}
+        peak = np.maximum.accumulate(np.maximum(bar_equity, self.initial_capital))
+        returns = np.diff(np.concatenate(([self.initial_capital], daily.to_numpy()))) / \
+            np.concatenate(([self.initial_capital], daily.to_numpy()[:-1]))
+        std = returns.std()
+        return {
+            'final_equity': float(bar_equity[-1]),
+            'equity_return': float(bar_equity[-1] / self.initial_capital - 1),
+            'equity_max_drawdown': float(((peak - bar_equity) / peak).max()),
+            'sharpe': float(returns.mean() / std * np.sqrt(252)) if std > 0 else 0,
+        }
+    
     def calculate_metrics(self, trades: List[Dict]) -> Dict:
         """计算回测指标"""
         if not trades:
@@ -370,140 +507,171 @@ class FuturesBacktester:
             'max_drawdown': max_dd
         }
     
-    def run_backtest(self, symbol: str, data: pd.DataFrame) -> Dict:
-        """运行回测"""
-        strategies = {
+    def strategies(self) -> Dict:
+        """策略名 -> 信号函数"""
+        return {
             'SMA_Crossover': self.strategy_sma_crossover,
             'Breakout': self.strategy_breakout,
             'Mean_Reversion': self.strategy_mean_reversion,
             'Volatility_Breakout': self.strategy_volatility_breakout
         }
+    
+    def run_strategy(self, name: str, data: pd.DataFrame, symbol=None) -> Dict:
+        """运行单个策略 (逐K线资金模拟)"""
+        signals = self.strategies()[name](data)
+        simulation = self.simulate(data, signals, symbol)
+        metrics = self.calculate_metrics(simulation['trades'])
+        metrics.update(simulation['stats'])
         
-        results = {}
-        
-        for name, strategy_func in strategies.items():
-            signals = strategy_func(data)
-            trades = self.calculate_trades(signals)
-            metrics = self.calculate_metrics(trades)
-            
-            results[name] = {
-                'signals': len(signals),
-                'trades': trades,
-                'metrics': metrics
-            }
+        return {
+            'signals': len(signals),
+            'trades': simulation['trades'],
+            'metrics': metrics,
+            'equity': simulation['equity'],
+            'bar_equity': pd.Series(simulation['bar_equity'], index=pd.DatetimeIndex(data['日期']), name='equity'),
+            'checkpoint': self.signal_checkpoint(signals, data)
+        }
+    
+    # ==================== 增量回测 ====================
+    
+    WARMUP_BARS = 100  # 断点续算时向前多取的K线数, 需覆盖策略最长指标窗口
+    
+    @staticmethod
+    def signal_checkpoint(signals, data: pd.DataFrame, previous: Dict = None) -> Dict:
+        """
+        回测断点: 信号状态机在最后一根K线后的仓位
+        持仓时 resume 为该仓位的开仓日 (下次从开仓K线重新模拟这笔未完成的交易), 空仓时为最后一根K线
+        """
+        checkpoint = dict(previous or {'position': 0, 'reason': None})
+        if len(signals):
+            action = str(signals['action'][-1])
+            checkpoint['position'] = {'buy': 1, 'short': -1}.get(action, 0)
+            checkpoint['reason'] = str(signals['reason'][-1]) if checkpoint['position'] else None
+            if checkpoint['position']:
+                checkpoint['resume'] = pd.Timestamp(signals['date'][-1]).isoformat()
+        last_bar = pd.Timestamp(data['日期'].iloc[-1]).isoformat()
+        if checkpoint['position'] == 0:
+            checkpoint['resume'] = last_bar
+        checkpoint['last_bar'] = last_bar
+        return checkpoint
+    
+    @staticmethod
+    def closed_trades(trades: List[Dict], checkpoint: Dict) -> List[Dict]:
+        """断点之前已完成的交易 (持仓中的那笔在下次续算时重新模拟)"""
+        if not checkpoint['position']:
+            return trades
+        resume = pd.Timestamp(checkpoint['resume'])
+        return [t for t in trades if t['entry_date'] < resume]
+    
+    def resume_strategy(self, name: str, data: pd.DataFrame, checkpoint: Dict, symbol=None) -> Dict:
+        """
+        从断点继续回测单个策略, 只处理断点之后的新K线 (另取 WARMUP_BARS 根K线预热指标)
+        返回 {'trades': 断点之后新完成的交易, 'checkpoint': 新断点}; 数据不含断点K线时返回 None
+        """
+        dates = data['日期'].to_numpy()
+        r = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(checkpoint['resume'])), side='right')) - 1
+        if r < 0 or dates[r] != np.datetime64(pd.Timestamp(checkpoint['resume'])):
+            return None
         
-        return results
+        offset = max(0, r - self.WARMUP_BARS)
+        window = data.iloc[offset:]
+        position = checkpoint['position']
+        signals = self.strategies()[name](window, resume=(r - offset + 1, position))
+        if position:
+            # 断点处未平的仓位: 补回开仓信号, 从开仓K线重新模拟
+            entry = np.zeros(1, dtype=SIGNAL_DTYPE)
+            entry[0] = (dates[r], 'buy' if position == 1 else 'short', data['收盘价'].iloc[r], checkpoint['reason'])
+            signals = np.concatenate((entry, signals))
+        
+        simulation = self.simulate(data.iloc[r:], signals, symbol)
+        new_checkpoint = self.signal_checkpoint(signals, data, checkpoint)
+        return {'trades': self.closed_trades(simulation['trades'], new_checkpoint), 'checkpoint': new_checkpoint}
     
-    def run_full_backtest(self, symbols: List[str], start_date: str, end_date: str):
-        """运行完整回测"""
+    def run_backtest(self, symbol: str, data: pd.DataFrame) -> Dict:
+        """运行回测"""
+        return {name: self.run_strategy(name, data, symbol) for name in self.strategies()}
+    
+    def _prepare_symbol(self, symbol: str, start_date: str, end_date: str) -> bool:
+        """I/O 阶段: 刷新并检查本地数据是否足够回测"""
+        print(f"回测 {symbol}...")
+        data = self.get_historical_data(symbol, start_date, end_date)
+        return data is not None and len(data) > 60
+    
+    def iter_full_backtest(self, symbols: List[str], start_date: str, end_date: str,
+                           max_workers=None, io_workers=8):
+        """
+        并行回测, 每个品种的全部策略完成后立即产出 (symbol, results), 顺序为完成顺序
+        数据获取在线程池中进行 (网络/磁盘 I/O 互相重叠);
+        每个 (品种, 策略) 作为一个任务提交到进程池, 子进程直接内存映射本地仓库读取数据, 不经进程间传输
+        max_workers=1 时在当前进程中串行执行
+        """
+        if max_workers == 1:
+            for symbol in symbols:
+                if self._prepare_symbol(symbol, start_date, end_date):
+                    data = self.get_historical_data(symbol, start_date, end_date, max_age=None)
+                    yield symbol, self.run_backtest(symbol, data)
+            return
+        
+        names = list(self.strategies())
+        partial = {}
+        with ThreadPoolExecutor(max_workers=io_workers) as io_pool, \
+                ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(self,)) as cpu_pool:
+            loading = {io_pool.submit(self._prepare_symbol, symbol, start_date, end_date): symbol
+                       for symbol in symbols}
+            running = set(loading)
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in loading:
+                        symbol = loading.pop(future)
+                        if future.result():
+                            partial[symbol] = {}
+                            running.update(cpu_pool.submit(_strategy_job, symbol, start_date, end_date, name)
+                                           for name in names)
+                        continue
+                    symbol, name, result = future.result()
+                    partial[symbol][name] = result
+                    if len(partial[symbol]) == len(names):
+                        results = partial.pop(symbol)
+                        yield symbol, {name: results[name] for name in names}
+    
+    def run_full_backtest(self, symbols: List[str], start_date: str, end_date: str,
+                          max_workers=None, on_result=None):
+        """
+        运行完整回测 (多品种并行)
+        on_result(symbol, results): 每个品种完成时回调, 可用于流式输出
+        返回结果按 symbols 顺序排列; 结束后写入策略注册表
+        """
         all_results = {}
         
-        for symbol in symbols:
-            print(f"回测 {symbol}...")
-            data = self.get_historical_data(symbol, start_date, end_date)
-            if data is not None and len(data) > 60:
-                results = self.run_backtest(symbol, data)
-                all_results[symbol] = results
+        for symbol, results in self.iter_full_backtest(symbols, start_date, end_date, max_workers=max_workers):
+            all_results[symbol] = results
+            if on_result is not None:
+                on_result(symbol, results)
         
+        all_results = {symbol: all_results[symbol] for symbol in symbols if symbol in all_results}
+        if self.registry:
+            self.registry.record(all_results)
         return all_results
     
-    def generate_report(self, all_results: Dict) -> str:
-        """生成回测报告"""
-        report = f"""# 国内期货策略回测报告
-
-**回测周期:** 6个月 (2025-08 至 2026-02)  
-**回测品种:** 股指期货 + 商品期货  
-**生成时间:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  
-**分析师:** JARVIS QFA/FOE
-
----
-
-## 策略列表
-
-1. **SMA_Crossover** - 均线交叉策略 (金叉做多, 死叉做空)
-2. **Breakout** - 突破策略 (突破前高做多, 跌破前低做空)
-3. **Mean_Reversion** - 均值回归 (布林带反转)
-4. **Volatility_Breakout** - 波动率突破 (基于ATR)
-
----
-
-## 回测结果汇总
-
-"""
-        
-        # 汇总各策略表现
-        strategy_summary = {}
-        
-        for symbol, results in all_results.items():
-            for strategy_name, result in results.items():
-                if strategy_name not in strategy_summary:
-                    strategy_summary[strategy_name] = {
-                        'total_trades': 0,
-                        'wins': 0,
-                        'losses': 0,
-                        'total_return': 0
-                    }
-                
-                m = result['metrics']
-                strategy_summary[strategy_name]['total_trades'] += m.get('total_trades', 0)
-                strategy_summary[strategy_name]['wins'] += m.get('wins', 0)
-                strategy_summary[strategy_name]['losses'] += m.get('losses', 0)
-                strategy_summary[strategy_name]['total_return'] += m.get('total_return', 0)
-        
-        # 输出策略汇总
-        report += "### 策略整体表现\n\n"
-        report += "| 策略 | 总交易 | 胜率 | 盈亏比 | 总收益 |\n"
-        report += "|------|--------|------|--------|--------|\n"
-        
-        for name, summary in sorted(strategy_summary.items(), 
-                                     key=lambda x: x[1]['wins']/(x[1]['total_trades'] or 1), 
-                                     reverse=True):
-            win_rate = summary['wins'] / summary['total_trades'] if summary['total_trades'] > 0 else 0
-            report += f"| {name} | {summary['total_trades']} | {win_rate:.1%} | - | {summary['total_return']:.2%} |\n"
-        
-        report += "\n---\n\n"
-        
-        # 各品种详细结果
-        report += "## 各品种详细回测结果\n\n"
-        
-        for symbol, results in all_results.items():
-            report += f"### {symbol}\n\n"
-            report += "| 策略 | 交易数 | 胜率 | 平均盈利 | 平均亏损 | 总收益 |\n"
-            report += "|------|--------|------|----------|----------|--------|\n"
-            
-            for name, result in sorted(results.items(), 
-                                       key=lambda x: x[1]['metrics'].get('win_rate', 0),
-                                       reverse=True):
-                m = result['metrics']
-                if m.get('total_trades', 0) > 0:
-                    report += f"| {name} | {m['total_trades']} | {m['win_rate']:.1%} | {m.get('avg_win', 0):.2%} | {m.get('avg_loss', 0):.2%} | {m['total_return']:.2%} |\n"
-            
-            report += "\n"
-        
-        report += """---
-
-## 结论与建议
-
-### 高胜率策略
+    def generate_report(self, all_results: Dict, start_date=None, end_date=None) -> str:
+        """生成回测报告 (已保存到回测结果库的 run 用 BacktestResultStore.render_markdown 重新生成)"""
+        return render_markdown(metrics_frame(all_results), {'start_date': start_date, 'end_date': end_date})
 
-根据回测结果, 以下策略表现较好:
 
-1. **SMA_Crossover** - 适合趋势明显的品种
-2. **Breakout** - 适合波动较大的品种
-3. **Mean_Reversion** - 适合震荡行情
+# ==================== 并行回测子进程 ====================
 
-### 风险提示
+_worker_backtester = None
 
-- 回测结果基于历史数据, 不代表未来表现
-- 实际交易中需考虑滑点、手续费等因素
-- 建议先用模拟盘验证策略有效性
+def _init_worker(backtester):
+    """子进程初始化: 保存回测器副本 (仓库对象不携带已映射的数据)"""
+    global _worker_backtester
+    _worker_backtester = backtester
 
----
-
-*报告由 JARVIS QFA/FOE 自动生成*
-"""
-        
-        return report
+def _strategy_job(symbol, start_date, end_date, name):
+    """子进程任务: 从本地仓库读取数据 (I/O 阶段已刷新) 并运行单个策略"""
+    data = _worker_backtester.get_historical_data(symbol, start_date, end_date, max_age=None)
+    return symbol, name, _worker_backtester.run_strategy(name, data, symbol)
 
 
 if __name__ == "__main__":
@@ -517,15 +685,25 @@ if __name__ == "__main__":
     print(f"开始回测: {start_date} 至 {end_date}")
     print(f"回测品种: {', '.join(symbols)}")
     
-    backtester = FuturesBacktester()
-    all_results = backtester.run_full_backtest(symbols, start_date, end_date)
+    def on_result(symbol, results):
+        summary = ', '.join(f"{name} {r['metrics'].get('total_trades', 0)}笔" for name, r in results.items())
+        print(f"  {symbol} 完成: {summary}")
+    
+    # 可选参数: 连续合约复权方式 none/back/ratio (默认新浪主力连续)
+    backtester = FuturesBacktester(adjustment=sys.argv[1] if len(sys.argv) > 1 else None)
+    all_results = backtester.run_full_backtest(symbols, start_date, end_date, on_result=on_result)
     
-    report = backtester.generate_report(all_results)
+    # 组合回测: 各品种按注册表推荐策略在同一资金账户中交易
+    from futures_portfolio import PortfolioBacktester
+    portfolio = PortfolioBacktester(backtester).run(symbols, start_date, end_date)
     
-    # 保存报告
-    filename = f'/root/.openclaw/workspace/futures_backtest_report_{datetime.now().strftime("%Y%m%d")}.md'
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(report)
+    # 保存到回测结果库, 报告由库中结果生成 (目录由 FUTURES_RESULTS_DIR 指定)
+    store = BacktestResultStore()
+    run_id = store.save(all_results, start_date, end_date, portfolio=portfolio,
+                        params={'initial_capital': backtester.initial_capital,
+                                'risk_per_trade': backtester.risk_per_trade})
+    filenames = [store.write_report(run_id, fmt) for fmt in ('md', 'html')]
     
-    print(f"\n✅ 回测报告已生成: {filename}")
-    print(report[:2000])  # 打印前2000字符
+    print(f"\n✅ 回测结果已保存: {run_id}")
+    print(f"✅ 回测报告已生成: {', '.join(filenames)}")
+    print(store.render_markdown(run_id)[:2000])  # 打印前2000字符
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+期货连续合约
+Continuous Futures Contracts with Roll Adjustment
+
+- 新浪主力连续 ({symbol}0) 在换月时直接拼接两个合约的价格, 均线/ATR/突破策略会把换月价差当成行情
+- 这里逐个拉取各月份合约的日线 (存入本地仓库的 continuous/contracts 子目录), 按持仓量 (或成交量)
+  确定主力合约: 远月合约超过当前主力时在当日收盘换月, 只向远月换, 不回到近月
+- 拼接后的序列存三份: none (不复权, 带 '合约' 列), back (后复权: 换月前价格加上价差),
+  ratio (比例复权: 换月前价格乘以价格比); 最新主力合约段的价格在三份序列中相同
+- 换月检测是增量的: rolls.json 记录主力合约、已处理到的日期和换月记录, 日常刷新只拉取当前主力及更远的合约,
+  只检测新K线; 没有新换月时三份序列只追加新K线, 发生换月时才重写复权序列
+
+用法:
+    python futures_continuous.py refresh RB IF AU     # 增量刷新 (首次为完整构建)
+    python futures_continuous.py rolls RB             # 查看换月记录
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from futures_warehouse import DATE_COLUMN, DEFAULT_ROOT, FuturesWarehouse, atomic_write_json, file_lock
+
+SCHEMA_VERSION = 1
+ADJUSTMENTS = ('none', 'back', 'ratio')
+PRICE_COLUMNS = ['开盘价', '最高价', '最低价', '收盘价']
+BAR_COLUMNS = [DATE_COLUMN] + PRICE_COLUMNS + ['成交量', '持仓量']
+CONTRACT_COLUMN = '合约'
+ROLL_MEASURES = {'open_interest': '持仓量', 'volume': '成交量'}
+
+# 主力合约月份; 不在表中的品种按全部 12 个月份拉取
+MAIN_MONTHS = {
+    **dict.fromkeys(['RB', 'HC'], (1, 5, 10)),
+    **dict.fromkeys(['I', 'J', 'JM', 'M', 'Y', 'P', 'TA', 'MA', 'EG', 'FG', 'SA', 'SR', 'CF', 'OI', 'RU', 'FU'],
+                    (1, 5, 9)),
+    **dict.fromkeys(['AU', 'AG'], (6, 12)),
+}
+
+
+def fetch_contract_sina(contract: str, start_date=None) -> pd.DataFrame:
+    """从新浪获取单个月份合约 (如 RB2605) 的日线, 列名转换为与主力连续一致的中文列名"""
+    import akshare as ak  # 延迟导入: 只读仓库时不需要 akshare
+    data = ak.futures_zh_daily_sina(symbol=contract)
+    if data is None or data.empty:
+        return data
+    data = data.rename(columns={'date': DATE_COLUMN, 'open': '开盘价', 'high': '最高价', 'low': '最低价',
+                                'close': '收盘价', 'volume': '成交量', 'hold': '持仓量'})[BAR_COLUMNS]
+    data[DATE_COLUMN] = pd.to_datetime(data[DATE_COLUMN])
+    if start_date is not None:
+        data = data[data[DATE_COLUMN] >= pd.Timestamp(start_date)]
+    return data
+
+
+def contract_months(symbol: str, start, end) -> List[str]:
+    """[start, end] 之间各主力月份的合约代码 (年月四位, 按到期先后排列)"""
+    months = MAIN_MONTHS.get(symbol, tuple(range(1, 13)))
+    periods = pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq='M')
+    return [f'{symbol}{p.year % 100:02d}{p.month:02d}' for p in periods if p.month in months]
+
+
+def detect_rolls(measure: np.ndarray, close: np.ndarray, active: Optional[int], streak: int = 0,
+                 confirm_days: int = 1, start: int = 0) -> Tuple[np.ndarray, List[Tuple[int, int, int]], int, int]:
+    """
+    逐K线确定主力合约
+    measure/close: (K线 x 合约) 的持仓量 (或成交量) 与收盘价, 合约按到期先后排列, 无行情为 NaN
+    active: 第 start 根K线之前的主力合约列 (None 时取第一根有行情K线上持仓最大者); streak: 远月已连续领先的K线数
+    远月合约连续 confirm_days 根K线超过主力时, 在最后一根确认K线收盘换月; 主力合约无行情 (已到期) 时
+    在前一根K线收盘强制换到最大的远月合约
+    返回 (各K线所属合约列 (无主力为 -1), [(换月K线, 旧列, 新列)], 主力合约列, streak)
+    """
+    n = len(measure)
+    rows = np.full(n, -1)
+    rolls = []
+    level = np.where(np.isnan(measure), -np.inf, measure)
+    for t in range(start, n):
+        if active is None:
+            if not np.isfinite(level[t]).any():
+                continue
+            active = int(np.argmax(level[t]))
+        later = level[t, active + 1:]
+        if np.isnan(close[t, active]) and np.isfinite(later).any():
+            new = active + 1 + int(np.argmax(later))
+            rolls.append((t - 1, active, new))
+            active, streak = new, 0
+            later = level[t, active + 1:]
+        rows[t] = active
+        if len(later) and later.max() > level[t, active]:
+            streak += 1
+            if streak >= confirm_days:
+                new = active + 1 + int(np.argmax(later))
+                rolls.append((t, active, new))
+                active, streak = new, 0
+        else:
+            streak = 0
+    return rows, rolls, active, streak
+
+
+def adjust_prices(data: pd.DataFrame, rolls: List[Dict], adjustment: str) -> pd.DataFrame:
+    """
+    对拼接序列复权: 每根K线的价格按其后 (含当日收盘) 发生的全部换月调整
+    back: 加上这些换月价差之和; ratio: 乘以这些换月价格比之积
+    """
+    if adjustment == 'none' or not rolls:
+        return data
+    roll_dates = np.array([np.datetime64(pd.Timestamp(r['date']), 'ns') for r in rolls])
+    after = np.searchsorted(roll_dates, data[DATE_COLUMN].to_numpy(), side='left')
+    prices = data[PRICE_COLUMNS].to_numpy(dtype=np.float64)
+    if adjustment == 'back':
+        gaps = np.array([r['gap'] for r in rolls])
+        offset = np.append(np.cumsum(gaps[::-1])[::-1], 0.0)[after]
+        prices = prices + offset[:, None]
+    else:
+        ratios = np.array([r['ratio'] for r in rolls])
+        factor = np.append(np.cumprod(ratios[::-1])[::-1], 1.0)[after]
+        prices = prices * factor[:, None]
+    data = data.copy()
+    data[PRICE_COLUMNS] = prices
+    return data
+
+
+class ContinuousWarehouse(FuturesWarehouse):
+    """一种复权方式的连续合约仓库; 刷新 (含 get() 数据过期时的自动刷新) 由 ContinuousContracts 增量构建"""
+
+    def __init__(self, builder: 'ContinuousContracts', adjustment: str):
+        super().__init__(os.path.join(builder.root, adjustment), fetcher=None)
+        self.builder = builder
+        self.adjustment = adjustment
+
+    def refresh(self, symbol: str, full: bool = False) -> int:
+        return self.builder.update(symbol, full=full)
+
+
+class ContinuousContracts:
+    """由各月份合约构建连续合约 (不复权/后复权/比例复权)"""
+
+    def __init__(self, root: Optional[str] = None, fetcher=fetch_contract_sina, roll_by: str = 'open_interest',
+                 confirm_days: int = 1, history_years: int = 3, lookahead_months: int = 12):
+        if roll_by not in ROLL_MEASURES:
+            raise ValueError(f"不支持的换月依据: {roll_by} (可选 {tuple(ROLL_MEASURES)})")
+        self.root = root or os.path.join(DEFAULT_ROOT, 'continuous')
+        self.roll_by = roll_by
+        self.confirm_days = confirm_days          # 远月连续领先多少根K线才换月 (避免持仓量交叉时来回换)
+        self.history_years = history_years        # 首次构建拉取的历史年数
+        self.lookahead_months = lookahead_months  # 拉取到当前月之后多少个月的合约
+        self.contracts = FuturesWarehouse(os.path.join(self.root, 'contracts'), fetcher=fetcher)
+        self.warehouses = {adjustment: ContinuousWarehouse(self, adjustment) for adjustment in ADJUSTMENTS}
+        self._state_path = os.path.join(self.root, 'rolls.json')
+
+    def warehouse(self, adjustment: str = 'ratio') -> ContinuousWarehouse:
+        if adjustment not in self.warehouses:
+            raise ValueError(f"不支持的复权方式: {adjustment} (可选 {ADJUSTMENTS})")
+        return self.warehouses[adjustment]
+
+    # ==================== 换月状态 ====================
+
+    def _read_state(self) -> Dict:
+        try:
+            with open(self._state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {'schema': SCHEMA_VERSION, 'symbols': {}}
+        if state.get('schema') != SCHEMA_VERSION:
+            print(f"换月记录格式版本 {state.get('schema')} 不受支持, 重新构建: {self._state_path}")
+            return {'schema': SCHEMA_VERSION, 'symbols': {}}
+        return state
+
+    def _locked(self):
+        """跨进程写锁 (换月记录与三份序列一起更新)"""
+        return file_lock(os.path.join(self.root, '.lock'))
+
+    def rolls(self, symbol: str) -> pd.DataFrame:
+        """换月记录: 日期 (旧合约最后一天), 旧合约, 新合约, 价差, 价格比"""
+        rolls = self._read_state()['symbols'].get(symbol, {}).get('rolls', [])
+        return pd.DataFrame(rolls, columns=['date', 'from', 'to', 'gap', 'ratio'])
+
+    # ==================== 构建 ====================
+
+    def _panel(self, codes: List[str], since) -> Tuple[List[str], np.ndarray, Dict[str, np.ndarray]]:
+        """读取各合约 since 之后 (含) 的K线, 对齐为 (日期 x 合约) 数组; 返回 (有数据的合约, 日期, {列名: 数组})"""
+        frames = {}
+        for code in codes:
+            data = self.contracts.get(code, start_date=since, max_age=None)
+            if data is not None and len(data):
+                frames[code] = data
+        codes = sorted(frames)
+        if not codes:
+            return codes, np.array([], dtype='datetime64[ns]'), {}
+        dates = np.unique(np.concatenate([frames[c][DATE_COLUMN].to_numpy() for c in codes]))
+        panel = {column: np.full((len(dates), len(codes)), np.nan) for column in BAR_COLUMNS[1:]}
+        for j, code in enumerate(codes):
+            rows = np.searchsorted(dates, frames[code][DATE_COLUMN].to_numpy())
+            for column in panel:
+                panel[column][rows, j] = frames[code][column].to_numpy(dtype=np.float64)
+        return codes, dates, panel
+
+    def update(self, symbol: str, full: bool = False) -> int:
+        """
+        增量更新一个品种的连续合约, 返回新增K线数
+        首次 (或 full=True) 拉取 history_years 年内的全部主力月份合约并完整构建;
+        之后只拉取当前主力及更远月份的合约, 从上次处理到的日期继续检测换月
+        """
+        state = None if full else self._read_state()['symbols'].get(symbol)
+        now = pd.Timestamp(datetime.now())
+        until = now + pd.DateOffset(months=self.lookahead_months)
+        if state is None:
+            codes = contract_months(symbol, now - pd.DateOffset(years=self.history_years), until)
+        else:
+            active_month = pd.Timestamp(f"20{state['active'][-4:-2]}-{state['active'][-2:]}-01")
+            codes = [state['active']] + [c for c in contract_months(symbol, active_month, until) if c > state['active']]
+        self.contracts.refresh_all(codes)  # 网络请求在锁外进行; 拉取失败的合约沿用本地数据
+
+        with self._locked():
+            since = None if state is None else state['last']
+            codes, dates, panel = self._panel([c for c in codes if self.contracts.info(c) is not None], since)
+            if state is not None and state['active'] not in codes:
+                print(f"{symbol} 主力合约 {state['active']} 无数据, 跳过")
+                return 0
+            if not len(dates):
+                return 0
+
+            # 增量时第 0 行是上次已处理的最后一根K线 (重新写入以便更新盘中未完成的数值), 从第 1 行开始检测
+            start = 0 if state is None else 1
+            active = None if state is None else codes.index(state['active'])
+            measure = panel[ROLL_MEASURES[state['roll_by'] if state else self.roll_by]]
+            rows, rolls, active, streak = detect_rolls(measure, panel['收盘价'], active,
+                                                       0 if state is None else state['streak'],
+                                                       self.confirm_days, start)
+            if state is not None:
+                rows[0] = codes.index(state['last_contract']) if state['last_contract'] in codes else -1
+
+            new_rolls = []
+            for t, old, new in rolls:
+                old_close, new_close = panel['收盘价'][t, old], panel['收盘价'][t, new]
+                valid = t >= 0 and not np.isnan(old_close) and not np.isnan(new_close)
+                new_rolls.append({'date': pd.Timestamp(dates[max(t, 0)]).isoformat(),
+                                  'from': codes[old], 'to': codes[new],
+                                  'gap': float(new_close - old_close) if valid else 0.0,
+                                  'ratio': float(new_close / old_close) if valid else 1.0})
+
+            keep = rows >= 0
+            if not keep.any():
+                return 0
+            t_idx, c_idx = np.flatnonzero(keep), rows[keep]
+            stitched = pd.DataFrame({DATE_COLUMN: dates[keep]})
+            for column in BAR_COLUMNS[1:]:
+                stitched[column] = panel[column][t_idx, c_idx]
+            stitched[CONTRACT_COLUMN] = np.array(codes)[c_idx]
+
+            all_rolls = (state['rolls'] if state else []) + new_rolls
+            added = int((stitched[DATE_COLUMN] > pd.Timestamp(since)).sum()) if since else len(stitched)
+            if state is None or new_rolls:
+                # 首次构建或发生换月: 复权序列整体重写
+                if state is None:
+                    self.warehouses['none'].write(symbol, stitched)
+                else:
+                    self.warehouses['none'].append(symbol, stitched)
+                history = self.warehouses['none'].get(symbol, max_age=None, copy=True)
+                for adjustment in ('back', 'ratio'):
+                    self.warehouses[adjustment].write(symbol, adjust_prices(history, all_rolls, adjustment))
+            else:
+                # 最新主力段三份序列价格相同, 直接追加
+                for warehouse in self.warehouses.values():
+                    warehouse.append(symbol, stitched)
+
+            full_state = self._read_state()
+            full_state['symbols'][symbol] = {
+                'active': codes[active],
+                'streak': streak,
+                'last': pd.Timestamp(dates[-1]).isoformat(),
+                'last_contract': codes[rows[-1]] if rows[-1] >= 0 else codes[active],
+                'roll_by': state['roll_by'] if state else self.roll_by,
+                'rolls': all_rolls,
+                'updated': datetime.now().isoformat(timespec='seconds'),
+            }
+            atomic_write_json(self._state_path, full_state)
+        return added
+
+
+if __name__ == "__main__":
+    builder = ContinuousContracts()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'rolls'
+    symbols = sys.argv[2:] or sorted(builder._read_state()['symbols'])
+
+    if command == 'refresh':
+        for symbol in symbols:
+            print(f"{symbol}: 新增 {builder.update(symbol)} 根K线")
+    for symbol in symbols:
+        print(f"\n{symbol} 换月记录:")
+        print(builder.rolls(symbol).to_string(index=False))
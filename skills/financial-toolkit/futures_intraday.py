@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+期货分钟线
+Intraday (1/5/15-minute) Futures Bars
+
+- 1 分钟线从 akshare (新浪分钟线) 增量拉取, 存入本地仓库的 minute 子目录
+- 按交易时段重采样为 N 分钟线: K线不跨越小节休息 (10:15-10:30)、午休和日盘/夜盘之间,
+  夜盘按品种收盘时间 (23:00 / 01:00 / 02:30) 处理跨零点; 时间戳为K线结束时刻
+- 已完成的 N 分钟线连同均线/标准差/ATR 指标写入 bars_Nm 子目录; 每次运行只重采样上次之后的
+  1 分钟线, 并只为新K线计算指标 (取最近 INDICATOR_WINDOW 根已存K线作为窗口), 不重算全部历史
+
+用法:
+    python futures_intraday.py 15 IF AU       # 刷新并显示最近的 15 分钟线
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from futures_warehouse import DATE_COLUMN, DEFAULT_ROOT, FuturesWarehouse
+
+# 交易时段 (距当日 0 点的分钟数, 左开右闭); 零点之后的夜盘时段加 1440, 与前一晚的夜盘连续
+DAY_SESSIONS = ((9 * 60, 10 * 60 + 15), (10 * 60 + 30, 11 * 60 + 30), (13 * 60 + 30, 15 * 60))
+CFFEX_DAY_SESSIONS = ((9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60))
+NIGHT_CLOSE = {  # 夜盘收盘时间; 不在表中的品种没有夜盘
+    **dict.fromkeys(['AU', 'AG', 'SC'], 26 * 60 + 30),
+    **dict.fromkeys(['CU', 'AL', 'ZN', 'NI'], 25 * 60),
+    **dict.fromkeys(['RB', 'I', 'J', 'JM', 'FU', 'RU', 'TA', 'MA', 'EG', 'FG', 'SA',
+                     'M', 'Y', 'P', 'SR', 'CF', 'OI'], 23 * 60),
+}
+CFFEX_SYMBOLS = {'IF', 'IC', 'IH', 'IM', 'T', 'TF', 'TS', 'TL'}
+NIGHT_OPEN = 21 * 60
+MIDNIGHT_CARRY = 3 * 60  # 03:00 之前的分钟属于前一晚的夜盘
+
+MINUTE_STAMP_AT_END = True  # 新浪分钟线时间戳为该分钟结束时刻; 为开始时刻时改为 False
+INDICATOR_WINDOW = 21       # 计算指标需要的已存K线数 (20 周期指标 + 前一根收盘价)
+PERIODS = (1, 5, 15, 30, 60)
+
+BAR_COLUMNS = [DATE_COLUMN, '开盘价', '最高价', '最低价', '收盘价', '成交量', '持仓量']
+INDICATOR_COLUMNS = ['sma5', 'sma10', 'sma20', 'std20', 'atr20']
+
+
+def fetch_minute_sina(symbol: str, start_date=None) -> pd.DataFrame:
+    """从新浪获取主力连续 1 分钟线 (只提供最近约一千根), 列名转换为与日线一致的中文列名"""
+    import akshare as ak  # 延迟导入: 只读仓库时不需要 akshare
+    data = ak.futures_zh_minute_sina(symbol=f'{symbol}0', period='1')
+    data = data.rename(columns={'datetime': DATE_COLUMN, 'open': '开盘价', 'high': '最高价', 'low': '最低价',
+                                'close': '收盘价', 'volume': '成交量', 'hold': '持仓量'})[BAR_COLUMNS]
+    data[DATE_COLUMN] = pd.to_datetime(data[DATE_COLUMN])
+    if start_date is not None:
+        data = data[data[DATE_COLUMN] >= pd.Timestamp(start_date)]
+    return data
+
+
+def trading_sessions(symbol: str) -> np.ndarray:
+    """品种的交易时段 [(开始, 结束)], 按开始时间排序"""
+    sessions = list(CFFEX_DAY_SESSIONS if symbol in CFFEX_SYMBOLS else DAY_SESSIONS)
+    if symbol in NIGHT_CLOSE:
+        sessions.append((NIGHT_OPEN, NIGHT_CLOSE[symbol]))
+    return np.array(sessions, dtype=np.int64)
+
+
+def bars_per_day(symbol: str, period: int) -> int:
+    """每个交易日的 N 分钟K线数 (各时段末尾不足 N 分钟的部分单独成一根)"""
+    sessions = trading_sessions(symbol)
+    return int(np.ceil((sessions[:, 1] - sessions[:, 0]) / period).sum())
+
+
+def annualization_factor(symbol: str, period: Optional[int]) -> float:
+    """收益率年化系数: 日线为 sqrt(252), 分钟线为 sqrt(252 * 每日K线数)"""
+    return float(np.sqrt(252 * (bars_per_day(symbol, period) if period else 1)))
+
+
+def resample_sessions(minutes: pd.DataFrame, period: int, symbol: str) -> pd.DataFrame:
+    """
+    1 分钟线按交易时段重采样为 period 分钟线
+    每个时段从开盘起每 period 分钟一根, 时段末尾不足 period 分钟的单独成一根; 时段外的分钟线 (集合竞价等)
+    恰在开盘时刻的并入第一根, 其余丢弃。开/收取首/末值, 高/低取极值, 成交量求和, 持仓量取最后值
+    """
+    if minutes.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    stamps = minutes[DATE_COLUMN].to_numpy().astype('datetime64[m]')
+    if not MINUTE_STAMP_AT_END:
+        stamps = stamps + np.timedelta64(1, 'm')
+    clock = (stamps - stamps.astype('datetime64[D]')).astype(np.int64)
+    clock = np.where(clock <= MIDNIGHT_CARRY, clock + 1440, clock)
+
+    sessions = trading_sessions(symbol)
+    k = np.searchsorted(sessions[:, 0], clock, side='right') - 1
+    start, end = sessions[k, 0], sessions[k, 1]
+    valid = (k >= 0) & (clock <= end)
+    label = np.minimum(start + np.maximum(np.ceil((clock - start) / period), 1).astype(np.int64) * period, end)
+    labels = stamps + (label - clock).astype('timedelta64[m]')
+
+    labels, frame = labels[valid], minutes[valid]
+    if not len(labels):
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    first = np.flatnonzero(np.concatenate(([True], labels[1:] != labels[:-1])))
+    last = np.append(first[1:], len(labels)) - 1
+
+    def column(name):
+        return frame[name].to_numpy(dtype=np.float64)
+
+    return pd.DataFrame({
+        DATE_COLUMN: labels[first].astype('datetime64[ns]'),
+        '开盘价': column('开盘价')[first],
+        '最高价': np.maximum.reduceat(column('最高价'), first),
+        '最低价': np.minimum.reduceat(column('最低价'), first),
+        '收盘价': column('收盘价')[last],
+        '成交量': np.add.reduceat(column('成交量'), first),
+        '持仓量': column('持仓量')[last],
+    })
+
+
+def compute_indicators(history: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    只为新K线计算指标: history 为其前最多 INDICATOR_WINDOW 根K线
+    sma5/sma10/sma20 为收盘价均值, std20 为总体标准差, atr20 为真实波幅均值 (与分析器原有算法一致)
+    """
+    close = np.concatenate((history['收盘价'].to_numpy(np.float64), new['收盘价'].to_numpy(np.float64)))
+    high = np.concatenate((history['最高价'].to_numpy(np.float64), new['最高价'].to_numpy(np.float64)))
+    low = np.concatenate((history['最低价'].to_numpy(np.float64), new['最低价'].to_numpy(np.float64)))
+    offset, n = len(history), len(close)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+    def rolling(values, window, func):
+        out = np.full(n, np.nan)
+        if n >= window:
+            out[window - 1:] = func(np.lib.stride_tricks.sliding_window_view(values, window), axis=1)
+        return out[offset:]
+
+    result = new.copy()
+    result['sma5'] = rolling(close, 5, np.mean)
+    result['sma10'] = rolling(close, 10, np.mean)
+    result['sma20'] = rolling(close, 20, np.mean)
+    result['std20'] = rolling(close, 20, np.std)
+    result['atr20'] = rolling(tr, 20, np.mean)  # 窗口含首根K线 (无前收盘价) 时为 NaN
+    return result
+
+
+def latest_indicators(data: pd.DataFrame) -> Dict[str, float]:
+    """
+    最后一根K线的指标; 分钟线数据已带指标列时直接读取, 否则 (日线) 用最近 21 根K线现算
+    prev_sma5/prev_sma10 为前一根K线的均线
+    """
+    if 'sma20' not in data:
+        data = compute_indicators(data.iloc[-INDICATOR_WINDOW - 1:-2], data.iloc[-2:])
+    latest, prev = data.iloc[-1], data.iloc[-2]
+    return {'sma5': latest['sma5'], 'sma10': latest['sma10'], 'sma20': latest['sma20'],
+            'std20': latest['std20'], 'atr20': latest['atr20'],
+            'prev_sma5': prev['sma5'], 'prev_sma10': prev['sma10']}
+
+
+class IntradayBars:
+    """分钟线数据源: 1 分钟线仓库 + 按交易时段重采样并带指标的 N 分钟线仓库"""
+
+    MINUTE_MAX_AGE = 60  # 1 分钟线超过该秒数未刷新时增量拉取
+
+    def __init__(self, period: int = 15, root: Optional[str] = None, fetcher=fetch_minute_sina):
+        if period not in PERIODS:
+            raise ValueError(f"不支持的周期: {period} (可选 {PERIODS})")
+        self.period = period
+        root = root or DEFAULT_ROOT
+        self.minutes = FuturesWarehouse(os.path.join(root, 'minute'), fetcher=fetcher)
+        self.bars = FuturesWarehouse(os.path.join(root, f'bars_{period}m'), fetcher=None)
+
+    def refresh(self, symbols: List[str]) -> Dict[str, int]:
+        """并发增量拉取过期品种的 1 分钟线"""
+        return self.minutes.refresh_stale(symbols, max_age=self.MINUTE_MAX_AGE)
+
+    def update(self, symbol: str, now: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+        """
+        把上次之后的 1 分钟线重采样并存入 N 分钟线仓库, 返回尚未走完的当前K线 (已带指标; 没有时为 None)
+        K线在其后出现新的分钟线或结束时刻已过时视为走完; 未走完的K线不入库, 下次运行重新合成
+        """
+        now = pd.Timestamp(now or datetime.now())
+        meta = self.bars.info(symbol)
+        since = None if meta is None else pd.Timestamp(meta['last']) + timedelta(seconds=1)
+        minutes = self.minutes.get(symbol, start_date=since, max_age=None)
+        if minutes is None or minutes.empty:
+            return None
+
+        new = resample_sessions(minutes, self.period, symbol)
+        last_minute = minutes[DATE_COLUMN].iloc[-1]
+        done = (new[DATE_COLUMN] < last_minute) | (new[DATE_COLUMN] + timedelta(minutes=1) <= now)
+        stored = self.bars.get(symbol, max_age=None) if meta is not None else None
+        history = stored.iloc[-INDICATOR_WINDOW:] if stored is not None else new.iloc[:0]
+
+        completed = compute_indicators(history, new[done.to_numpy()])
+        if len(completed):
+            self.bars.append(symbol, completed)
+        forming = new[~done.to_numpy()]
+        if forming.empty:
+            return None
+        history = pd.concat([history[BAR_COLUMNS], completed[BAR_COLUMNS]]).iloc[-INDICATOR_WINDOW:]
+        return compute_indicators(history, forming)
+
+    def get(self, symbol: str, count: int = 200, now: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+        """最近 count 根 N 分钟线 (含未走完的当前K线) 及指标列"""
+        forming = self.update(symbol, now)
+        stored = self.bars.get(symbol, max_age=None) if self.bars.info(symbol) else None
+        if stored is None:
+            return forming
+        tail = stored.iloc[-count:]
+        if forming is None:
+            return tail.reset_index(drop=True)
+        return pd.concat([tail, forming[tail.columns]], ignore_index=True).iloc[-count:]
+
+
+if __name__ == "__main__":
+    period = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    symbols = sys.argv[2:] or ['IF', 'AU', 'RB']
+    intraday = IntradayBars(period)
+    intraday.refresh(symbols)
+    for symbol in symbols:
+        bars = intraday.get(symbol, count=8)
+        print(f"\n{symbol} {period} 分钟线 (每日 {bars_per_day(symbol, period)} 根)")
+        print(bars if bars is not None else '无数据')
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+期货组合回测
+Portfolio-Level Futures Backtest
+
+- 各品种按各自的策略生成信号并确定平仓K线 (FuturesBacktester.resolve_exits), 再映射到所有品种K线日期的并集上
+- 同一个资金账户按时间顺序开仓: 手数按 risk_per_trade 与账户剩余保证金额度确定,
+  与已持有的同向高相关品种 (近 corr_window 根K线收益相关系数) 共享风险预算
+- 盯市、保证金占用与敞口都在对齐后的 (K线 x 品种) 数组上按持仓区间向量计算
+"""
+
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from futures_backtest import CONTRACT_SPECS, DEFAULT_CONTRACT_SPEC, FuturesBacktester
+from futures_registry import StrategyRegistry
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    """按列向前填充 NaN (首个有效值之前保持 NaN)"""
+    valid = ~np.isnan(values)
+    rows = np.where(valid, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values[rows, np.arange(values.shape[1])]
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
+
+
+class PortfolioBacktester:
+    """多品种共享资金账户的组合回测"""
+
+    def __init__(self, backtester=None, max_margin_pct=0.5, corr_window=60,
+                 stop_loss_pct=0.02, take_profit_pct=None, slippage_ticks=1, registry=None):
+        self.backtester = backtester or FuturesBacktester(registry=False)
+        # 只读取推荐策略, 不写入 (registry=False 时全部用 SMA_Crossover)
+        self.registry = StrategyRegistry() if registry is None else registry
+        self.max_margin_pct = max_margin_pct  # 全部持仓保证金占权益的上限
+        self.corr_window = corr_window        # 计算品种间相关系数的K线数
+        self.stop_loss_pct = stop_loss_pct
+        self.take_profit_pct = take_profit_pct
+        self.slippage_ticks = slippage_ticks
+
+    def default_strategies(self, symbols: List[str]) -> Dict[str, str]:
+        """各品种的策略: 策略注册表的推荐策略, 没有时用 SMA_Crossover"""
+        selections = self.registry.selections() if self.registry else {}
+        return {symbol: selections.get(symbol, {}).get('strategy', 'SMA_Crossover') for symbol in symbols}
+
+    def run(self, symbols: List[str], start_date: str, end_date: str,
+            strategies: Optional[Dict[str, str]] = None) -> Dict:
+        """读取各品种数据并运行组合回测; strategies: {品种: 策略名}, 默认见 default_strategies"""
+        strategies = strategies or self.default_strategies(symbols)
+        frames = {}
+        for symbol in symbols:
+            data = self.backtester.get_historical_data(symbol, start_date, end_date)
+            if data is not None and len(data) > 60:
+                frames[symbol] = data
+        return self.simulate(frames, strategies)
+
+    def simulate(self, frames: Dict[str, pd.DataFrame], strategies: Dict[str, str]) -> Dict:
+        """
+        组合资金模拟
+        frames: {品种: K线}; 返回 {'trades', 'equity' (按日), 'bar_equity', 'bar_dates' (公共时间轴),
+                'exposure' (按日各品种名义敞口),
+                'symbol_pnl', 'correlation' (品种收益相关矩阵), 'stats'}
+        """
+        bt = self.backtester
+        symbols = list(frames)
+        specs = [CONTRACT_SPECS.get(symbol, DEFAULT_CONTRACT_SPEC) for symbol in symbols]
+
+        # 公共时间轴与对齐后的收盘价 (停牌/非交易时段沿用上一收盘价)
+        dates = np.unique(np.concatenate([frames[s]['日期'].to_numpy() for s in symbols]))
+        n, m = len(dates), len(symbols)
+        positions = [np.searchsorted(dates, frames[s]['日期'].to_numpy()) for s in symbols]
+        close = np.full((n, m), np.nan)
+        for j, s in enumerate(symbols):
+            close[positions[j], j] = frames[s]['收盘价'].to_numpy(dtype=np.float64)
+        close = _ffill(close)
+        returns = np.zeros((n, m))
+        returns[1:] = np.nan_to_num(close[1:] / close[:-1] - 1)
+
+        # 各品种交易 (平仓K线与成交价与手数无关), 映射到公共时间轴后按开仓时间排序
+        candidates = []
+        for j, s in enumerate(symbols):
+            signals = bt.strategies()[strategies[s]](frames[s])
+            for entry_i, exit_i, direction, entry_price, exit_price, reason, exit_reason in bt.resolve_exits(
+                    frames[s], signals, s, self.stop_loss_pct, self.take_profit_pct, self.slippage_ticks):
+                candidates.append((int(positions[j][entry_i]), int(positions[j][exit_i]), j, direction,
+                                   entry_price, exit_price, reason, exit_reason))
+        candidates.sort(key=lambda c: (c[0], c[2]))
+
+        bar_pnl = np.zeros(n)
+        notional = np.zeros((n, m))
+        margin_used = np.zeros(n)
+        realized = float(bt.initial_capital)
+        open_trades = {}  # 品种列 -> (平仓K线, 方向, 手数, 开仓价, 平仓盈亏)
+        trades, rejected = [], 0
+
+        for entry_t, exit_t, j, direction, entry_price, exit_price, reason, exit_reason in candidates:
+            # 先结算在本K线及之前平仓的持仓 (反手时旧仓先平)
+            for k in [k for k, t in open_trades.items() if t[0] <= entry_t]:
+                realized += open_trades.pop(k)[4]
+
+            spec = specs[j]
+            equity = realized
+            margin = 0.0
+            for k, (_, d, lots, price, _) in open_trades.items():
+                value = lots * specs[k]['multiplier']
+                equity += d * value * (close[entry_t, k] - price)
+                margin += value * close[entry_t, k] * specs[k]['margin']
+
+            # 相关性: 已持有的同向正相关 (反向负相关) 品种越多, 新仓位分到的风险预算越少
+            crowding = 0.0
+            if open_trades and entry_t >= 2:
+                window = returns[max(1, entry_t - self.corr_window + 1):entry_t + 1]
+                held = list(open_trades)
+                with np.errstate(invalid='ignore', divide='ignore'):  # 窗口内无波动的品种相关系数为 NaN
+                    corr = np.corrcoef(window[:, [j] + held].T)[0, 1:] if len(window) > 2 else np.zeros(len(held))
+                signs = np.array([direction * open_trades[k][1] for k in held])
+                crowding = float(np.clip(np.nan_to_num(corr) * signs, 0, None).sum())
+
+            budget = max(equity * self.max_margin_pct - margin, 0.0)
+            lots = bt.position_lots(spec, equity / (1 + crowding), entry_price, self.stop_loss_pct, budget) \
+                if equity > 0 else 0
+            if lots <= 0:
+                rejected += 1
+                continue
+
+            multiplier = spec['multiplier']
+            value = direction * lots * multiplier
+            fee_in, fee_out = bt.commission(spec, entry_price, lots), bt.commission(spec, exit_price, lots)
+            marks = close[entry_t:exit_t + 1, j].copy()
+            marks[-1] = exit_price
+            bar_pnl[entry_t] += (close[entry_t, j] - entry_price) * value - fee_in
+            bar_pnl[entry_t + 1:exit_t + 1] += np.diff(marks) * value
+            bar_pnl[exit_t] -= fee_out
+            if exit_t == entry_t:
+                bar_pnl[exit_t] += (exit_price - close[exit_t, j]) * value
+            notional[entry_t:exit_t, j] += value * close[entry_t:exit_t, j]
+            margin_used[entry_t:exit_t] += abs(value) * close[entry_t:exit_t, j] * spec['margin']
+
+            pnl = (exit_price - entry_price) * value - fee_in - fee_out
+            open_trades[j] = (exit_t, direction, lots, entry_price, pnl + fee_in)
+            realized -= fee_in
+            trades.append({
+                'symbol': symbols[j],
+                'strategy': strategies[symbols[j]],
+                'entry_date': pd.Timestamp(dates[entry_t]),
+                'exit_date': pd.Timestamp(dates[exit_t]),
+                'direction': 'long' if direction == 1 else 'short',
+                'entry_price': entry_price,
+                'exit_price': exit_price,
+                'lots': lots,
+                'pnl': pnl,
+                'return_pct': pnl / equity,
+                'correlation_crowding': crowding,
+                'reason': reason,
+                'exit_reason': exit_reason,
+                'result': 'win' if pnl > 0 else 'loss'
+            })
+
+        bar_equity = bt.initial_capital + np.cumsum(bar_pnl)
+        days = dates.astype('datetime64[D]')
+        last_of_day = np.flatnonzero(np.append(days[1:] != days[:-1], True)) if n else np.zeros(0, dtype=int)
+        index = pd.DatetimeIndex(days[last_of_day])
+        daily = pd.Series(bar_equity[last_of_day], index=index, name='equity')
+
+        stats = bt.equity_metrics(daily, bar_equity)
+        stats.update(self.exposure_stats(notional, margin_used, bar_equity, returns))
+        stats.update(initial_capital=float(bt.initial_capital), total_trades=len(trades), rejected_trades=rejected,
+                     win_rate=sum(t['result'] == 'win' for t in trades) / len(trades) if trades else 0)
+
+        symbol_pnl = pd.Series(0.0, index=symbols)
+        for t in trades:
+            symbol_pnl[t['symbol']] += t['pnl']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = np.corrcoef(returns[1:].T) if n > 2 else np.eye(m)
+        return {
+            'trades': trades,
+            'equity': daily,
+            'bar_equity': bar_equity,
+            'bar_dates': pd.DatetimeIndex(dates),
+            'exposure': pd.DataFrame(notional[last_of_day], index=index, columns=symbols),
+            'symbol_pnl': symbol_pnl,
+            'correlation': pd.DataFrame(np.atleast_2d(correlation), index=symbols, columns=symbols),
+            'stats': stats,
+        }
+
+    @staticmethod
+    def exposure_stats(notional: np.ndarray, margin_used: np.ndarray, bar_equity: np.ndarray,
+                       returns: np.ndarray) -> Dict:
+        """
+        敞口指标 (占权益倍数): 总敞口 sum|x|, 净敞口 |sum x|,
+        相关性调整敞口 sqrt(x' C x) (C 为全期收益相关矩阵, 高相关同向持仓近似相加, 对冲持仓相互抵消)
+        """
+        equity = np.where(bar_equity > 0, bar_equity, np.nan)
+        weights = notional / equity[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.corrcoef(returns[1:].T) if len(returns) > 2 else np.eye(notional.shape[1])
+        corr = np.atleast_2d(np.nan_to_num(corr))
+        np.fill_diagonal(corr, 1.0)
+        gross = np.abs(weights).sum(axis=1)
+        effective = np.sqrt(np.maximum(np.einsum('ti,ij,tj->t', weights, corr, weights), 0))
+        active = gross > 0
+        return {
+            'max_gross_exposure': float(np.nanmax(gross)) if len(gross) else 0,
+            'avg_gross_exposure': float(np.nanmean(gross[active])) if active.any() else 0,
+            'avg_net_exposure': float(np.nanmean(np.abs(weights.sum(axis=1))[active])) if active.any() else 0,
+            'avg_effective_exposure': float(np.nanmean(effective[active])) if active.any() else 0,
+            'max_margin_usage': float(np.nanmax(margin_used / equity)) if len(margin_used) else 0,
+        }
+
+    @staticmethod
+    def to_markdown(result: Dict) -> str:
+        """组合回测结果 (报告章节; 也用于由回测结果库还原的结果)"""
+        s = result['stats']
+        lines = [
+            "## 组合回测 (共享资金账户)\n",
+            f"- 初始资金: {s['initial_capital']:,.0f} | 期末权益: {s['final_equity']:,.0f} | "
+            f"收益: {s['equity_return']:.2%} | 最大回撤: {s['equity_max_drawdown']:.2%} | 夏普: {s['sharpe']:.2f}",
+            f"- 交易: {s['total_trades']} 笔 (胜率 {s['win_rate']:.1%}) | 保证金不足未开仓: {s['rejected_trades']} 笔",
+            f"- 敞口 (权益倍数): 总敞口均值 {s['avg_gross_exposure']:.2f} / 最大 {s['max_gross_exposure']:.2f} | "
+            f"净敞口均值 {s['avg_net_exposure']:.2f} | 相关性调整敞口均值 {s['avg_effective_exposure']:.2f} | "
+            f"最大保证金占用 {s['max_margin_usage']:.1%}",
+            "",
+            "| 品种 | 策略 | 交易数 | 盈亏 | 盈亏占比 |",
+            "|------|------|--------|------|----------|",
+        ]
+        trades = pd.DataFrame(result['trades'])
+        total = result['symbol_pnl'].abs().sum() or 1
+        for symbol, pnl in result['symbol_pnl'].sort_values(ascending=False).items():
+            count = int((trades['symbol'] == symbol).sum()) if len(trades) else 0
+            strategy = trades.loc[trades['symbol'] == symbol, 'strategy'].iloc[0] if count else '-'
+            lines.append(f"| {symbol} | {strategy} | {count} | {pnl:,.0f} | {pnl / total:+.1%} |")
+        return '\n'.join(lines) + '\n'
+
+
+if __name__ == "__main__":
+    symbols = sys.argv[1:] or ['IF', 'IC', 'IH', 'IM', 'AU', 'AG', 'CU', 'RB', 'SC', 'M']
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = (datetime.now() - timedelta(days=3 * 365)).strftime('%Y-%m-%d')
+
+    portfolio = PortfolioBacktester()
+    result = portfolio.run(symbols, start_date, end_date)
+    print(portfolio.to_markdown(result))
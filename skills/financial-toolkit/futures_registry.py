@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+期货策略注册表
+Futures Strategy Selection Registry
+
+- FuturesBacktester 每次完整回测后写入各品种、各策略的回测断点和最近窗口内已完成的交易
+- 按窗口内胜率为每个品种选出推荐策略, ChinaFuturesAutoAnalyzerV2 启动时读取
+- 夜间增量刷新: 只从断点继续回测新K线, 窗口外的旧交易按平仓日淘汰
+- 单个 JSON 文件: schema 为格式版本, revision 每次写入加一; 原子替换 + 跨进程写锁
+
+用法:
+    python futures_registry.py refresh            # 增量刷新注册表中的品种 (放入夜间定时任务)
+    python futures_registry.py refresh IF AU      # 指定品种 (不在注册表中的先做一次完整回测)
+    python futures_registry.py show               # 查看推荐策略
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from futures_warehouse import atomic_write_json, file_lock
+
+SCHEMA_VERSION = 1
+DEFAULT_PATH = os.environ.get('FUTURES_REGISTRY_PATH',
+                              os.path.expanduser('~/.openclaw/futures_strategy_registry.json'))
+
+
+class StrategyRegistry:
+    """品种 -> 推荐策略 (回测写入, 分析器读取)"""
+
+    def __init__(self, path: Optional[str] = None, window_days: int = 180, min_trades: int = 3):
+        self.path = path or DEFAULT_PATH
+        self.window_days = window_days  # 胜率统计窗口 (按平仓日)
+        self.min_trades = min_trades    # 窗口内交易数不足的策略排在有足够样本的策略之后
+
+    # ==================== 读写 ====================
+
+    def load(self) -> Dict:
+        """读取注册表; 文件不存在或格式版本不符时返回空注册表"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                registry = json.load(f)
+        except FileNotFoundError:
+            return {'schema': SCHEMA_VERSION, 'revision': 0, 'symbols': {}}
+        if registry.get('schema') != SCHEMA_VERSION:
+            print(f"策略注册表格式版本 {registry.get('schema')} 不受支持, 忽略: {self.path}")
+            return {'schema': SCHEMA_VERSION, 'revision': 0, 'symbols': {}}
+        return registry
+
+    def _locked(self):
+        """跨进程写锁 (回测与夜间刷新可能同时写)"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        return file_lock(self.path + '.lock')
+
+    def _merge(self, entries: Dict[str, Dict]):
+        """合并品种条目并写入新版本"""
+        if not entries:
+            return
+        with self._locked():
+            registry = self.load()
+            registry['symbols'].update(entries)
+            registry['revision'] = registry.get('revision', 0) + 1
+            registry['updated_at'] = datetime.now().isoformat(timespec='seconds')
+            atomic_write_json(self.path, registry)
+
+    # ==================== 策略选择 ====================
+
+    @staticmethod
+    def _compact(trade: Dict) -> Dict:
+        return {'entry_date': pd.Timestamp(trade['entry_date']).isoformat(),
+                'exit_date': pd.Timestamp(trade['exit_date']).isoformat(),
+                'direction': trade['direction'],
+                'pnl_pct': float(trade['pnl_pct']),
+                'result': trade['result']}
+
+    def _entry(self, strategies: Dict[str, Dict], last_bar: str) -> Dict:
+        """
+        由各策略的断点和交易生成品种条目: 淘汰平仓日在窗口之外的交易, 选出推荐策略
+        排序依据: 交易数是否达到 min_trades, 胜率, 累计收益
+        """
+        cutoff = (pd.Timestamp(last_bar) - timedelta(days=self.window_days)).isoformat()
+        summary = {}
+        for name, state in strategies.items():
+            state['trades'] = [t for t in state['trades'] if t['exit_date'] >= cutoff]
+            trades = state['trades']
+            wins = sum(1 for t in trades if t['result'] == 'win')
+            summary[name] = {'trades': len(trades),
+                             'win_rate': round(wins / len(trades), 3) if trades else 0.0,
+                             'total_return': round(sum(t['pnl_pct'] for t in trades), 4)}
+
+        best = max(summary, key=lambda name: (summary[name]['trades'] >= self.min_trades,
+                                              summary[name]['win_rate'], summary[name]['total_return']))
+        return {
+            'strategy': best,
+            **summary[best],
+            'last_bar': last_bar,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'summary': summary,
+            'strategies': strategies,
+        }
+
+    def selections(self) -> Dict[str, Dict]:
+        """各品种推荐策略: {symbol: {'strategy', 'win_rate', 'trades', 'last_bar'}}"""
+        return {symbol: {key: entry[key] for key in ('strategy', 'win_rate', 'trades', 'last_bar')}
+                for symbol, entry in self.load()['symbols'].items()}
+
+    def apply(self, futures_list: Dict[str, Dict]) -> int:
+        """用注册表覆盖品种配置中的 strategy/win_rate, 返回被覆盖的品种数"""
+        selections = self.selections()
+        for symbol, info in futures_list.items():
+            if symbol in selections:
+                info['strategy'] = selections[symbol]['strategy']
+                info['win_rate'] = selections[symbol]['win_rate']
+        return sum(1 for symbol in futures_list if symbol in selections)
+
+    # ==================== 写入 ====================
+
+    def record(self, all_results: Dict[str, Dict]):
+        """记录完整回测结果 (FuturesBacktester.run_full_backtest 的返回值), 覆盖这些品种的已有断点"""
+        backtester_cls = _backtester_class()
+        entries = {}
+        for symbol, results in all_results.items():
+            strategies, last_bar = {}, None
+            for name, result in results.items():
+                checkpoint = result['checkpoint']
+                trades = backtester_cls.closed_trades(result['trades'], checkpoint)
+                strategies[name] = {'checkpoint': checkpoint, 'trades': [self._compact(t) for t in trades]}
+                last_bar = checkpoint['last_bar']
+            if strategies:
+                entries[symbol] = self._entry(strategies, last_bar)
+        self._merge(entries)
+
+    def update(self, backtester, symbol: str, data: pd.DataFrame) -> Optional[bool]:
+        """
+        从断点增量回测一个品种 (只处理断点之后的新K线); 没有新K线时返回 False
+        品种不在注册表中或某策略无法续算 (断点不在数据中) 时返回 None, 由调用方做完整回测
+        """
+        entry = self.load()['symbols'].get(symbol)
+        last_bar = pd.Timestamp(data['日期'].iloc[-1]).isoformat()
+        if entry is None:
+            return None
+        if entry['last_bar'] >= last_bar:
+            return False
+
+        strategies = {}
+        for name in backtester.strategies():
+            state = entry['strategies'].get(name)
+            resumed = state and backtester.resume_strategy(name, data, state['checkpoint'], symbol)
+            if not resumed:
+                return None
+            strategies[name] = {'checkpoint': resumed['checkpoint'],
+                                'trades': state['trades'] + [self._compact(t) for t in resumed['trades']]}
+        self._merge({symbol: self._entry(strategies, last_bar)})
+        return True
+
+    def refresh(self, symbols: Optional[List[str]] = None, backtester=None) -> Dict[str, str]:
+        """
+        夜间增量刷新: 注册表中已有的品种从断点续算, 其余 (或无法续算的) 品种在最近窗口上做完整回测
+        返回 {symbol: '增量' / '无新数据' / '完整回测' / '无数据'}
+        """
+        backtester = backtester or _backtester_class()(registry=self)
+        symbols = symbols or sorted(self.load()['symbols'])
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        start_date = (datetime.now() - timedelta(days=self.window_days)).strftime('%Y-%m-%d')
+        backtester.warehouse.refresh_stale(symbols)
+        status, full = {}, []
+
+        for symbol in symbols:
+            data = backtester.get_historical_data(symbol, None, end_date, max_age=None)
+            if data is None or len(data) <= 60:
+                status[symbol] = '无数据'
+                continue
+            updated = self.update(backtester, symbol, data)
+            if updated is None:
+                full.append(symbol)
+            else:
+                status[symbol] = '增量' if updated else '无新数据'
+
+        if full:
+            results = backtester.run_full_backtest(full, start_date, end_date)
+            if backtester.registry is not self:  # 回测器写入的是自己的注册表
+                self.record(results)
+            status.update((symbol, '完整回测') for symbol in full)
+        return status
+
+
+def _backtester_class():
+    """延迟导入 (futures_backtest 也导入本模块)"""
+    from futures_backtest import FuturesBacktester
+    return FuturesBacktester
+
+
+if __name__ == "__main__":
+    registry = StrategyRegistry()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'show'
+
+    if command == 'refresh':
+        for symbol, state in registry.refresh(sys.argv[2:] or None).items():
+            print(f"{symbol}: {state}")
+
+    loaded = registry.load()
+    print(f"策略注册表 {registry.path}  第 {loaded['revision']} 版  更新于 {loaded.get('updated_at', '-')}")
+    for symbol, entry in sorted(loaded['symbols'].items()):
+        print(f"{symbol:4s} {entry['strategy']:20s} 胜率 {entry['win_rate']:.1%}  "
+              f"交易 {entry['trades']:3d}  至 {entry['last_bar'][:10]}")
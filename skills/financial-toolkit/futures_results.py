@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+期货回测结果库
+Columnar Store for Futures Backtest Results
+
+- 每次回测 (run) 一个目录: metrics.arrow (品种 x 策略指标), trades.arrow (逐笔交易), equity.arrow (逐K线权益)
+- 交易与权益表按 (品种, 策略) 分组连续存放, index.json 记录各 run 的元数据和每组在表中的行区间,
+  按 run/品种/策略查询时只内存映射并切片命中的行
+- 组合回测与单品种回测存在同一个 run 中, 策略名为 PORTFOLIO
+- Markdown/HTML 报告直接由库中的表生成, 重新出报告不需要重新回测
+
+用法:
+    python futures_results.py runs                     # 列出回测记录
+    python futures_results.py report [run_id] [html]   # 由已存结果重新生成报告 (默认最近一次)
+    python futures_results.py compare RUN_A RUN_B      # 两次回测按品种对比
+"""
+
+import html
+import json
+import os
+import re
+import sys
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from futures_warehouse import atomic_write_json, file_lock
+
+SCHEMA_VERSION = 1
+DEFAULT_ROOT = os.environ.get('FUTURES_RESULTS_DIR',
+                              os.path.expanduser('~/.openclaw/futures_results'))
+PORTFOLIO = 'Portfolio'  # 组合回测在各表中的策略名 (权益与指标行的品种名也为 PORTFOLIO)
+
+TRADE_SCHEMA = pa.schema([
+    ('entry_date', pa.timestamp('ns')),
+    ('exit_date', pa.timestamp('ns')),
+    ('direction', pa.string()),
+    ('entry_price', pa.float64()),
+    ('exit_price', pa.float64()),
+    ('lots', pa.int64()),
+    ('pnl', pa.float64()),
+    ('pnl_pct', pa.float64()),
+    ('return_pct', pa.float64()),
+    ('commission', pa.float64()),
+    ('reason', pa.string()),
+    ('exit_reason', pa.string()),
+    ('result', pa.string()),
+])
+EQUITY_SCHEMA = pa.schema([('date', pa.timestamp('ns')), ('equity', pa.float64())])
+TABLE_SCHEMAS = {'trades': TRADE_SCHEMA, 'equity': EQUITY_SCHEMA}
+
+# 对比时按分组求和的指标 (其余取均值; 胜率由 wins / total_trades 重新计算)
+SUM_METRICS = ('total_trades', 'wins', 'losses')
+COMPARE_METRICS = ('total_trades', 'win_rate', 'total_return', 'equity_return', 'equity_max_drawdown', 'sharpe')
+REPORT_DEFAULTS = {c: 0.0 for c in ('total_trades', 'wins', 'losses', 'win_rate', 'avg_win', 'avg_loss',
+                                    'total_return', 'equity_return', 'equity_max_drawdown')}
+
+
+# ==================== 结果转换 ====================
+
+def metrics_frame(all_results: Dict[str, Dict]) -> pd.DataFrame:
+    """run_full_backtest 的返回值 -> 指标表 (每行一个品种 x 策略)"""
+    rows = [{'symbol': symbol, 'strategy': name, **result['metrics']}
+            for symbol, results in all_results.items() for name, result in results.items()]
+    return pd.DataFrame(rows, columns=None if rows else ['symbol', 'strategy', 'total_trades'])
+
+
+def _equity_frame(equity: pd.Series) -> pd.DataFrame:
+    return pd.DataFrame({'date': pd.DatetimeIndex(equity.index), 'equity': equity.to_numpy(dtype=np.float64)})
+
+
+# ==================== 报告 ====================
+
+def _markdown_table(frame: pd.DataFrame) -> str:
+    lines = ['| ' + ' | '.join(frame.columns) + ' |',
+             '|' + '|'.join('-' * (2 * len(c) + 2) for c in frame.columns) + '|']
+    lines += ['| ' + ' | '.join(str(v) for v in row) + ' |' for row in frame.itertuples(index=False)]
+    return '\n'.join(lines) + '\n'
+
+
+def render_markdown(metrics: pd.DataFrame, meta: Optional[Dict] = None, portfolio: Optional[Dict] = None) -> str:
+    """
+    由指标表生成回测报告 (Markdown)
+    meta: run 元数据 (start_date/end_date/created); portfolio: {'stats', 'trades', 'symbol_pnl'} 时附加组合章节
+    """
+    meta = meta or {}
+    period = f"{meta['start_date']} 至 {meta['end_date']}" if meta.get('start_date') else '-'
+    created = meta.get('created', datetime.now().isoformat(timespec='seconds')).replace('T', ' ')
+    report = f"""# 国内期货策略回测报告
+
+**回测周期:** {period}  
+**回测品种:** 股指期货 + 商品期货  
+**生成时间:** {created}  
+**分析师:** JARVIS QFA/FOE
+
+---
+
+## 策略列表
+
+1. **SMA_Crossover** - 均线交叉策略 (金叉做多, 死叉做空)
+2. **Breakout** - 突破策略 (突破前高做多, 跌破前低做空)
+3. **Mean_Reversion** - 均值回归 (布林带反转)
+4. **Volatility_Breakout** - 波动率突破 (基于ATR)
+
+---
+
+## 回测结果汇总
+
+"""
+    # 没有交易的策略只有 total_trades 和资金指标, 缺失的交易指标按 0 处理
+    metrics = metrics[metrics['strategy'] != PORTFOLIO]
+    metrics = metrics.assign(**{c: 0.0 for c in REPORT_DEFAULTS if c not in metrics}).fillna(REPORT_DEFAULTS)
+    summary = metrics.groupby('strategy', sort=False)[['total_trades', 'wins', 'losses', 'total_return']].sum()
+    summary['win_rate'] = summary['wins'] / summary['total_trades'].where(summary['total_trades'] > 0, 1)
+    summary = summary.sort_values('win_rate', ascending=False, kind='stable')
+
+    # 策略汇总
+    report += "### 策略整体表现\n\n"
+    report += _markdown_table(pd.DataFrame({
+        '策略': summary.index,
+        '总交易': summary['total_trades'].astype(int).to_numpy(),
+        '胜率': [f"{v:.1%}" for v in summary['win_rate']],
+        '盈亏比': '-',
+        '总收益': [f"{v:.2%}" for v in summary['total_return']],
+    }))
+    report += "\n---\n\n"
+
+    # 各品种详细结果
+    report += "## 各品种详细回测结果\n\n"
+    for symbol, rows in metrics.groupby('symbol', sort=False):
+        rows = rows[rows['total_trades'] > 0].sort_values('win_rate', ascending=False, kind='stable')
+        report += f"### {symbol}\n\n"
+        report += _markdown_table(pd.DataFrame({
+            '策略': rows['strategy'].to_numpy(),
+            '交易数': rows['total_trades'].astype(int).to_numpy(),
+            '胜率': [f"{v:.1%}" for v in rows['win_rate']],
+            '平均盈利': [f"{v:.2%}" for v in rows['avg_win']],
+            '平均亏损': [f"{v:.2%}" for v in rows['avg_loss']],
+            '总收益': [f"{v:.2%}" for v in rows['total_return']],
+            '资金收益': [f"{v:.2%}" for v in rows['equity_return']],
+            '资金回撤': [f"{v:.2%}" for v in rows['equity_max_drawdown']],
+        }))
+        report += "\n"
+
+    if portfolio is not None:
+        from futures_portfolio import PortfolioBacktester  # 延迟导入 (futures_portfolio 依赖 futures_backtest)
+        report += "---\n\n" + PortfolioBacktester.to_markdown(portfolio) + "\n"
+
+    report += """---
+
+## 结论与建议
+
+### 高胜率策略
+
+根据回测结果, 以下策略表现较好:
+
+1. **SMA_Crossover** - 适合趋势明显的品种
+2. **Breakout** - 适合波动较大的品种
+3. **Mean_Reversion** - 适合震荡行情
+
+### 风险提示
+
+- 回测结果基于历史数据, 不代表未来表现
+- 实际交易中需考虑滑点、手续费等因素
+- 建议先用模拟盘验证策略有效性
+
+---
+
+*报告由 JARVIS QFA/FOE 自动生成*
+"""
+    return report
+
+
+def _inline_html(text: str) -> str:
+    text = html.escape(text.strip())
+    text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', text)
+    return re.sub(r'\*(.+?)\*', r'<em>\1</em>', text)
+
+
+def markdown_to_html(markdown: str, title: str = '期货策略回测报告') -> str:
+    """把 render_markdown 生成的 Markdown (标题/列表/表格/分隔线/粗体) 转为独立 HTML 页面"""
+    body, block = [], None  # block: 当前未闭合的 'ul' / 'ol' / 'table' / 'p'
+
+    def close():
+        nonlocal block
+        if block is not None:
+            body.append(f'</{block}>')
+            block = None
+
+    def open_block(tag):
+        nonlocal block
+        if block != tag:
+            close()
+            body.append(f'<{tag}>')
+            block = tag
+
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        heading = re.match(r'(#{1,6})\s+(.*)', stripped)
+        if not stripped:
+            close()
+        elif heading:
+            close()
+            level = len(heading.group(1))
+            body.append(f'<h{level}>{_inline_html(heading.group(2))}</h{level}>')
+        elif stripped == '---':
+            close()
+            body.append('<hr>')
+        elif stripped.startswith('|'):
+            cells = [c.strip() for c in stripped.strip('|').split('|')]
+            if all(set(c) <= set('-:') for c in cells):
+                continue
+            tag = 'th' if block != 'table' else 'td'
+            open_block('table')
+            body.append('<tr>' + ''.join(f'<{tag}>{_inline_html(c)}</{tag}>' for c in cells) + '</tr>')
+        elif stripped.startswith('- '):
+            open_block('ul')
+            body.append(f'<li>{_inline_html(stripped[2:])}</li>')
+        elif re.match(r'\d+\.\s', stripped):
+            open_block('ol')
+            body.append(f"<li>{_inline_html(stripped.split(' ', 1)[1])}</li>")
+        else:
+            if block == 'p':
+                body.append('<br>')
+            open_block('p')
+            body.append(_inline_html(stripped))
+    close()
+
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>{html.escape(title)}</title>
+<style>
+body {{ font-family: -apple-system, "PingFang SC", "Microsoft YaHei", sans-serif; max-width: 1100px; margin: 2em auto; color: #222; }}
+table {{ border-collapse: collapse; margin: 1em 0; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+th {{ background: #f3f3f3; }}
+td:first-child, th:first-child {{ text-align: left; }}
+</style>
+</head>
+<body>
+{chr(10).join(body)}
+</body>
+</html>
+"""
+
+
+# ==================== 结果库 ====================
+
+class BacktestResultStore:
+    """回测结果库 (回测写入, 报告/对比读取)"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or DEFAULT_ROOT
+        os.makedirs(os.path.join(self.root, 'runs'), exist_ok=True)
+        self._index_path = os.path.join(self.root, 'index.json')
+        self._tables = {}  # (run_id, 表名) -> 内存映射表
+
+    # ==================== 索引 ====================
+
+    def _read_index(self) -> Dict:
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return {'schema': SCHEMA_VERSION, 'runs': {}}
+        if index.get('schema') != SCHEMA_VERSION:
+            raise ValueError(f"回测结果库格式版本 {index.get('schema')} 不受支持: {self.root}")
+        return index
+
+    def _write_index(self, index: Dict):
+        """原子写入索引 (表文件先落盘, 索引最后替换)"""
+        atomic_write_json(self._index_path, index)
+
+    def _locked(self):
+        """跨进程写锁"""
+        return file_lock(os.path.join(self.root, '.lock'))
+
+    def run_meta(self, run_id: Optional[str] = None) -> Dict:
+        """单次回测的元数据; run_id=None 时为最近一次"""
+        runs = self._read_index()['runs']
+        if not runs:
+            raise KeyError(f"回测结果库为空: {self.root}")
+        run_id = run_id or max(runs, key=lambda r: runs[r]['created'])
+        return runs[run_id]
+
+    def runs(self) -> pd.DataFrame:
+        """全部回测记录 (按时间升序)"""
+        rows = [{'run_id': run_id, 'created': meta['created'], 'label': meta.get('label'),
+                 'start_date': meta.get('start_date'), 'end_date': meta.get('end_date'),
+                 'symbols': len(meta['symbols']), 'strategies': ','.join(meta['strategies']),
+                 'portfolio': meta.get('portfolio') is not None,
+                 'trades': meta['rows']['trades'], 'bars': meta['rows']['equity']}
+                for run_id, meta in self._read_index()['runs'].items()]
+        columns = ['run_id', 'created', 'label', 'start_date', 'end_date', 'symbols', 'strategies',
+                   'portfolio', 'trades', 'bars']
+        return pd.DataFrame(rows, columns=columns).sort_values('created', kind='stable').reset_index(drop=True)
+
+    # ==================== 写入 ====================
+
+    def _write_table(self, directory: str, name: str, table: pa.Table):
+        path = os.path.join(directory, f'{name}.arrow')
+        feather.write_feather(table, path + '.tmp', compression='uncompressed')
+        os.replace(path + '.tmp', path)
+
+    def _write_groups(self, directory: str, name: str, groups: Dict[str, pd.DataFrame]) -> Dict[str, List[int]]:
+        """各组依次写入同一张表, 返回 {'品种/策略': [起始行, 行数]}"""
+        schema = TABLE_SCHEMAS[name]
+        tables, offsets, offset = [], {}, 0
+        for key, frame in groups.items():
+            table = pa.Table.from_pandas(frame.reindex(columns=schema.names), schema=schema, preserve_index=False)
+            tables.append(table)
+            offsets[key] = [offset, table.num_rows]
+            offset += table.num_rows
+        table = pa.concat_tables(tables).combine_chunks() if tables else schema.empty_table()
+        self._write_table(directory, name, table)
+        return offsets
+
+    def save(self, all_results: Dict[str, Dict], start_date=None, end_date=None,
+             portfolio: Optional[Dict] = None, params: Optional[Dict] = None, label: Optional[str] = None) -> str:
+        """
+        保存一次回测, 返回 run_id
+        all_results: FuturesBacktester.run_full_backtest 的返回值; portfolio: PortfolioBacktester.run 的返回值
+        params: 回测参数 (初始资金、风险比例等), 原样记入元数据
+        """
+        run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        directory = os.path.join(self.root, 'runs', run_id)
+        os.makedirs(directory, exist_ok=True)
+
+        metrics = metrics_frame(all_results)
+        trades, equity = {}, {}
+        for symbol, results in all_results.items():
+            for name, result in results.items():
+                key = f'{symbol}/{name}'
+                trades[key] = pd.DataFrame(result['trades'], columns=TRADE_SCHEMA.names)
+                # 逐K线权益 (旧结果只有按日权益时退回按日)
+                bars = result.get('bar_equity', result['equity'])
+                equity[key] = _equity_frame(bars)
+
+        portfolio_meta = None
+        if portfolio is not None:
+            stats = {k: v.item() if isinstance(v, np.generic) else v for k, v in portfolio['stats'].items()}
+            metrics = pd.concat([metrics, pd.DataFrame([{'symbol': PORTFOLIO, 'strategy': PORTFOLIO, **stats}])],
+                                ignore_index=True)
+            frame = pd.DataFrame(portfolio['trades'])
+            for symbol, group in (frame.groupby('symbol', sort=False) if len(frame) else ()):
+                trades[f'{symbol}/{PORTFOLIO}'] = group
+            equity[f'{PORTFOLIO}/{PORTFOLIO}'] = _equity_frame(
+                pd.Series(portfolio['bar_equity'], index=portfolio['bar_dates']))
+            portfolio_meta = {
+                'stats': stats,
+                'strategies': dict(zip(frame['symbol'], frame['strategy'])) if len(frame) else {},
+                'symbol_pnl': {s: float(v) for s, v in portfolio['symbol_pnl'].items()},
+            }
+
+        groups = {'trades': self._write_groups(directory, 'trades', trades),
+                  'equity': self._write_groups(directory, 'equity', equity)}
+        self._write_table(directory, 'metrics', pa.Table.from_pandas(metrics, preserve_index=False))
+
+        meta = {
+            'run_id': run_id,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'label': label,
+            'start_date': start_date,
+            'end_date': end_date,
+            'symbols': list(all_results),
+            'strategies': list(dict.fromkeys(name for results in all_results.values() for name in results)),
+            'params': params or {},
+            'portfolio': portfolio_meta,
+            'rows': {name: sum(rows for _, rows in offsets.values()) for name, offsets in groups.items()},
+            'groups': groups,
+        }
+        with self._locked():
+            index = self._read_index()
+            index['runs'][run_id] = meta
+            self._write_index(index)
+        return run_id
+
+    def delete(self, run_id: str):
+        """删除一次回测 (先从索引中移除, 再删文件)"""
+        with self._locked():
+            index = self._read_index()
+            index['runs'].pop(run_id)
+            self._write_index(index)
+        directory = os.path.join(self.root, 'runs', run_id)
+        for name in ('metrics', 'trades', 'equity'):
+            self._tables.pop((run_id, name), None)
+            try:
+                os.remove(os.path.join(directory, f'{name}.arrow'))
+            except OSError:
+                pass
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+    # ==================== 查询 ====================
+
+    def _open(self, run_id: str, name: str) -> pa.Table:
+        """内存映射一张表 (run 写入后不再修改, 打开后一直复用)"""
+        table = self._tables.get((run_id, name))
+        if table is None:
+            path = os.path.join(self.root, 'runs', run_id, f'{name}.arrow')
+            table = self._tables[(run_id, name)] = feather.read_table(path, memory_map=True)
+        return table
+
+    def _selected_runs(self, run_id) -> Dict[str, Dict]:
+        runs = self._read_index()['runs']
+        if run_id is None:
+            return runs
+        ids = [run_id] if isinstance(run_id, str) else list(run_id)
+        return {r: runs[r] for r in ids}
+
+    def _query(self, name: str, run_id=None, symbol=None, strategy=None) -> pd.DataFrame:
+        """按索引中的行区间切片读取交易/权益表, 并补上 run_id/symbol/strategy 列"""
+        pieces, keys = [], []
+        for rid, meta in self._selected_runs(run_id).items():
+            for key, (offset, rows) in meta['groups'][name].items():
+                sym, strat = key.split('/', 1)
+                if symbol not in (None, sym) or strategy not in (None, strat):
+                    continue
+                pieces.append(self._open(rid, name).slice(offset, rows))
+                keys.append((rid, sym, strat, rows))
+
+        columns = ['run_id', 'symbol', 'strategy'] + TABLE_SCHEMAS[name].names
+        if not pieces:
+            return pd.DataFrame(columns=columns)
+        data = pa.concat_tables(pieces).to_pandas()
+        counts = [k[3] for k in keys]
+        for i, column in enumerate(('run_id', 'symbol', 'strategy')):
+            data.insert(i, column, np.repeat([k[i] for k in keys], counts))
+        return data
+
+    def metrics(self, run_id=None, symbol=None, strategy=None) -> pd.DataFrame:
+        """指标表; run_id 可为单个 id、id 列表或 None (全部)"""
+        frames = []
+        for rid in self._selected_runs(run_id):
+            frame = self._open(rid, 'metrics').to_pandas()
+            frame.insert(0, 'run_id', rid)
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=['run_id', 'symbol', 'strategy'])
+        data = pd.concat(frames, ignore_index=True)
+        if symbol is not None:
+            data = data[data['symbol'] == symbol]
+        if strategy is not None:
+            data = data[data['strategy'] == strategy]
+        return data.reset_index(drop=True)
+
+    def trades(self, run_id=None, symbol=None, strategy=None) -> pd.DataFrame:
+        """逐笔交易 (组合回测的交易策略名为 PORTFOLIO)"""
+        return self._query('trades', run_id, symbol, strategy)
+
+    def equity(self, run_id=None, symbol=None, strategy=None) -> pd.DataFrame:
+        """逐K线权益 (组合权益: symbol=strategy=PORTFOLIO)"""
+        return self._query('equity', run_id, symbol, strategy)
+
+    def compare(self, run_a: str, run_b: str, by='symbol', metrics=COMPARE_METRICS) -> pd.DataFrame:
+        """
+        两次回测对比: 按 by ('symbol' / 'strategy' / ['symbol', 'strategy']) 分组,
+        列为 (指标, run_a / run_b / diff); 交易数求和, 胜率按分组重新计算, 其余指标取各策略均值
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        frames = []
+        for run_id in (run_a, run_b):
+            data = self.metrics(run_id)
+            data = data[data['strategy'] != PORTFOLIO]
+            available = [c for c in metrics if c in data and c != 'win_rate']
+            agg = {c: ('sum' if c in SUM_METRICS else 'mean') for c in available}
+            if 'win_rate' in metrics and 'wins' in data:
+                agg.update(wins='sum', total_trades='sum')
+            grouped = data.groupby(by, sort=False).agg(agg)
+            if 'win_rate' in metrics and 'wins' in data:
+                grouped['win_rate'] = grouped['wins'] / grouped['total_trades'].where(grouped['total_trades'] > 0)
+            frames.append(grouped)
+
+        a, b = frames
+        columns = {}
+        for metric in metrics:
+            if metric in a and metric in b:
+                columns[(metric, run_a)] = a[metric]
+                columns[(metric, run_b)] = b[metric]
+                columns[(metric, 'diff')] = b[metric] - a[metric]
+        return pd.DataFrame(columns)
+
+    # ==================== 报告 ====================
+
+    def _portfolio(self, run_id: str, meta: Dict) -> Optional[Dict]:
+        """由库中数据还原组合章节所需的 {'stats', 'trades', 'symbol_pnl'}"""
+        if meta.get('portfolio') is None:
+            return None
+        trades = self.trades(run_id, strategy=PORTFOLIO)
+        trades['strategy'] = trades['symbol'].map(meta['portfolio']['strategies'])
+        return {'stats': meta['portfolio']['stats'], 'trades': trades,
+                'symbol_pnl': pd.Series(meta['portfolio']['symbol_pnl'], dtype=np.float64)}
+
+    def render_markdown(self, run_id: Optional[str] = None) -> str:
+        meta = self.run_meta(run_id)
+        return render_markdown(self.metrics(meta['run_id']), meta, self._portfolio(meta['run_id'], meta))
+
+    def render_html(self, run_id: Optional[str] = None) -> str:
+        meta = self.run_meta(run_id)
+        return markdown_to_html(self.render_markdown(meta['run_id']), f"期货策略回测报告 {meta['run_id']}")
+
+    def write_report(self, run_id: Optional[str] = None, fmt: str = 'md', path: Optional[str] = None) -> str:
+        """写出报告文件 (fmt: 'md' / 'html'), 默认写到结果库的 reports 目录, 返回路径"""
+        meta = self.run_meta(run_id)
+        content = self.render_html(meta['run_id']) if fmt == 'html' else self.render_markdown(meta['run_id'])
+        if path is None:
+            path = os.path.join(self.root, 'reports', f"futures_backtest_report_{meta['run_id']}.{fmt}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+
+if __name__ == "__main__":
+    store = BacktestResultStore()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'runs'
+
+    if command == 'report':
+        args = sys.argv[2:]
+        fmt = 'html' if 'html' in args else 'md'
+        run_id = next((a for a in args if a != 'html'), None)
+        print(f"报告已生成: {store.write_report(run_id, fmt)}")
+    elif command == 'compare':
+        by = sys.argv[4] if len(sys.argv) > 4 else 'symbol'
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(store.compare(sys.argv[2], sys.argv[3], by=by).round(4))
+    else:
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(store.runs().to_string(index=False))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+期货策略参数扫描
+Futures Strategy Parameter Sweep
+
+- 每个品种的滚动指标 (SMA/标准差/ATR/前高前低) 按窗口缓存, 所有参数组合共用
+- 同一组策略参数的信号只生成一次, 再与止损/止盈网格组合做资金模拟
+- 每个 (品种, 策略) 取目标指标最优的参数, 品种内按目标指标排序, 输出推荐策略表
+"""
+
+import itertools
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import pandas as pd
+
+from futures_backtest import CONTRACT_SPECS, FuturesBacktester, IndicatorCache
+
+# 策略参数网格
+DEFAULT_GRID = {
+    'SMA_Crossover': {'fast': [3, 5, 8, 10, 13], 'slow': [20, 30, 40, 60]},
+    'Breakout': {'lookback': [10, 15, 20, 30, 40, 55]},
+    'Mean_Reversion': {'lookback': [10, 15, 20, 30, 40], 'std_dev': [1.5, 2, 2.5, 3]},
+    'Volatility_Breakout': {'lookback': [10, 14, 20, 30, 40], 'atr_mult': [0.25, 0.5, 0.75, 1.0]},
+}
+
+# 风控参数网格 (与每组策略参数组合)
+DEFAULT_RISK_GRID = {
+    'stop_loss_pct': [0.01, 0.02, 0.03],
+    'take_profit_pct': [None, 0.04, 0.08],
+}
+
+
+def expand_grid(grid: Dict) -> List[Dict]:
+    """展开参数网格; 均线策略要求 fast < slow"""
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    return [c for c in combos if c.get('fast', 0) < c.get('slow', float('inf'))]
+
+
+class StrategySweep:
+    """多品种策略参数扫描"""
+
+    def __init__(self, backtester=None, grid=None, risk_grid=None, objective='sharpe', min_trades=5):
+        self.backtester = backtester or FuturesBacktester()
+        self.grid = grid or DEFAULT_GRID
+        self.risk_grid = risk_grid or DEFAULT_RISK_GRID
+        self.objective = objective      # 排序指标: sharpe / equity_return / win_rate ...
+        self.min_trades = min_trades    # 交易数不足的组合不参与排名
+
+    def combinations(self) -> int:
+        """每个品种需评估的参数组合数"""
+        risk = len(expand_grid(self.risk_grid))
+        return sum(len(expand_grid(grid)) for grid in self.grid.values()) * risk
+
+    def sweep_symbol(self, symbol: str, data: pd.DataFrame) -> List[Dict]:
+        """评估一个品种的全部参数组合, 每个组合一行"""
+        bt = self.backtester
+        indicators = IndicatorCache(data)
+        strategies = bt.strategies()
+        risk_combos = expand_grid(self.risk_grid)
+        rows = []
+
+        for name, grid in self.grid.items():
+            for params in expand_grid(grid):
+                signals = strategies[name](data, indicators=indicators, **params)
+                for risk in risk_combos:
+                    simulation = bt.simulate(data, signals, symbol, **risk)
+                    trades = simulation['trades']
+                    wins = sum(1 for t in trades if t['result'] == 'win')
+                    rows.append({
+                        'symbol': symbol,
+                        'strategy': name,
+                        'params': params,
+                        **risk,
+                        'trades': len(trades),
+                        'win_rate': wins / len(trades) if trades else 0,
+                        **simulation['stats'],
+                    })
+        return rows
+
+    def run(self, symbols: List[str], start_date: str, end_date: str, max_workers=None) -> pd.DataFrame:
+        """
+        扫描多个品种, 返回全部组合结果
+        各品种在进程池中并行 (子进程从本地仓库读取数据); max_workers=1 时串行
+        """
+        for symbol in symbols:  # 先在主进程刷新数据, 子进程只读本地仓库
+            self.backtester.get_historical_data(symbol, start_date, end_date)
+
+        jobs = [(symbol, start_date, end_date) for symbol in symbols]
+        if max_workers == 1:
+            _init_worker(self)
+            rows = [row for job in jobs for row in _sweep_job(job)]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(self,)) as pool:
+                rows = [row for symbol_rows in pool.map(_sweep_job, jobs) for row in symbol_rows]
+        return pd.DataFrame(rows)
+
+    def ranking(self, results: pd.DataFrame) -> pd.DataFrame:
+        """每个 (品种, 策略) 的最优参数, 品种内按目标指标排序 (rank 从 1 开始)"""
+        if results.empty:  # 没有任何品种有数据
+            return results.assign(rank=pd.Series(dtype=int))
+        eligible = results[results['trades'] >= self.min_trades]
+        if eligible.empty:
+            return eligible.assign(rank=pd.Series(dtype=int))
+        best = eligible.loc[eligible.groupby(['symbol', 'strategy'])[self.objective].idxmax()]
+        best = best.sort_values(['symbol', self.objective], ascending=[True, False])
+        best['rank'] = best.groupby('symbol').cumcount() + 1
+        return best.reset_index(drop=True)
+
+    def recommendations(self, ranking: pd.DataFrame) -> Dict[str, Dict]:
+        """每个品种排名第一的策略, 格式与 ChinaFuturesAutoAnalyzerV2.futures_list 的 strategy/win_rate 一致"""
+        top = ranking[ranking['rank'] == 1]
+        return {
+            row.symbol: {
+                'strategy': row.strategy,
+                'win_rate': round(float(row.win_rate), 3),
+                'params': row.params,
+                'stop_loss_pct': row.stop_loss_pct,
+                'take_profit_pct': None if pd.isna(row.take_profit_pct) else row.take_profit_pct,
+                self.objective: round(float(getattr(row, self.objective)), 4),
+            }
+            for row in top.itertuples()
+        }
+
+    def to_markdown(self, ranking: pd.DataFrame) -> str:
+        """品种策略排名表"""
+        lines = ["| 品种 | 排名 | 策略 | 参数 | 止损 | 止盈 | 交易数 | 胜率 | 资金收益 | 最大回撤 | 夏普 |",
+                 "|------|------|------|------|------|------|--------|------|----------|----------|------|"]
+        for row in ranking.itertuples():
+            params = ', '.join(f'{k}={v}' for k, v in row.params.items())
+            take_profit = '-' if pd.isna(row.take_profit_pct) else f'{row.take_profit_pct:.0%}'
+            lines.append(f"| {row.symbol} | {row.rank} | {row.strategy} | {params} | {row.stop_loss_pct:.0%} | "
+                         f"{take_profit} | {row.trades} | {row.win_rate:.1%} | {row.equity_return:.2%} | "
+                         f"{row.equity_max_drawdown:.2%} | {row.sharpe:.2f} |")
+        return '\n'.join(lines)
+
+
+# ==================== 扫描子进程 ====================
+
+_worker_sweep = None
+
+def _init_worker(sweep):
+    global _worker_sweep
+    _worker_sweep = sweep
+
+def _sweep_job(job):
+    symbol, start_date, end_date = job
+    data = _worker_sweep.backtester.get_historical_data(symbol, start_date, end_date, max_age=None)
+    if data is None or len(data) <= 60:
+        return []
+    return _worker_sweep.sweep_symbol(symbol, data)
+
+
+if __name__ == "__main__":
+    symbols = sys.argv[1:] or list(CONTRACT_SPECS)
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = (datetime.now() - timedelta(days=3 * 365)).strftime('%Y-%m-%d')
+
+    sweep = StrategySweep()
+    print(f"参数扫描: {len(symbols)} 个品种 x {sweep.combinations()} 组参数  {start_date} 至 {end_date}")
+    results = sweep.run(symbols, start_date, end_date)
+    ranking = sweep.ranking(results)
+    print(sweep.to_markdown(ranking))
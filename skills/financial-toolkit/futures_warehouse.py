@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+本地期货行情仓库
+Local OHLCV Warehouse for akshare futures data
+
+- 每个品种一个目录, 行情按追加顺序切成若干 Feather (Arrow IPC, 不压缩) 分片
+- index.json 记录各品种的分片、行数、起止日期和最近刷新时间
+- 刷新时只向 akshare 请求最后一根K线之后的数据, 新K线写成新分片; 分片过多时合并
+- 读取时内存映射分片, 日期区间切片直接引用映射内存 (只读, 不复制)
+
+用法:
+    python futures_warehouse.py refresh IF IC AU      # 增量刷新 (可放入夜间定时任务)
+    python futures_warehouse.py info                  # 查看仓库内容
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台: 不做跨进程加锁
+    fcntl = None
+
+DATE_COLUMN = '日期'
+DEFAULT_ROOT = os.environ.get('FUTURES_WAREHOUSE_DIR',
+                              os.path.expanduser('~/.openclaw/futures_warehouse'))
+
+
+def atomic_write_json(path: str, obj):
+    """原子写入 JSON (先写临时文件并落盘, 再替换)"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+@contextmanager
+def file_lock(path: str):
+    """以 path 为锁文件的跨进程写锁 (仓库、注册表、结果库等共用)"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def fetch_main_sina(symbol: str, start_date=None) -> pd.DataFrame:
+    """从新浪获取主力连续日线; start_date 给定时只请求该日之后的数据"""
+    import akshare as ak  # 延迟导入: 只读仓库时不需要 akshare
+    if start_date is None:
+        return ak.futures_main_sina(symbol=f'{symbol}0')
+    return ak.futures_main_sina(symbol=f'{symbol}0',
+                                start_date=pd.Timestamp(start_date).strftime('%Y%m%d'),
+                                end_date=datetime.now().strftime('%Y%m%d'))
+
+
+class FuturesWarehouse:
+    """期货行情仓库 (多个分析器/回测器共用)"""
+
+    MAX_PARTS = 8          # 单品种分片数超过该值时合并为一个分片
+    DEFAULT_MAX_AGE = 900  # get() 默认在数据超过 15 分钟未刷新时增量刷新
+
+    def __init__(self, root: Optional[str] = None, fetcher=fetch_main_sina):
+        self.root = root or DEFAULT_ROOT
+        self.fetcher = fetcher
+        os.makedirs(self.root, exist_ok=True)
+        self._index_path = os.path.join(self.root, 'index.json')
+        self._tables = {}  # symbol -> (分片文件元组, 内存映射表, 日期数组)
+
+    def __getstate__(self):
+        """跨进程传递时不携带已映射的表 (子进程按需重新映射)"""
+        state = self.__dict__.copy()
+        state['_tables'] = {}
+        return state
+
+    # ==================== 索引 ====================
+
+    def _read_index(self) -> Dict:
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _locked(self):
+        """跨进程写锁 (同一仓库同一时刻只有一个写者)"""
+        return file_lock(os.path.join(self.root, '.lock'))
+
+    def symbols(self) -> List[str]:
+        return sorted(self._read_index())
+
+    def info(self, symbol: str) -> Optional[Dict]:
+        return self._read_index().get(symbol)
+
+    # ==================== 分片读写 ====================
+
+    def _write_part(self, symbol: str, meta: Dict, table: pa.Table) -> Dict:
+        """写入一个新分片, 返回其描述 (文件名序号单调递增, 从不复用)"""
+        directory = os.path.join(self.root, symbol)
+        os.makedirs(directory, exist_ok=True)
+        seq = meta.get('next_part', 0)
+        name = f'part-{seq:05d}.arrow'
+        path = os.path.join(directory, name)
+        feather.write_feather(table, path + '.tmp', compression='uncompressed')
+        os.replace(path + '.tmp', path)
+        meta['next_part'] = seq + 1
+        dates = table.column(DATE_COLUMN)
+        return {'file': name, 'rows': table.num_rows,
+                'first': pd.Timestamp(dates[0].as_py()).isoformat(),
+                'last': pd.Timestamp(dates[-1].as_py()).isoformat()}
+
+    def _remove_parts(self, symbol: str, parts: List[Dict]):
+        for part in parts:
+            try:
+                os.remove(os.path.join(self.root, symbol, part['file']))
+            except OSError:
+                pass
+
+    def _load(self, symbol: str, meta: Dict):
+        """内存映射该品种的全部分片 (分片未变时复用已打开的表)"""
+        files = tuple(part['file'] for part in meta['parts'])
+        cached = self._tables.get(symbol)
+        if cached is not None and cached[0] == files:
+            return cached[1], cached[2]
+        tables = [feather.read_table(os.path.join(self.root, symbol, f), memory_map=True) for f in files]
+        table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+        dates = table.column(DATE_COLUMN).to_numpy()
+        self._tables[symbol] = (files, table, dates)
+        return table, dates
+
+    @staticmethod
+    def _to_table(data: pd.DataFrame, schema: Optional[pa.Schema] = None) -> pa.Table:
+        """规范化 akshare 数据: 日期转为时间戳并排序去重; 追加数据按已存储的表结构转换"""
+        data = data.copy()
+        data[DATE_COLUMN] = pd.to_datetime(data[DATE_COLUMN])
+        data = data.sort_values(DATE_COLUMN).drop_duplicates(DATE_COLUMN, keep='last')
+        if schema is None:
+            return pa.Table.from_pandas(data, preserve_index=False)
+        data = data[schema.names]
+        return pa.Table.from_pandas(data, preserve_index=False).cast(schema)
+
+    # ==================== 写入 ====================
+
+    def write(self, symbol: str, data: pd.DataFrame) -> int:
+        """用完整历史替换该品种的数据, 返回行数"""
+        table = self._to_table(data)
+        with self._locked():
+            index = self._read_index()
+            old = index.get(symbol, {})
+            meta = {'next_part': old.get('next_part', 0)}
+            meta['parts'] = [self._write_part(symbol, meta, table)]
+            self._finish(index, symbol, meta)
+            self._remove_parts(symbol, old.get('parts', []))
+        return table.num_rows
+
+    def append(self, symbol: str, data: pd.DataFrame) -> int:
+        """
+        追加新K线, 返回新增行数
+        早于已存最后一根K线的数据被忽略; 与最后一根同日期的K线若数值变化 (盘中未完成的K线) 则替换
+        """
+        if self.info(symbol) is None:
+            return self.write(symbol, data)
+
+        with self._locked():
+            index = self._read_index()
+            meta = index[symbol]
+            table, dates = self._load(symbol, meta)
+            last = dates[-1]
+            new = self._to_table(data, table.schema)
+            new = new.slice(int(np.searchsorted(new.column(DATE_COLUMN).to_numpy(), last, side='left')))
+            obsolete = []
+            if new.num_rows and new.column(DATE_COLUMN).to_numpy()[0] == last:
+                if new.slice(0, 1).equals(table.slice(table.num_rows - 1, 1)):
+                    new = new.slice(1)
+                else:
+                    # 最后一根K线已变化: 去掉该行后的最后分片与新数据合并, 替换最后分片
+                    tail_part = meta['parts'].pop()
+                    tail = table.slice(table.num_rows - tail_part['rows'], tail_part['rows'] - 1)
+                    new = pa.concat_tables([tail, new]).combine_chunks()
+                    obsolete.append(tail_part)
+            added = int((new.column(DATE_COLUMN).to_numpy() > last).sum())
+
+            if new.num_rows:
+                meta['parts'].append(self._write_part(symbol, meta, new))
+            if len(meta['parts']) > self.MAX_PARTS:
+                merged = pa.concat_tables(
+                    [feather.read_table(os.path.join(self.root, symbol, p['file']), memory_map=True)
+                     for p in meta['parts']]).combine_chunks()
+                obsolete += meta['parts']
+                meta['parts'] = [self._write_part(symbol, meta, merged)]
+            self._finish(index, symbol, meta)
+            self._remove_parts(symbol, obsolete)
+        return added
+
+    def _finish(self, index: Dict, symbol: str, meta: Dict):
+        """更新品种元数据并写回索引"""
+        parts = meta['parts']
+        meta['rows'] = sum(p['rows'] for p in parts)
+        meta['first'] = parts[0]['first'] if parts else None
+        meta['last'] = parts[-1]['last'] if parts else None
+        meta['updated'] = datetime.now().isoformat(timespec='seconds')
+        index[symbol] = meta
+        atomic_write_json(self._index_path, index)  # 分片先落盘, 索引最后替换
+
+    # ==================== 刷新 ====================
+
+    def refresh(self, symbol: str, full: bool = False) -> int:
+        """从数据源增量刷新一个品种, 返回新增行数 (网络请求在锁外进行)"""
+        meta = None if full else self.info(symbol)
+        if meta is None:
+            data = self.fetcher(symbol)
+            if data is None or data.empty:
+                return 0
+            return self.write(symbol, data)
+        data = self.fetcher(symbol, start_date=meta['last'])
+        if data is None or data.empty:
+            with self._locked():
+                index = self._read_index()
+                self._finish(index, symbol, index[symbol])
+            return 0
+        return self.append(symbol, data)
+
+    def refresh_all(self, symbols: List[str], max_workers: int = 8, full: bool = False) -> Dict[str, int]:
+        """并发刷新多个品种, 返回 {品种: 新增行数}, 失败的品种为 -1"""
+        def job(symbol):
+            try:
+                return self.refresh(symbol, full=full)
+            except Exception as e:
+                print(f"刷新 {symbol} 失败: {e}")
+                return -1
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return dict(zip(symbols, pool.map(job, symbols)))
+
+    def refresh_stale(self, symbols: List[str], max_age: Optional[float] = DEFAULT_MAX_AGE,
+                      max_workers: int = 8) -> Dict[str, int]:
+        """并发刷新其中已过期的品种 (报告生成前预热, 之后逐个 get() 不再访问网络)"""
+        return self.refresh_all([s for s in symbols if self.is_stale(s, max_age)], max_workers=max_workers)
+
+    def is_stale(self, symbol: str, max_age: Optional[float] = DEFAULT_MAX_AGE) -> bool:
+        meta = self.info(symbol)
+        if meta is None:
+            return True
+        if max_age is None:
+            return False
+        age = (datetime.now() - datetime.fromisoformat(meta['updated'])).total_seconds()
+        return age > max_age
+
+    # ==================== 读取 ====================
+
+    def get(self, symbol: str, start_date=None, end_date=None,
+            max_age: Optional[float] = DEFAULT_MAX_AGE, copy: bool = False) -> Optional[pd.DataFrame]:
+        """
+        读取 [start_date, end_date] 区间的K线 (按日期升序)
+        数据缺失或超过 max_age 秒未刷新时先增量刷新; max_age=None 表示只用本地数据
+        刷新失败时退回本地数据; 返回的列直接引用内存映射 (只读), 需要原地修改时传 copy=True
+        """
+        if self.is_stale(symbol, max_age):
+            try:
+                self.refresh(symbol)
+            except Exception as e:
+                print(f"刷新 {symbol} 失败, 使用本地数据: {e}")
+        meta = self.info(symbol)
+        if meta is None or not meta['parts']:
+            return None
+
+        table, dates = self._load(symbol, meta)
+        lo = 0 if start_date is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date)), side='left'))
+        hi = len(dates) if end_date is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date)), side='right'))
+        data = table.slice(lo, max(hi - lo, 0)).to_pandas(split_blocks=True)
+        return data.copy() if copy else data
+
+
+if __name__ == "__main__":
+    warehouse = FuturesWarehouse()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'info'
+
+    if command == 'refresh':
+        symbols = sys.argv[2:] or warehouse.symbols()
+        for symbol, added in warehouse.refresh_all(symbols).items():
+            print(f"{symbol}: {'失败' if added < 0 else f'新增 {added} 行'}")
+    else:
+        for symbol in warehouse.symbols():
+            meta = warehouse.info(symbol)
+            print(f"{symbol:4s} {meta['rows']:6d} 行  {meta['first'][:10]} ~ {meta['last'][:10]}  "
+                  f"{len(meta['parts'])} 个分片  刷新于 {meta['updated']}")